@@ -28,6 +28,8 @@
 
 import time
 import yaml
+import copy
+import inspect
 from pathlib import Path
 from os.path import dirname, basename
 import numpy as np
@@ -51,6 +53,12 @@ class Application(object):
     TRAIN_DIR = '{experiment_dir}/train/{protocol}.{subset}'
     WEIGHTS_PT = '{train_dir}/weights/{epoch:04d}.pt'
 
+    # created by "quantize" mode
+    QUANTIZED_PT = '{train_dir}/weights/{epoch:04d}.int8.pt'
+
+    # created by "export" mode
+    EXPORTED_PT = '{train_dir}/weights/{epoch:04d}.jit.pt'
+
     # created by "validate" mode
     VALIDATE_DIR = '{train_dir}/validate{_task}/{protocol}.{subset}'
 
@@ -73,7 +81,10 @@ class Application(object):
         train_dir = dirname(dirname(model_pt))
         app = cls.from_train_dir(train_dir, db_yml=db_yml, training=training)
         app.model_pt_ = model_pt
-        epoch = int(basename(app.model_pt_)[:-3])
+        # {epoch:04d}.pt or {epoch:04d}.int8.pt (see QUANTIZED_PT)
+        name = basename(app.model_pt_)
+        epoch = int(name.split('.')[0])
+        app.quantized = name.endswith('.int8.pt')
         app.model_ = app.load_model(epoch, train_dir=train_dir)
         return app
 
@@ -91,6 +102,9 @@ class Application(object):
 
         self.experiment_dir = experiment_dir
 
+        # load (dynamically) quantized models (see "quantize" mode)
+        self.quantized = False
+
         # load configuration
         config_yml = self.CONFIG_YML.format(experiment_dir=self.experiment_dir)
         with open(config_yml, 'r') as fp:
@@ -181,7 +195,7 @@ class Application(object):
             learning_rate=self.learning_rate_,
             log_dir=train_dir, device=self.device)
 
-    def load_model(self, epoch, train_dir=None):
+    def load_model(self, epoch, train_dir=None, quantized=None):
         """Load pretrained model
 
         Parameters
@@ -190,12 +204,31 @@ class Application(object):
             Which epoch to load.
         train_dir : str, optional
             Path to train directory. Defaults to self.train_dir_.
+        quantized : bool, optional
+            Load dynamically quantized model (as created by `quantize`).
+            Defaults to self.quantized. Quantized models only run on CPU.
         """
 
         if train_dir is None:
             train_dir = self.train_dir_
 
+        if quantized is None:
+            quantized = self.quantized
+
         import torch
+
+        if quantized:
+            quantized_pt = self.QUANTIZED_PT.format(
+                train_dir=train_dir, epoch=epoch)
+            model = self.quantize_model(self.model_)
+            # packed int8 weights are not plain tensors: they cannot be
+            # loaded in "weights only" mode (the default since torch 2.6)
+            kwargs = {}
+            if 'weights_only' in inspect.signature(torch.load).parameters:
+                kwargs['weights_only'] = False
+            model.load_state_dict(torch.load(quantized_pt, **kwargs))
+            return model
+
         weights_pt = self.WEIGHTS_PT.format(
             train_dir=train_dir, epoch=epoch)
         # if GPU is not available, load using CPU
@@ -203,6 +236,179 @@ class Application(object):
             torch.load(weights_pt, map_location=lambda storage, loc: storage))
         return self.model_
 
+    @staticmethod
+    def quantize_model(model):
+        """Dynamically quantize model
+
+        Weights of recurrent (LSTM, GRU) and linear layers are converted to
+        int8. Activations are quantized on the fly, at inference time.
+
+        Parameters
+        ----------
+        model : `nn.Module`
+            Model. It is left unchanged.
+
+        Returns
+        -------
+        quantized : `nn.Module`
+            Quantized (CPU-only) copy of `model`.
+        """
+
+        import torch
+        import torch.nn as nn
+
+        # models keep (plain) lists of their layers next to the registered
+        # submodules (e.g. StackedRNN.recurrent_layers_). quantization only
+        # swaps registered submodules: remember how to re-build those lists.
+        layer_lists = []
+        for path, module in model.named_modules():
+            names = {id(child): name
+                     for name, child in module.named_children()}
+            for attr, value in vars(module).items():
+                if isinstance(value, list) and value and \
+                   all(id(layer) in names for layer in value):
+                    layer_lists.append(
+                        (path, attr, [names[id(layer)] for layer in value]))
+
+        quantized = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu().eval(), {nn.LSTM, nn.GRU, nn.Linear},
+            dtype=torch.qint8)
+
+        modules = dict(quantized.named_modules())
+        for path, attr, names in layer_lists:
+            module = modules[path]
+            setattr(module, attr, [getattr(module, name) for name in names])
+
+        return quantized
+
+    def quantize(self, epoch, protocol_name=None, subset='development',
+                 **kwargs):
+        """Quantize model at `epoch` and compare it with original model
+
+        Parameters
+        ----------
+        epoch : int
+            Which epoch to quantize.
+        protocol_name : str, optional
+            When provided, run validation experiment (see `validate_epoch`)
+            with both original and quantized models.
+        subset : {'train', 'development', 'test'}, optional
+            Subset used for validation. Defaults to 'development'.
+        kwargs :
+            Passed to `validate_init`.
+
+        Returns
+        -------
+        metrics : dict
+            'metric' name, and its 'original' and 'quantized' values.
+            Empty when `protocol_name` is not provided.
+
+        Usage
+        -----
+        >>> app = SpeechActivityDetection.from_train_dir(train_dir)
+        >>> metrics = app.quantize(epoch, protocol_name=protocol_name)
+        """
+
+        import torch
+
+        quantized_pt = Path(self.QUANTIZED_PT.format(
+            train_dir=self.train_dir_, epoch=epoch))
+        model = self.quantize_model(self.load_model(epoch, quantized=False))
+        torch.save(model.state_dict(), quantized_pt)
+
+        if protocol_name is None:
+            return {}
+
+        # quantized models only run on CPU
+        device = getattr(self, 'device', torch.device('cpu'))
+        quantized = self.quantized
+        self.device = torch.device('cpu')
+
+        # validate_epoch loads models with self.load_model(epoch)
+        metrics = {}
+        try:
+            validation_data = self.validate_init(protocol_name, subset=subset,
+                                                 **kwargs)
+            for name in ['original', 'quantized']:
+                self.quantized = name == 'quantized'
+                details = self.validate_epoch(
+                    epoch, protocol_name, subset=subset,
+                    validation_data=validation_data)
+                metrics['metric'] = details['metric']
+                metrics[name] = details['value']
+        finally:
+            self.device, self.quantized = device, quantized
+
+        return metrics
+
+    def export(self, epoch, exported_pt=None, duration=None, step=None):
+        """Export model at `epoch` for inference
+
+        The model (dynamically quantized if self.quantized is True) is traced
+        and saved along with its feature extraction and sliding window
+        configuration, so that it can be applied (e.g. by SequenceLabeling or
+        SequenceEmbedding) without this application nor its config.yml.
+
+        Parameters
+        ----------
+        epoch : int
+            Which epoch to export.
+        exported_pt : str, optional
+            Path to exported model. Defaults to EXPORTED_PT.
+        duration : float, optional
+            Sliding window duration. Defaults to the one used for training.
+        step : float, optional
+            Sliding window step. Defaults to letting the loader decide.
+
+        Returns
+        -------
+        exported_pt : `Path`
+            Path to exported model.
+
+        Usage
+        -----
+        >>> app = SpeechActivityDetection.from_model_pt(model_pt)
+        >>> exported_pt = app.export(epoch)
+        >>> sequence_labeling = SequenceLabeling(model=exported_pt)
+        """
+
+        import torch
+        from pyannote.audio.export import export_model
+
+        if exported_pt is None:
+            exported_pt = self.EXPORTED_PT.format(
+                train_dir=self.train_dir_, epoch=epoch)
+        exported_pt = Path(exported_pt)
+
+        # traced models are bound to the device they were traced on
+        model = self.load_model(epoch).to('cpu').eval()
+
+        min_duration = None
+        if duration is None:
+            duration = getattr(self, 'duration', None)
+        if duration is None:
+            duration = getattr(self.task_, 'duration', None)
+        if duration is None:
+            duration = self.task_.max_duration
+            min_duration = self.task_.min_duration
+
+        config = {'feature_extraction': self.config_['feature_extraction'],
+                  'architecture': self.config_['architecture']['name'],
+                  'quantized': self.quantized,
+                  'duration': duration,
+                  'min_duration': min_duration,
+                  'step': step}
+        for attribute in ['n_classes', 'output_dim']:
+            if hasattr(model, attribute):
+                config[attribute] = getattr(model, attribute)
+
+        n_samples = self.feature_extraction_.sliding_window.samples(
+            duration, mode='center')
+        example = torch.rand(1, n_samples, self.feature_extraction_.dimension)
+
+        export_model(model, exported_pt, example, config)
+        return exported_pt
+
     def get_number_of_epochs(self, train_dir=None, return_first=False):
         """Get information about completed epochs
 
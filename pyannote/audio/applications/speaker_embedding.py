@@ -33,6 +33,8 @@ Usage:
   pyannote-speaker-embedding train [options] <experiment_dir> <database.task.protocol>
   pyannote-speaker-embedding validate [options] [--duration=<duration> --every=<epoch> --chronological --purity=<purity> --metric=<metric>] <train_dir> <database.task.protocol>
   pyannote-speaker-embedding apply [options] [--duration=<duration> --step=<step>] <model.pt> <database.task.protocol> <output_dir>
+  pyannote-speaker-embedding quantize [options] [--duration=<duration> --purity=<purity> --metric=<metric>] <model.pt> <database.task.protocol>
+  pyannote-speaker-embedding export [options] [--duration=<duration> --step=<step>] <model.pt> <output.pt>
   pyannote-speaker-embedding -h | --help
   pyannote-speaker-embedding --version
 
@@ -42,8 +44,8 @@ Common options:
                              [default: ~/.pyannote/db.yml]
   --subset=<subset>          Set subset (train|developement|test).
                              Defaults to "train" in "train" mode. Defaults to
-                             "development" in "validate" mode. Defaults to all subsets in
-                             "apply" mode.
+                             "development" in "validate" and "quantize" modes.
+                             Defaults to all subsets in "apply" mode.
   --gpu                      Run on GPUs. Defaults to using CPUs.
   --batch=<size>             Set batch size. Has no effect in "train" mode.
                              [default: 32]
@@ -76,6 +78,15 @@ Common options:
   --step=<step>              Sliding window step, in seconds.
                              Defaults to 25% of window duration.
 
+"quantize" mode:
+  <model.pt>                 Path to the pretrained model. See "validation"
+                             mode for "purity" and "metric" options.
+
+"export" mode:
+  <model.pt>                 Path to the pretrained (or quantized) model. See
+                             "apply" mode for "step" option.
+  <output.pt>                Path to the exported model.
+
 Database configuration file <db.yml>:
     The database configuration provides details as to where actual files are
     stored. See `pyannote.database.util.FileFinder` docstring for more
@@ -173,6 +184,30 @@ Configuration file:
     >>> for window, embedding in embeddings:
     ...     # do something with embedding
 
+"quantize" mode:
+    Use the "quantize" mode to create a dynamically quantized (int8) version
+    of a pretrained model, for faster inference on CPU:
+
+        <train_dir>/weights/<epoch>.int8.pt
+
+    It can then be used instead of <model.pt> in "apply" mode. The same
+    experiment as in "validate" mode (i.e. equal error rate or coverage at
+    target purity) is run with both original and quantized models on
+    <subset> subset of <database.task.protocol> protocol, as a sanity check.
+
+"export" mode:
+    Use the "export" mode to bundle a pretrained (or quantized) model with
+    its feature extraction and sliding window configuration into a single
+    (traced) TorchScript file:
+
+    >>> from pyannote.audio.embedding.extraction import SequenceEmbedding
+    >>> sequence_embedding = SequenceEmbedding(model='<output.pt>')
+    >>> embeddings = sequence_embedding(test_file)
+
+    Loading an exported model needs neither <experiment_dir> (and its
+    config.yml) nor the training stack: this is what inference workers should
+    use.
+
 """
 
 import torch
@@ -182,7 +217,7 @@ from pathlib import Path
 from docopt import docopt
 from .base import Application
 
-from pyannote.core import Segment, Timeline, Annotation
+from pyannote.core import Timeline
 
 from pyannote.database import FileFinder
 from pyannote.database import get_protocol
@@ -191,7 +226,6 @@ from pyannote.database import get_unique_identifier
 from pyannote.database.protocol import SpeakerDiarizationProtocol
 from pyannote.database.protocol import SpeakerVerificationProtocol
 
-from scipy.cluster.hierarchy import fcluster
 from scipy.cluster.hierarchy import linkage
 from scipy.optimize import minimize_scalar
 
@@ -199,14 +233,15 @@ from pyannote.core.utils.helper import get_class_by_name
 
 from pyannote.core.utils.distance import pdist
 from pyannote.core.utils.distance import cdist
+from pyannote.core.utils.distance import l2_normalize
 from pyannote.audio.features.precomputed import Precomputed
 
-from pyannote.metrics.binary_classification import det_curve
-from pyannote.metrics.diarization import DiarizationPurityCoverageFMeasure
+from pyannote.audio.train.metrics import StreamingDetCurve
 
 from pyannote.audio.embedding.extraction import SequenceEmbedding
 from pyannote.audio.embedding.generators import SpeechSegmentGenerator
 from pyannote.audio.embedding.generators import SpeechTurnSubSegmentGenerator
+from pyannote.audio.embedding.clustering import DendrogramPurityCoverage
 
 
 class SpeakerEmbedding(Application):
@@ -294,6 +329,73 @@ class SpeakerEmbedding(Application):
             segments = (try_with, )
         return hash((uri, segments))
 
+    @staticmethod
+    def get_trial_distances(fX, index1, index2, metric='cosine',
+                            block_size=2**22):
+        """Compute distances between pairs of embeddings
+
+        Parameters
+        ----------
+        fX : (n_embeddings, dimension) np.ndarray
+            Embeddings.
+        index1, index2 : (n_trials, ) np.ndarray
+            Trial #t compares embeddings fX[index1[t]] and fX[index2[t]].
+        metric : str, optional
+            Defaults to 'cosine'.
+        block_size : int, optional
+            Maximum number of entries of the distance matrix computed at once.
+            Defaults to 2^22.
+
+        Returns
+        -------
+        distances : (n_trials, ) np.ndarray
+            distances[t] is the distance for trial #t.
+        """
+
+        distances = np.zeros(len(index1))
+        if len(index1) == 0:
+            return distances
+
+        rows, inverse1 = np.unique(index1, return_inverse=True)
+        cols, inverse2 = np.unique(index2, return_inverse=True)
+        X, Y = fX[rows], fX[cols]
+
+        if metric in ('cosine', 'angular'):
+            X, Y = l2_normalize(X), l2_normalize(Y)
+        elif metric in ('euclidean', 'sqeuclidean'):
+            X_sqnorm = np.sum(X ** 2, axis=1)
+            Y_sqnorm = np.sum(Y ** 2, axis=1)
+
+        # sort trials by row so that each block of rows
+        # maps to a contiguous range of trials
+        trials = np.argsort(inverse1, kind='stable')
+        sorted_rows = inverse1[trials]
+
+        n_rows = max(1, block_size // len(cols))
+        for start in range(0, len(rows), n_rows):
+            end = min(start + n_rows, len(rows))
+
+            if metric in ('cosine', 'angular'):
+                D = np.dot(X[start:end], Y.T)
+                if metric == 'cosine':
+                    D = 1. - D
+                else:
+                    D = np.arccos(np.clip(D, -1., 1.))
+            elif metric in ('euclidean', 'sqeuclidean'):
+                D = X_sqnorm[start:end, np.newaxis] + Y_sqnorm \
+                    - 2 * np.dot(X[start:end], Y.T)
+                D = np.maximum(D, 0.)
+                if metric == 'euclidean':
+                    D = np.sqrt(D)
+            else:
+                D = cdist(X[start:end], Y, metric=metric)
+
+            first, last = np.searchsorted(sorted_rows, [start, end])
+            t = trials[first:last]
+            distances[t] = D[inverse1[t] - start, inverse2[t]]
+
+        return distances
+
     def _validate_epoch_verification(self, epoch, protocol_name,
                                      subset='development',
                                      validation_data=None):
@@ -346,38 +448,44 @@ class SpeakerEmbedding(Application):
         protocol = get_protocol(protocol_name, progress=False,
                                 preprocessors=self.preprocessors_)
 
-        y_true, y_pred, cache = [], [], {}
-
-        for trial in getattr(protocol, '{0}_trial'.format(subset))():
-
-            # compute embedding for file1
-            file1 = trial['file1']
-            hash1 = self.get_hash(file1)
-            if hash1 in cache:
-                emb1 = cache[hash1]
-            else:
-                emb1 = sequence_embedding.crop(file1, file1['try_with'])
-                emb1 = np.mean(np.stack(emb1), axis=0, keepdims=True)
-                cache[hash1] = emb1
-
-            # compute embedding for file2
-            file2 = trial['file2']
-            hash2 = self.get_hash(file2)
-            if hash2 in cache:
-                emb2 = cache[hash2]
-            else:
-                emb2 = sequence_embedding.crop(file2, file2['try_with'])
-                emb2 = np.mean(np.stack(emb2), axis=0, keepdims=True)
-                cache[hash2] = emb2
-
-            # compare embeddings
-            distance = cdist(emb1, emb2, metric=self.metric)[0, 0]
-            y_pred.append(distance)
+        trials = list(getattr(protocol, '{0}_trial'.format(subset))())
+
+        # gather unique (file, try_with) pairs on each side of the trials
+        hashes, files = {}, []
+        index = {'file1': [], 'file2': []}
+        for trial in trials:
+            for key in ['file1', 'file2']:
+                current_file = trial[key]
+                hash_ = self.get_hash(current_file)
+                if hash_ not in hashes:
+                    hashes[hash_] = len(files)
+                    files.append(current_file)
+                index[key].append(hashes[hash_])
+
+        # embed them all at once, grouped by file so that on-the-fly
+        # feature extraction benefits from SequenceLabeling cache
+        order = sorted(range(len(files)),
+                       key=lambda i: get_unique_identifier(files[i]))
+        embeddings = sequence_embedding.crop_batch(
+            [files[i] for i in order], [files[i]['try_with'] for i in order])
+
+        fX = np.zeros((len(files), sequence_embedding.dimension))
+        for i, emb in zip(order, embeddings):
+            if len(emb) == 0:
+                try_with = files[i]['try_with']
+                uri = get_unique_identifier(files[i])
+                msg = (f'No embedding for {try_with} in {uri:s}.')
+                raise ValueError(msg)
+            fX[i] = np.mean(emb, axis=0)
 
-            y_true.append(trial['reference'])
+        y_pred = self.get_trial_distances(fX, np.array(index['file1']),
+                                          np.array(index['file2']),
+                                          metric=self.metric)
+        y_true = [trial['reference'] for trial in trials]
 
-        _, _, _, eer = det_curve(np.array(y_true), np.array(y_pred),
-                                 distances=True)
+        det = StreamingDetCurve(distances=True)
+        det.update(y_true, y_pred)
+        eer = det.eer
 
         return {'metric': 'equal_error_rate',
                 'minimize': True,
@@ -436,8 +544,7 @@ class SpeakerEmbedding(Application):
         protocol = get_protocol(protocol_name, progress=False,
                                 preprocessors=self.preprocessors_)
 
-        Z, t = dict(), dict()
-        min_d, max_d = np.inf, -np.inf
+        evaluator = DendrogramPurityCoverage()
 
         for current_file in getattr(protocol, subset)():
 
@@ -466,51 +573,16 @@ class SpeakerEmbedding(Application):
 
             # apply hierarchical agglomerative clustering
             # all the way up to just one cluster (ie complete dendrogram)
-            D = pdist(np.array(X_), metric=self.metric)
-            min_d = min(np.min(D), min_d)
-            max_d = max(np.max(D), max_d)
-
-            Z[uri] = linkage(D, method='median')
-            t[uri] = np.array(t_)
-
-        def fun(threshold):
-
-            metric = DiarizationPurityCoverageFMeasure(weighted=True)
-
-            for current_file in getattr(protocol, subset)():
-
-                uri = get_unique_identifier(current_file)
-                uem = get_annotated(current_file)
-                reference = current_file['annotation']
-
-                clusters = fcluster(Z[uri], threshold, criterion='distance')
+            Z = linkage(pdist(np.array(X_), metric=self.metric),
+                        method='median') if len(X_) > 1 else np.zeros((0, 4))
+            evaluator.add(reference, t_, Z, uem=uem)
 
-                hypothesis = Annotation(uri=uri)
-                for (start_time, end_time), cluster in zip(t[uri], clusters):
-                    hypothesis[Segment(start_time, end_time)] = cluster
-
-                _ = metric(reference, hypothesis, uem=uem)
-
-            purity, coverage, _ = metric.compute_metrics()
-
-            return purity, coverage
-
-        lower_threshold = min_d
-        upper_threshold = max_d
-        best_threshold = .5 * (lower_threshold + upper_threshold)
-        best_coverage = 0.
-
-        for _ in range(10):
-            current_threshold = .5 * (lower_threshold + upper_threshold)
-            purity, coverage = fun(current_threshold)
-
-            if purity < self.purity:
-                upper_threshold = current_threshold
-            else:
-                lower_threshold = current_threshold
-                if coverage > best_coverage:
-                    best_coverage = coverage
-                    best_threshold = current_threshold
+        # purity (resp. coverage) decreases (resp. increases) with the
+        # threshold: best coverage is reached with the highest threshold
+        # for which purity is still above target
+        _, purity, coverage = evaluator.curve()
+        above = np.where(purity >= self.purity)[0]
+        best_coverage = coverage[above[-1]] if len(above) else 0.
 
         return {'metric': f'coverage@{self.purity:.2f}purity',
                 'minimize': False,
@@ -683,3 +755,64 @@ def main():
         application.duration = duration
 
         application.apply(protocol_name, output_dir, step=step, subset=subset)
+
+    if arguments['quantize']:
+
+        model_pt = Path(arguments['<model.pt>'])
+        model_pt = model_pt.expanduser().resolve(strict=True)
+        epoch = int(model_pt.name.split('.')[0])
+
+        if subset is None:
+            subset = 'development'
+
+        batch_size = int(arguments['--batch'])
+
+        purity = float(arguments['--purity'])
+
+        application = SpeakerEmbedding.from_model_pt(
+            model_pt, db_yml=db_yml, training=False)
+        application.purity = purity
+        application.batch_size = batch_size
+
+        metric = arguments['--metric']
+        if metric is None:
+            metric = getattr(application.task_, 'metric', None)
+            if metric is None:
+                msg = ("Approach has no 'metric' defined. "
+                       "Use '--metric' option to provide one.")
+                raise ValueError(msg)
+        application.metric = metric
+
+        duration = arguments['--duration']
+        if duration is not None:
+            duration = float(duration)
+        application.duration = duration
+
+        metrics = application.quantize(epoch, protocol_name=protocol_name,
+                                       subset=subset)
+
+        print(f"{metrics['metric']} | "
+              f"original = {100 * metrics['original']:g}% | "
+              f"quantized = {100 * metrics['quantized']:g}%")
+
+    if arguments['export']:
+
+        model_pt = Path(arguments['<model.pt>'])
+        model_pt = model_pt.expanduser().resolve(strict=True)
+        epoch = int(model_pt.name.split('.')[0])
+
+        exported_pt = Path(arguments['<output.pt>'])
+        exported_pt = exported_pt.expanduser().resolve(strict=False)
+
+        duration = arguments['--duration']
+        if duration is not None:
+            duration = float(duration)
+
+        step = arguments['--step']
+        if step is not None:
+            step = float(step)
+
+        application = SpeakerEmbedding.from_model_pt(
+            model_pt, db_yml=db_yml, training=False)
+        application.export(epoch, exported_pt=exported_pt,
+                           duration=duration, step=step)
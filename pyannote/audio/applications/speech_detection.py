@@ -33,6 +33,8 @@ Usage:
   pyannote-speech-detection train [options] <experiment_dir> <database.task.protocol>
   pyannote-speech-detection validate [options] [--every=<epoch> --chronological] <train_dir> <database.task.protocol>
   pyannote-speech-detection apply [options] [--step=<step>] <model.pt> <database.task.protocol> <output_dir>
+  pyannote-speech-detection quantize [options] <model.pt> <database.task.protocol>
+  pyannote-speech-detection export [options] [--step=<step>] <model.pt> <output.pt>
   pyannote-speech-detection -h | --help
   pyannote-speech-detection --version
 
@@ -42,8 +44,8 @@ Common options:
                              [default: ~/.pyannote/db.yml]
   --subset=<subset>          Set subset (train|developement|test).
                              Defaults to "train" in "train" mode. Defaults to
-                             "development" in "validate" mode. Defaults to all subsets in
-                             "apply" mode.
+                             "development" in "validate" and "quantize" modes.
+                             Defaults to all subsets in "apply" mode.
   --gpu                      Run on GPUs. Defaults to using CPUs.
   --batch=<size>             Set batch size. Has no effect in "train" mode.
                              [default: 32]
@@ -69,6 +71,13 @@ Common options:
   --step=<step>              Sliding window step, in seconds.
                              Defaults to 25% of window duration.
 
+"quantize" mode:
+  <model.pt>                 Path to the pretrained model.
+
+"export" mode:
+  <model.pt>                 Path to the pretrained (or quantized) model.
+  <output.pt>                Path to the exported model.
+
 Database configuration file <db.yml>:
     The database configuration provides details as to where actual files are
     stored. See `pyannote.database.util.FileFinder` docstring for more
@@ -158,6 +167,29 @@ Configuration file:
 
     >>> raw_scores = precomputed(first_test_file)
     >>> speech_regions = binarizer.apply(raw_scores, dimension=1)
+
+"quantize" mode:
+    Use the "quantize" mode to create a dynamically quantized (int8) version
+    of a pretrained model, for faster inference on CPU:
+
+        <train_dir>/weights/<epoch>.int8.pt
+
+    It can then be used instead of <model.pt> in "apply" mode. Detection
+    error rates of both original and quantized models on <subset> subset
+    of <database.task.protocol> protocol are reported, as a sanity check.
+
+"export" mode:
+    Use the "export" mode to bundle a pretrained (or quantized) model with
+    its feature extraction and sliding window configuration into a single
+    (traced) TorchScript file:
+
+    >>> from pyannote.audio.labeling.extraction import SequenceLabeling
+    >>> sequence_labeling = SequenceLabeling(model='<output.pt>')
+    >>> raw_scores = sequence_labeling(test_file)
+
+    Loading an exported model needs neither <experiment_dir> (and its
+    config.yml) nor the training stack: this is what inference workers should
+    use.
 """
 
 import torch
@@ -414,3 +446,41 @@ def main():
         application.device = device
         application.batch_size = batch_size
         application.apply(protocol_name, output_dir, step=step, subset=subset)
+
+    if arguments['quantize']:
+
+        model_pt = Path(arguments['<model.pt>'])
+        model_pt = model_pt.expanduser().resolve(strict=True)
+        epoch = int(model_pt.name.split('.')[0])
+
+        if subset is None:
+            subset = 'development'
+
+        batch_size = int(arguments['--batch'])
+
+        application = SpeechActivityDetection.from_model_pt(
+            model_pt, db_yml=db_yml, training=False)
+        application.batch_size = batch_size
+        metrics = application.quantize(epoch, protocol_name=protocol_name,
+                                       subset=subset)
+
+        print(f"{metrics['metric']} | "
+              f"original = {100 * metrics['original']:g}% | "
+              f"quantized = {100 * metrics['quantized']:g}%")
+
+    if arguments['export']:
+
+        model_pt = Path(arguments['<model.pt>'])
+        model_pt = model_pt.expanduser().resolve(strict=True)
+        epoch = int(model_pt.name.split('.')[0])
+
+        exported_pt = Path(arguments['<output.pt>'])
+        exported_pt = exported_pt.expanduser().resolve(strict=False)
+
+        step = arguments['--step']
+        if step is not None:
+            step = float(step)
+
+        application = SpeechActivityDetection.from_model_pt(
+            model_pt, db_yml=db_yml, training=False)
+        application.export(epoch, exported_pt=exported_pt, step=step)
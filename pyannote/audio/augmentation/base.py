@@ -27,9 +27,33 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 
+import numpy as np
+
+
 class Augmentation(object):
 
     def __call__(self, waveform, sample_rate):
         return waveform
 
+    def augment_batch(self, waveforms, sample_rate):
+        """Augment a whole batch of waveforms
+
+        Default implementation augments waveforms one after the other.
+        Subclasses are encouraged to provide a vectorized version.
+
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples) numpy array
+            Batch of (mono) waveforms.
+        sample_rate : int
+            Sample rate.
+
+        Returns
+        -------
+        augmented : (batch_size, n_samples) numpy array
+            Batch of augmented waveforms.
+        """
+        return np.stack([self(waveform.reshape(-1, 1), sample_rate)[:, 0]
+                         for waveform in waveforms])
+
 NoAugmentation = Augmentation
@@ -27,6 +27,7 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 
+import tempfile
 import numpy as np
 from pyannote.core import Segment
 from pyannote.audio.features.utils import RawAudio
@@ -50,9 +51,18 @@ class AddNoise(Augmentation):
         Path to `pyannote.database` configuration file.
     snr_min, snr_max : int, optional
         Defines Signal-to-Noise Ratio (SNR) range in dB. Defaults to [5, 20].
+    bank : bool, optional
+        Load (and resample) all noise files once and for all into a
+        contiguous float32 memmap, and generate noise by slicing it (see
+        `load_bank`). Defaults to False (i.e. read noise files on demand).
+    sample_rate : int, optional
+        In `bank` mode, load the bank right away at this sample rate. This
+        is needed for the bank to be shared by (forked) worker processes.
+        Defaults to loading it at the first call.
     """
 
-    def __init__(self, collection=None, db_yml=None, snr_min=5, snr_max=20):
+    def __init__(self, collection=None, db_yml=None, snr_min=5, snr_max=20,
+                 bank=False, sample_rate=None):
         super().__init__()
 
         if collection is None:
@@ -73,8 +83,103 @@ class AddNoise(Augmentation):
             protocol = get_protocol(collection, preprocessors=preprocessors)
             self.files_.extend(protocol.files())
 
-    def normalize(self, waveform):
-        return waveform / (np.sqrt(np.mean(waveform ** 2)) + 1e-8)
+        self.bank = bank
+        if self.bank and sample_rate is not None:
+            self.load_bank(sample_rate)
+
+    def load_bank(self, sample_rate):
+        """Load all noise files into one contiguous float32 memmap
+
+        Each file is resampled to `sample_rate` and normalized by its own RMS
+        before being appended to the bank.
+
+        Parameters
+        ----------
+        sample_rate : int
+            Sample rate.
+
+        It sets the following attributes:
+
+        bank_ : (n_samples, ) numpy memmap
+            Concatenated (normalized) noise files.
+        bank_offset_, bank_length_ : (n_files, ) numpy arrays
+            Index of first sample (in `bank_`) and number of samples of each
+            noise file.
+        bank_rms_ : (n_files, ) numpy array
+            RMS of each noise file (before normalization).
+        bank_sample_rate_ : int
+            Sample rate of `bank_`.
+        """
+
+        raw_audio = RawAudio(sample_rate=sample_rate, mono=True)
+
+        self.bank_file_ = tempfile.TemporaryFile()
+        lengths, rms = [], []
+        for file in self.files_:
+            noise = raw_audio(file).data.astype(np.float32).reshape(-1)
+            if len(noise) == 0:
+                continue
+            rms.append(np.sqrt(np.mean(noise ** 2)))
+            lengths.append(len(noise))
+            self.bank_file_.write((noise / (rms[-1] + 1e-8)).tobytes())
+        self.bank_file_.flush()
+
+        if not lengths:
+            msg = f'Noise collection(s) {self.collection} contain no audio.'
+            raise ValueError(msg)
+
+        self.bank_length_ = np.array(lengths, dtype=np.int64)
+        self.bank_offset_ = np.hstack([[0], np.cumsum(lengths)[:-1]])
+        self.bank_rms_ = np.array(rms, dtype=np.float32)
+        self.bank_ = np.memmap(self.bank_file_, dtype=np.float32, mode='r',
+                               shape=(int(np.sum(lengths)), ))
+        self.bank_sample_rate_ = sample_rate
+
+    def random_noise(self, n_samples, sample_rate):
+        """Get (normalized) noise from the bank
+
+        Noise starts at a random position of a random noise file and continues
+        over the next files (wrapping around the end of the bank) until
+        `n_samples` are covered.
+
+        Parameters
+        ----------
+        n_samples : int
+            Number of samples.
+        sample_rate : int
+            Sample rate.
+
+        Returns
+        -------
+        noise : (n_samples, 1) numpy array
+            Noise.
+        """
+
+        if getattr(self, 'bank_sample_rate_', None) != sample_rate:
+            self.load_bank(sample_rate)
+
+        f = np.random.randint(len(self.bank_length_))
+        start = self.bank_offset_[f] + \
+                np.random.randint(self.bank_length_[f])
+
+        if start + n_samples <= len(self.bank_):
+            noise = self.bank_[start:start + n_samples]
+        else:
+            noise = np.take(self.bank_, np.arange(start, start + n_samples),
+                            mode='wrap')
+
+        return noise.reshape(-1, 1)
+
+    def normalize(self, waveform, axis=None):
+        rms = np.sqrt(np.mean(waveform ** 2, axis=axis, keepdims=True))
+        return waveform / (rms + 1e-8)
+
+    def random_snr(self, size=None):
+        """Draw SNR(s) uniformly in [snr_min, snr_max] and return the
+        corresponding noise amplitude factor(s)"""
+        snr = (self.snr_max - self.snr_min) * \
+              np.random.random_sample(size=size) + self.snr_min
+        return np.exp(-np.log(10) * snr / 20)
 
     def __call__(self, original, sample_rate):
         """Augment original waveform
@@ -92,6 +197,13 @@ class AddNoise(Augmentation):
             (n_samples, n_channels) noise-augmented waveform.
         """
 
+        # select SNR at random
+        alpha = self.random_snr()
+
+        if self.bank:
+            noise = self.random_noise(len(original), sample_rate)
+            return self.normalize(original) + alpha * noise
+
         raw_audio = RawAudio(sample_rate=sample_rate, mono=True)
 
         original_duration = len(original) / sample_rate
@@ -124,8 +236,45 @@ class AddNoise(Augmentation):
         # FIXME: use fade-in between concatenated noises
         noise = np.vstack(noises)
 
-        # select SNR at random
-        snr = (self.snr_max - self.snr_min) * np.random.random_sample() + self.snr_min
-        alpha = np.exp(-np.log(10) * snr / 20)
-
         return self.normalize(original) + alpha * noise
+
+    def augment_batch(self, waveforms, sample_rate):
+        """Augment a whole batch of waveforms
+
+        In `bank` mode, SNRs and noise slices are drawn for all rows at once
+        and the whole batch is augmented in one vectorized operation.
+        Otherwise, waveforms are augmented one after the other.
+
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples) numpy array
+            Batch of (mono) waveforms.
+        sample_rate : int
+            Sample rate.
+
+        Returns
+        -------
+        augmented : (batch_size, n_samples) numpy array
+            Batch of noise-augmented waveforms.
+        """
+
+        if not self.bank:
+            return super().augment_batch(waveforms, sample_rate)
+
+        if getattr(self, 'bank_sample_rate_', None) != sample_rate:
+            self.load_bank(sample_rate)
+
+        batch_size, n_samples = waveforms.shape
+
+        # select SNRs at random
+        alpha = self.random_snr(size=(batch_size, 1)).astype(np.float32)
+
+        # select noise slices at random (one per row)
+        f = np.random.randint(len(self.bank_length_), size=batch_size)
+        starts = self.bank_offset_[f] + \
+                 (np.random.random_sample(size=batch_size) *
+                  self.bank_length_[f]).astype(np.int64)
+        indices = starts[:, np.newaxis] + np.arange(n_samples)
+        noise = np.take(self.bank_, indices, mode='wrap')
+
+        return self.normalize(waveforms, axis=1) + alpha * noise
@@ -49,14 +49,15 @@ class AggTripletLoss(TripletLoss):
     """
 
     def __init__(self, metric='angular', margin=0.2, clamp='positive',
-                 duration=3., sampling='all', parallel=1,
-                 per_label=3, per_fold=None, per_turn=2,
-                 rescale=None):
+                 duration=3., sampling='all', parallel=1, processes=False,
+                 prefetch=8, per_label=3, per_fold=None, per_turn=2,
+                 rescale=None, block_size=2 ** 22):
 
         super(AggTripletLoss, self).__init__(
             duration=duration, metric=metric, margin=margin, clamp=clamp,
             sampling=sampling, per_label=per_label, per_fold=per_fold,
-            parallel=parallel)
+            parallel=parallel, processes=processes, prefetch=prefetch,
+            block_size=block_size)
 
         self.per_turn = per_turn
         self.rescale = rescale
@@ -110,4 +111,5 @@ class AggTripletLoss(TripletLoss):
         return SpeechTurnSubSegmentGenerator(
             feature_extraction, self.duration,
             per_label=self.per_label, per_fold=self.per_fold,
-            per_turn=self.per_turn, parallel=self.parallel)
+            per_turn=self.per_turn, parallel=self.parallel,
+            processes=self.processes, prefetch=self.prefetch)
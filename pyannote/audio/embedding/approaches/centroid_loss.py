@@ -31,6 +31,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from .triplet_loss import TripletLoss
+from .triplet_loss import clamp_delta
 
 
 class Centroids(nn.Module):
@@ -54,10 +55,32 @@ class Centroids(nn.Module):
         return self.embeddings(indices)
 
 class CentroidLoss(TripletLoss):
+    """
+
+    delta = d(sample, own centroid) - d(sample, other centroid)
+
+    Parameters
+    ----------
+    top_k : int, optional
+        Only use the `top_k` nearest (other) centroids of each sample as
+        candidate negatives. This makes the loss scale to training sets with
+        a large number of speakers. Defaults to using all centroids.
+    sampling : {'all', 'hard', 'negative', 'easy'}, optional
+        'all' uses all (candidate) other centroids, 'hard' (or 'negative')
+        only uses the nearest other centroid, 'easy' only uses other
+        centroids that are farther than the sample own centroid. Defaults to
+        'all'.
+
+    See `TripletLoss` for the other parameters.
+    """
 
     CLASSES_TXT = '{log_dir}/classes.txt'
     CENTROIDS_PT = '{log_dir}/weights/{epoch:04d}.centroids.pt'
 
+    def __init__(self, top_k=None, **kwargs):
+        super(CentroidLoss, self).__init__(**kwargs)
+        self.top_k = top_k
+
     def extra_init(self, model, device, checkpoint=None,
                    labels=None):
         """Initialize centroids
@@ -85,8 +108,6 @@ class CentroidLoss(TripletLoss):
         # number of labels in training set
         n_classes = len(labels)
 
-        self.triggers_ = torch.LongTensor(range(n_classes))
-        self.triggers_ = self.triggers_.to(device)
         self.centroids_ = Centroids(n_dimensions, n_classes)
         self.centroids_ = self.centroids_.to(device)
 
@@ -132,13 +153,27 @@ class CentroidLoss(TripletLoss):
             map_location=lambda storage, loc: storage)
         self.centroids_.load_state_dict(centroids_state)
 
-    def cdist(self, fX):
+    def normalize(self, fX):
+        """Unit-normalize embeddings (unless metric is euclidean)"""
+        if self.metric in ('cosine', 'angular'):
+            return F.normalize(fX, p=2, dim=-1, eps=1e-8)
+        return fX
+
+    def to_distance(self, similarity):
+        """Convert cosine similarity to cosine or angular distance"""
+        if self.metric == 'angular':
+            return torch.acos(torch.clamp(similarity, 1e-6 - 1, 1 - 1e-6))
+        return 1. - similarity
+
+    def cdist(self, fX, fC=None):
         """Compute distances to centroids
 
         Parameters
         ----------
         fX : (n, d) torch.Tensor
             Embeddings.
+        fC : (n_classes, d) torch.Tensor, optional
+            Centroids. Defaults to all centroids.
 
         Returns
         -------
@@ -146,26 +181,60 @@ class CentroidLoss(TripletLoss):
             Distance matrix
         """
 
-        fC = self.centroids_(self.triggers_)
+        if fC is None:
+            fC = self.centroids_.embeddings.weight
 
         if self.metric in ('cosine', 'angular'):
+            cosine = torch.mm(self.normalize(fX), self.normalize(fC).t())
+            return self.to_distance(cosine)
 
-            X_norm = torch.norm(fX, 2, 1, keepdim=True)
-            fX_ = fX / X_norm
+        if self.metric == 'euclidean':
+            squared = torch.sum(fX ** 2, dim=1, keepdim=True) + \
+                      torch.sum(fC ** 2, dim=1) - 2. * torch.mm(fX, fC.t())
+            return torch.sqrt(torch.clamp(squared, min=1e-12))
 
-            C_norm = torch.norm(fC, 2, 1, keepdim=True)
-            fC_ = fC / C_norm
+    def paired_distances(self, fX, fC):
+        """Compute distances between embeddings and centroids, element-wise
 
-            cosine = torch.mm(fX_, fC_.t())
+        Parameters
+        ----------
+        fX : (..., d) torch.Tensor
+            Embeddings.
+        fC : (..., d) torch.Tensor
+            Centroids (broadcastable with `fX`).
 
-            if self.metric == 'angular':
-                return torch.acos(torch.clamp(cosine, 1e-6 - 1, 1 - 1e-6))
+        Returns
+        -------
+        distances : (...) torch.Tensor
+        """
 
-            return 1. - cosine
+        if self.metric in ('cosine', 'angular'):
+            cosine = torch.sum(self.normalize(fX) * self.normalize(fC),
+                               dim=-1)
+            return self.to_distance(cosine)
 
         if self.metric == 'euclidean':
-            raise NotImplementedError('')
-            # return F.pairwise_distance(fX, fC, p=2, eps=1e-6)
+            squared = torch.sum((fX - fC) ** 2, dim=-1)
+            return torch.sqrt(torch.clamp(squared, min=1e-12))
+
+    def get_mask(self, y, distances):
+        """Mask of (sample, other centroid) pairs
+
+        Parameters
+        ----------
+        y : (n, ) torch.Tensor
+            Index of each sample own centroid.
+        distances : (n, n_classes) torch.Tensor
+            Distance matrix
+
+        Returns
+        -------
+        mask : (n, n_classes) torch.Tensor
+            mask[i, c] is True when `c` is not the centroid of sample `i`.
+        """
+        mask = torch.ones_like(distances, dtype=torch.bool)
+        mask[torch.arange(len(y), device=y.device), y] = False
+        return mask
 
     def batch_all(self, y, distances):
         """Build all possible (sample, centroid, other centroid)
@@ -179,38 +248,60 @@ class CentroidLoss(TripletLoss):
 
         Returns
         -------
-        samples, positives, negatives : list of int
+        samples, positives, negatives : torch.Tensor
             Triplets indices.
         """
+        y = torch.as_tensor(y, dtype=torch.int64, device=distances.device)
+        samples, negatives = self.get_mask(y, distances).nonzero().t()
+        return samples, y[samples], negatives
+
+    def batch_easy(self, y, distances):
+        """Build (sample, centroid, other centroid) triplets such that other
+        centroid is farther than sample own centroid"""
+        y = torch.as_tensor(y, dtype=torch.int64, device=distances.device)
+        d = distances.detach()
+        positive = torch.gather(d, 1, y.view(-1, 1))
+        easy = self.get_mask(y, d) & (d >= positive)
+        samples, negatives = easy.nonzero().t()
+        return samples, y[samples], negatives
+
+    def batch_hard(self, y, distances):
+        """Build (sample, centroid, nearest other centroid) triplets"""
+        y = torch.as_tensor(y, dtype=torch.int64, device=distances.device)
+        d = distances.detach()
+        negatives = torch.argmin(
+            d.masked_fill(~self.get_mask(y, d), np.inf), dim=1)
+        return torch.arange(len(y), device=y.device), y, negatives
+
+    batch_negative = batch_hard
+
+    def nearest_negatives(self, y, distances, k):
+        """Get `k` nearest other centroids of each sample
 
-        samples, positives, negatives = [], [], []
-
-        for sample, positive_centroid in enumerate(y):
-            for negative_centroid in range(self.centroids_.n_classes):
-                if negative_centroid == positive_centroid:
-                    continue
-                samples.append(sample)
-                positives.append(positive_centroid)
-                negatives.append(negative_centroid)
+        Parameters
+        ----------
+        y : (n, ) torch.Tensor
+            Index of each sample own centroid.
+        distances : (n, n_classes) torch.Tensor
+            Distance matrix
+        k : int
+            Number of negatives.
 
-        return samples, positives, negatives
+        Returns
+        -------
+        negatives : (n, k) torch.Tensor
+            Indices of nearest other centroids (sorted by distance).
+        """
+        d = distances.detach().masked_fill(~self.get_mask(y, distances),
+                                           np.inf)
+        k = min(k, d.shape[1] - 1)
+        _, negatives = torch.topk(d, k, dim=1, largest=False, sorted=True)
+        return negatives
 
     def centroid_loss(self, distances, samples, positives, negatives):
 
         delta = distances[samples, positives] - distances[samples, negatives]
-
-        # clamp triplet loss
-        if self.clamp == 'positive':
-            loss = torch.clamp(delta + self.margin_, min=0)
-
-        elif self.clamp == 'softmargin':
-            loss = torch.log1p(torch.exp(delta))
-
-        elif self.clamp == 'sigmoid':
-            # TODO. tune this "10" hyperparameter
-            # TODO. log-sigmoid
-            loss = torch.sigmoid(10 * (delta + self.margin_))
-
+        loss, _ = clamp_delta(delta, self.clamp, self.margin_)
         return loss
 
     def batch_loss(self, batch, model, device, writer=None, **kwargs):
@@ -240,17 +331,44 @@ class CentroidLoss(TripletLoss):
         batch = self.aggregate(batch)
 
         fX = batch['fX']
-        y = batch['y']
+        y = torch.as_tensor(np.asarray(batch['y']), dtype=torch.int64,
+                            device=fX.device)
+
+        # dense (sample, other centroid) triplets
+        if self.top_k is None and self.sampling in ('all', 'easy'):
+
+            # pre-compute distances to centroids
+            distances = self.cdist(fX)
+            positive = torch.gather(distances, 1, y.view(-1, 1))
+
+            mask = self.get_mask(y, distances)
+            if self.sampling == 'easy':
+                mask &= distances.detach() >= positive.detach()
+
+            loss, _ = clamp_delta(positive - distances, self.clamp,
+                                  self.margin_)
+            loss = loss.masked_fill(~mask, 0.)
+            return torch.sum(loss) / mask.sum().to(loss.dtype)
+
+        # select candidate negatives among nearest other centroids
+        # (distances to centroids are not needed for back-propagation)
+        with torch.no_grad():
+            distances = self.cdist(fX)
+        k = 1 if self.sampling in ('hard', 'negative') else self.top_k
+        negatives = self.nearest_negatives(y, distances, k)
 
-        # pre-compute distances to centroids
-        distances = self.cdist(fX)
+        # only compute (differentiable) distances to selected centroids
+        fC = self.centroids_.embeddings.weight
+        positive = self.paired_distances(fX, fC[y])
+        negative = self.paired_distances(fX.unsqueeze(1), fC[negatives])
 
-        # sample (sample, centroid, other centroid) triplets
-        triplets = getattr(self, 'batch_{0}'.format(self.sampling))
-        samples, positives, negatives = triplets(y, distances)
+        delta = positive.unsqueeze(1) - negative
+        loss, _ = clamp_delta(delta, self.clamp, self.margin_)
 
-        # compute loss for each (sample, centroid, other centroid) triplet
-        losses = self.centroid_loss(distances, samples, positives, negatives)
+        if self.sampling == 'easy':
+            mask = negative.detach() >= positive.detach().unsqueeze(1)
+            loss = loss.masked_fill(~mask, 0.)
+            return torch.sum(loss) / mask.sum().to(loss.dtype)
 
         # average over all triplets
-        return torch.mean(losses)
+        return torch.mean(loss)
@@ -80,8 +80,14 @@ class Softmax(Trainer):
         Number of days per epoch. Defaults to 7 (a week).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     CLASSES_TXT = '{log_dir}/classes.txt'
@@ -89,7 +95,7 @@ class Softmax(Trainer):
 
     def __init__(self, duration=None, min_duration=None, max_duration=None,
                  per_label=1, per_fold=None, per_epoch=7, parallel=1,
-                 label_min_duration=0.):
+                 processes=False, prefetch=8, label_min_duration=0.):
         super().__init__()
 
         self.per_fold = per_fold
@@ -102,6 +108,8 @@ class Softmax(Trainer):
         self.max_duration = max_duration
 
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
 
         self.loss_ = nn.NLLLoss()
 
@@ -121,7 +129,8 @@ class Softmax(Trainer):
             per_label=self.per_label, per_fold=self.per_fold,
             per_epoch=self.per_epoch, duration=self.duration,
             min_duration=self.min_duration,
-            max_duration=self.max_duration, parallel=self.parallel)
+            max_duration=self.max_duration, parallel=self.parallel,
+            processes=self.processes, prefetch=self.prefetch)
 
     def extra_init(self, model, device, checkpoint=None,
                    labels=None):
@@ -203,7 +212,7 @@ class Softmax(Trainer):
 
         fX = self.forward(batch, model, device)
         y_pred = self.classifier_(fX)
-        y = torch.tensor(np.stack(batch['y'])).to(device)
+        y = self.to_tensor(batch['y'], device, dtype=np.int64)
         return self.loss_(y_pred, y)
 
     def on_epoch_end(self, iteration, checkpoint, **kwargs):
@@ -33,14 +33,126 @@ from pyannote.audio.embedding.generators import SpeechSegmentGenerator
 from pyannote.audio.embedding.generators import SessionWiseSpeechSegmentGenerator
 from pyannote.audio.embedding.generators import UnsupervisedSpeechSegmentGenerator
 
-from pyannote.core.utils.distance import to_condensed
-from pyannote.core.utils.distance import pdist
-from scipy.spatial.distance import squareform
-from pyannote.metrics.binary_classification import det_curve
+from pyannote.audio.train.metrics import StreamingDetCurve
 from collections import deque
 from pyannote.audio.train.trainer import Trainer
 
 
+def clamp_delta(delta, clamp, margin):
+    """Clamp raw triplet loss
+
+    Parameters
+    ----------
+    delta : torch.Tensor
+        Raw triplet loss d(anchor, positive) - d(anchor, negative).
+    clamp : {'positive', 'sigmoid', 'softmargin'}
+        Clamping function.
+    margin : float
+        Margin.
+
+    Returns
+    -------
+    loss : torch.Tensor
+        Clamped triplet loss.
+    gradient : torch.Tensor
+        Derivative of `loss` with respect to `delta`.
+    """
+
+    if clamp == 'positive':
+        loss = torch.clamp(delta + margin, min=0)
+        gradient = (delta + margin > 0).to(delta.dtype)
+
+    elif clamp == 'softmargin':
+        loss = F.softplus(delta)
+        gradient = torch.sigmoid(delta)
+
+    elif clamp == 'sigmoid':
+        loss = torch.sigmoid(10 * (delta + margin))
+        gradient = 10 * loss * (1 - loss)
+
+    return loss, gradient
+
+
+def iter_anchor_blocks(distances, positives, valid, negative, block_size):
+    """Iterate over (anchor, positive, negative) delta tensors by blocks
+
+    Parameters
+    ----------
+    distances : (n, n) torch.Tensor
+        Square pairwise distance matrix.
+    positives : (n, n_positives) torch.Tensor
+        positives[a] contains indices of positives of anchor a.
+    valid : (n, n_positives) torch.Tensor
+        Boolean mask of actual positives (anchors with less than
+        `n_positives` positives are padded with invalid ones).
+    negative : (n, n) torch.Tensor
+        Boolean mask of valid (anchor, negative) pairs.
+    block_size : int
+        Maximum number of elements in each delta tensor.
+
+    Yields
+    ------
+    start, end : int
+        Anchors of current block are those in range(start, end).
+    delta : (end - start, n_positives, n) torch.Tensor
+        delta[a, p, q] = d(start + a, positives[start + a, p])
+                         - d(start + a, q)
+    mask : (end - start, n_positives, n) torch.Tensor
+        Boolean mask of valid triplets.
+    """
+
+    n, n_positives = positives.shape
+    n_anchors = max(1, block_size // max(1, n_positives * n))
+    for start in range(0, n, n_anchors):
+        end = min(n, start + n_anchors)
+        d = distances[start:end]
+        d_positive = torch.gather(d, 1, positives[start:end])
+        delta = d_positive.unsqueeze(2) - d.unsqueeze(1)
+        mask = valid[start:end].unsqueeze(2) & \
+               negative[start:end].unsqueeze(1)
+        yield start, end, delta, mask
+
+
+class BatchAllTripletLoss(torch.autograd.Function):
+    """Sum of (clamped) triplet losses over all valid triplets
+
+    Both forward and backward passes process anchors by blocks so that peak
+    memory does not depend on the total number of triplets (intermediate
+    delta tensors are recomputed during the backward pass instead of being
+    kept in memory).
+    """
+
+    @staticmethod
+    def forward(ctx, distances, positives, valid, negative, clamp, margin,
+                block_size):
+        ctx.save_for_backward(distances, positives, valid, negative)
+        ctx.clamp, ctx.margin, ctx.block_size = clamp, margin, block_size
+
+        total = distances.new_zeros(())
+        for _, _, delta, mask in iter_anchor_blocks(
+                distances, positives, valid, negative, block_size):
+            loss, _ = clamp_delta(delta, clamp, margin)
+            total += torch.sum(loss.masked_fill(~mask, 0.))
+        return total
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        distances, positives, valid, negative = ctx.saved_tensors
+
+        grad = torch.zeros_like(distances)
+        for start, end, delta, mask in iter_anchor_blocks(
+                distances, positives, valid, negative, ctx.block_size):
+            _, gradient = clamp_delta(delta, ctx.clamp, ctx.margin)
+            gradient = gradient.masked_fill(~mask, 0.)
+            # d(anchor, positive) contributes with a plus sign...
+            grad[start:end].scatter_add_(1, positives[start:end],
+                                         gradient.sum(dim=2))
+            # ... and d(anchor, negative) with a minus sign
+            grad[start:end] -= gradient.sum(dim=1)
+
+        return grad * grad_output, None, None, None, None, None, None
+
+
 class TripletLoss(Trainer):
     """
 
@@ -97,14 +209,25 @@ class TripletLoss(Trainer):
         other speech turns (whatever its label).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
+    block_size : int, optional
+        With 'all' sampling, triplet losses are computed by blocks of anchors
+        and this is the maximum number of triplets in each block. It bounds
+        the peak memory used by the loss. Defaults to 2 ** 22.
     """
 
     def __init__(self, duration=None, min_duration=None, max_duration=None,
                  metric='cosine', margin=0.2, clamp='positive',
                  sampling='all', per_label=3, per_fold=None, per_epoch=7,
-                 parallel=1, variant='corpus', label_min_duration=0.):
+                 parallel=1, processes=False, prefetch=8, variant='corpus',
+                 label_min_duration=0., block_size=2 ** 22):
 
         super(TripletLoss, self).__init__()
 
@@ -138,6 +261,10 @@ class TripletLoss(Trainer):
         self.max_duration = max_duration
 
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
+
+        self.block_size = block_size
 
     @property
     def max_distance(self):
@@ -152,8 +279,8 @@ class TripletLoss(Trainer):
             msg = "'metric' must be one of {'euclidean', 'cosine', 'angular'}."
             raise ValueError(msg)
 
-    def pdist(self, fX):
-        """Compute pdist à-la scipy.spatial.distance.pdist
+    def pairwise_distances(self, fX):
+        """Compute pairwise distance matrix
 
         Parameters
         ----------
@@ -162,63 +289,112 @@ class TripletLoss(Trainer):
 
         Returns
         -------
-        distances : (n * (n-1) / 2,) torch.Tensor
-            Condensed pairwise distance matrix
+        distances : (n, n) torch.Tensor
+            Square pairwise distance matrix
         """
 
-        n_sequences, _ = fX.size()
-        distances = []
+        if self.metric in ('cosine', 'angular'):
+            fX = F.normalize(fX, p=2, dim=1, eps=1e-8)
+            cosine = torch.mm(fX, fX.t())
 
-        for i in range(n_sequences - 1):
+            if self.metric == 'angular':
+                return torch.acos(torch.clamp(cosine, -1 + 1e-6, 1 - 1e-6))
 
-            if self.metric in ('cosine', 'angular'):
-                d = 1. - F.cosine_similarity(
-                    fX[i, :].expand(n_sequences - 1 - i, -1),
-                    fX[i+1:, :], dim=1, eps=1e-8)
+            return 1. - cosine
 
-                if self.metric == 'angular':
-                    d = torch.acos(torch.clamp(1. - d, -1 + 1e-6, 1 - 1e-6))
+        elif self.metric == 'euclidean':
+            squared_norm = torch.sum(fX ** 2, dim=1, keepdim=True)
+            squared = squared_norm + squared_norm.t() - \
+                      2. * torch.mm(fX, fX.t())
+            # clamping also prevents infinite gradient on the diagonal
+            return torch.sqrt(torch.clamp(squared, min=1e-12))
 
-            elif self.metric == 'euclidean':
-                d = F.pairwise_distance(
-                    fX[i, :].expand(n_sequences - 1 - i, -1),
-                    fX[i+1:, :], p=2, eps=1e-06).view(-1)
+    def pdist(self, fX):
+        """Compute pdist à-la scipy.spatial.distance.pdist
 
-            distances.append(d)
+        Parameters
+        ----------
+        fX : (n, d) torch.Tensor
+            Embeddings.
 
-        return torch.cat(distances)
+        Returns
+        -------
+        distances : (n * (n-1) / 2,) torch.Tensor
+            Condensed pairwise distance matrix
+        """
 
+        n_sequences, _ = fX.size()
+        i, j = np.triu_indices(n_sequences, k=1)
+        i = torch.from_numpy(i).to(fX.device)
+        j = torch.from_numpy(j).to(fX.device)
+        return self.pairwise_distances(fX)[i, j]
 
-    def batch_easy(self, y, distances):
-        """Build easy triplets"""
+    def squareform(self, distances):
+        """Convert condensed distance matrix to square distance matrix
 
-        anchors, positives, negatives = [], [], []
+        Square distance matrices are returned unchanged.
+        """
 
-        distances = squareform(self.to_numpy(distances))
+        if distances.dim() == 2:
+            return distances
 
-        for anchor, y_anchor in enumerate(y):
-            for positive, y_positive in enumerate(y):
+        n = int(.5 * (1 + np.sqrt(1 + 8 * len(distances))))
+        i, j = np.triu_indices(n, k=1)
+        i = torch.from_numpy(i).to(distances.device)
+        j = torch.from_numpy(j).to(distances.device)
+        square = distances.new_zeros((n, n))
+        square[i, j] = distances
+        square[j, i] = distances
+        return square
 
-                # if same embedding or different labels, skip
-                if (anchor == positive) or (y_anchor != y_positive):
-                    continue
+    def get_masks(self, y, device=None):
+        """Get label equality masks
 
-                d = distances[anchor, positive]
+        Parameters
+        ----------
+        y : (n, ) array-like
+            Sequence labels.
+        device : torch.device, optional
+            Defaults to CPU.
 
-                for negative, y_negative in enumerate(y):
+        Returns
+        -------
+        same : (n, n) torch.Tensor
+            same[i, j] is True when i and j share the same label.
+        positive : (n, n) torch.Tensor
+            Same as `same` except for the diagonal (always False).
+        """
+        _, y = np.unique(np.asarray(y), return_inverse=True)
+        y = torch.from_numpy(y.reshape(-1)).to(device)
+        same = y.view(-1, 1) == y.view(1, -1)
+        eye = torch.eye(len(y), device=device, dtype=torch.bool)
+        return same, same & ~eye
 
-                    if y_negative == y_anchor:
-                        continue
+    def batch_easy(self, y, distances):
+        """Build easy triplets
 
-                    if d > distances[anchor, negative]:
-                        continue
+        Parameters
+        ----------
+        y : list
+            Sequence labels.
+        distances : torch.Tensor
+            Square (or condensed) pairwise distance matrix
 
-                    anchors.append(anchor)
-                    positives.append(positive)
-                    negatives.append(negative)
+        Returns
+        -------
+        anchors, positives, negatives : torch.Tensor
+            Triplets indices.
+        """
 
-        return anchors, positives, negatives
+        distances = self.squareform(distances).detach()
+        same, positive = self.get_masks(y, device=distances.device)
 
+        anchors, positives = positive.nonzero().t()
+        easy = ~same[anchors] & \
+               (distances[anchors] >= distances[anchors, positives][:, None])
+        pairs, negatives = easy.nonzero().t()
+
+        return anchors[pairs], positives[pairs], negatives
 
     def batch_hard(self, y, distances):
         """Build triplet with both hardest positive and hardest negative
@@ -227,38 +403,31 @@ class TripletLoss(Trainer):
         ----------
         y : list
             Sequence labels.
-        distances : (n * (n-1) / 2,) torch.Tensor
-            Condensed pairwise distance matrix
+        distances : torch.Tensor
+            Square (or condensed) pairwise distance matrix
 
         Returns
         -------
-        anchors, positives, negatives : list of int
+        anchors, positives, negatives : torch.Tensor
             Triplets indices.
         """
 
-        anchors, positives, negatives = [], [], []
-
-        distances = squareform(self.to_numpy(distances))
-        y = np.array(y)
-
-        for anchor, y_anchor in enumerate(y):
+        distances = self.squareform(distances).detach()
+        same, positive = self.get_masks(y, device=distances.device)
 
-            d = distances[anchor]
+        # hardest positive
+        hardest_positive = torch.argmax(
+            distances.masked_fill(~positive, -np.inf), dim=1)
 
-            # hardest positive
-            pos = np.where(y == y_anchor)[0]
-            pos = [p for p in pos if p != anchor]
-            positive = int(pos[np.argmax(d[pos])])
+        # hardest negative
+        hardest_negative = torch.argmin(
+            distances.masked_fill(same, np.inf), dim=1)
 
-            # hardest negative
-            neg = np.where(y != y_anchor)[0]
-            negative = int(neg[np.argmin(d[neg])])
+        # skip anchors without any positive or negative
+        valid = positive.any(dim=1) & ~same.all(dim=1)
+        anchors = valid.nonzero().view(-1)
 
-            anchors.append(anchor)
-            positives.append(positive)
-            negatives.append(negative)
-
-        return anchors, positives, negatives
+        return anchors, hardest_positive[anchors], hardest_negative[anchors]
 
     def batch_negative(self, y, distances):
         """Build triplet with hardest negative
@@ -267,36 +436,27 @@ class TripletLoss(Trainer):
         ----------
         y : list
             Sequence labels.
-        distances : (n * (n-1) / 2,) torch.Tensor
-            Condensed pairwise distance matrix
+        distances : torch.Tensor
+            Square (or condensed) pairwise distance matrix
 
         Returns
         -------
-        anchors, positives, negatives : list of int
+        anchors, positives, negatives : torch.Tensor
             Triplets indices.
         """
 
-        anchors, positives, negatives = [], [], []
-
-        distances = squareform(self.to_numpy(distances))
-        y = np.array(y)
-
-        for anchor, y_anchor in enumerate(y):
-
-            # hardest negative
-            d = distances[anchor]
-            neg = np.where(y != y_anchor)[0]
-            negative = int(neg[np.argmin(d[neg])])
+        distances = self.squareform(distances).detach()
+        same, positive = self.get_masks(y, device=distances.device)
 
-            for positive in np.where(y == y_anchor)[0]:
-                if positive == anchor:
-                    continue
+        # hardest negative
+        hardest_negative = torch.argmin(
+            distances.masked_fill(same, np.inf), dim=1)
 
-                anchors.append(anchor)
-                positives.append(positive)
-                negatives.append(negative)
+        # skip anchors without any negative
+        positive = positive & ~same.all(dim=1, keepdim=True)
+        anchors, positives = positive.nonzero().t()
 
-        return anchors, positives, negatives
+        return anchors, positives, hardest_negative[anchors]
 
     def batch_all(self, y, distances):
         """Build all possible triplet
@@ -305,34 +465,70 @@ class TripletLoss(Trainer):
         ----------
         y : list
             Sequence labels.
-        distances : (n * (n-1) / 2,) torch.Tensor
-            Condensed pairwise distance matrix
+        distances : torch.Tensor
+            Square (or condensed) pairwise distance matrix
 
         Returns
         -------
-        anchors, positives, negatives : list of int
+        anchors, positives, negatives : torch.Tensor
             Triplets indices.
         """
 
-        anchors, positives, negatives = [], [], []
+        same, positive = self.get_masks(y, device=distances.device)
+
+        anchors, positives = positive.nonzero().t()
+        pairs, negatives = (~same[anchors]).nonzero().t()
+
+        return anchors[pairs], positives[pairs], negatives
+
+    def batch_all_loss(self, y, distances, return_delta=False):
+        """Compute average triplet loss over all possible triplets
+
+        Same as using `batch_all` followed by `triplet_loss` except triplets
+        are never enumerated explicitly: losses are computed on masked
+        (anchor, positive, negative) delta tensors, by blocks of anchors
+        (see `block_size`). Only actual positives of each anchor are
+        considered, so that memory and computation scale with
+        n x per_label x n rather than n ** 3.
+
+        Parameters
+        ----------
+        y : list
+            Sequence labels.
+        distances : (n, n) torch.Tensor
+            Square pairwise distance matrix
+        return_delta : bool, optional
+            Return delta before clamping.
+
+        Returns
+        -------
+        loss : torch.Tensor
+            Average triplet loss.
+        """
 
-        for anchor, y_anchor in enumerate(y):
-            for positive, y_positive in enumerate(y):
+        distances = self.squareform(distances)
+        same, positive = self.get_masks(y, device=distances.device)
+        negative = ~same
 
-                # if same embedding or different labels, skip
-                if (anchor == positive) or (y_anchor != y_positive):
-                    continue
+        n_triplets = torch.sum(positive.sum(dim=1) * negative.sum(dim=1))
 
-                for negative, y_negative in enumerate(y):
+        # indices of positives of each anchor (padded with invalid ones)
+        n_positives = max(1, int(positive.sum(dim=1).max()))
+        valid, positives = torch.topk(positive.to(distances.dtype),
+                                      n_positives, dim=1)
+        valid = valid > 0
 
-                    if y_negative == y_anchor:
-                        continue
+        total = BatchAllTripletLoss.apply(distances, positives, valid,
+                                          negative, self.clamp, self.margin_,
+                                          self.block_size)
+        loss = total / n_triplets.to(total.dtype)
 
-                    anchors.append(anchor)
-                    positives.append(positive)
-                    negatives.append(negative)
+        if not return_delta:
+            return loss
 
-        return anchors, positives, negatives
+        deltas = [delta[mask] for _, _, delta, mask in iter_anchor_blocks(
+            distances.detach(), positives, valid, negative, self.block_size)]
+        return loss, torch.cat(deltas).view((-1, 1))
 
     def triplet_loss(self, distances, anchors, positives, negatives,
                      return_delta=False):
@@ -341,8 +537,8 @@ class TripletLoss(Trainer):
         Parameters
         ----------
         distances : torch.Tensor
-            Condensed matrix of pairwise distances.
-        anchors, positives, negatives : list of int
+            Square (or condensed) matrix of pairwise distances.
+        anchors, positives, negatives : torch.Tensor or list of int
             Triplets indices.
         return_delta : bool, optional
             Return delta before clamping.
@@ -353,13 +549,24 @@ class TripletLoss(Trainer):
             Triplet loss.
         """
 
-        # estimate total number of embeddings from pdist shape
-        n = int(.5 * (1 + np.sqrt(1 + 8 * len(distances))))
+        anchors, positives, negatives = (
+            torch.as_tensor(indices, dtype=torch.int64,
+                            device=distances.device)
+            for indices in (anchors, positives, negatives))
+
+        # convert (anchor, other) indices into indices
+        # of the flattened square (or condensed) matrix
+        if distances.dim() == 2:
+            n = len(distances)
+            pos = anchors * n + positives
+            neg = anchors * n + negatives
+            distances = distances.view(-1)
 
-        # convert indices from squared matrix
-        # to condensed matrix referential
-        pos = to_condensed(n, anchors, positives)
-        neg = to_condensed(n, anchors, negatives)
+        else:
+            # estimate total number of embeddings from pdist shape
+            n = int(.5 * (1 + np.sqrt(1 + 8 * len(distances))))
+            pos = self.to_condensed(n, anchors, positives)
+            neg = self.to_condensed(n, anchors, negatives)
 
         # compute raw triplet loss (no margin, no clamping)
         # the lower, the better
@@ -383,6 +590,12 @@ class TripletLoss(Trainer):
         else:
             return loss
 
+    @staticmethod
+    def to_condensed(n, i, j):
+        """Same as `pyannote.core.utils.distance.to_condensed` for tensors"""
+        i, j = torch.min(i, j), torch.max(i, j)
+        return n * i - i * (i + 1) // 2 + j - i - 1
+
     def get_batch_generator(self, feature_extraction):
         """Get batch generator
 
@@ -412,21 +625,22 @@ class TripletLoss(Trainer):
                 per_label=self.per_label, per_fold=self.per_fold,
                 per_epoch=self.per_epoch, duration=self.duration,
                 min_duration=self.min_duration, max_duration=self.max_duration,
-                parallel=self.parallel)
+                parallel=self.parallel, processes=self.processes,
+                prefetch=self.prefetch)
 
         elif self.variant == 'unsupervised':
 
             return UnsupervisedSpeechSegmentGenerator(
                 feature_extraction, per_fold=self.per_fold,
                 per_epoch=self.per_epoch, duration=self.duration,
-                parallel=self.parallel)
+                parallel=self.parallel, processes=self.processes,
+                prefetch=self.prefetch)
 
     def aggregate(self, batch):
         return batch
 
     def on_train_start(self, model, batches_per_epoch=None, **kwargs):
-        self.log_positive_ = deque([], maxlen=batches_per_epoch)
-        self.log_negative_ = deque([], maxlen=batches_per_epoch)
+        self.log_det_ = StreamingDetCurve(distances=True)
         self.log_delta_ = deque([], maxlen=batches_per_epoch)
         self.log_norm_ = deque([], maxlen=batches_per_epoch)
 
@@ -465,27 +679,40 @@ class TripletLoss(Trainer):
         y = batch['y']
 
         # pre-compute pairwise distances
-        distances = self.pdist(fX)
+        distances = self.pairwise_distances(fX)
 
-        # sample triplets
-        triplets = getattr(self, 'batch_{0}'.format(self.sampling))
-        anchors, positives, negatives = triplets(y, distances)
+        # average over all triplets (without enumerating them)
+        if self.sampling == 'all' and writer is None:
+            loss = self.batch_all_loss(y, distances)
+
+        elif self.sampling == 'all':
+            loss, deltas = self.batch_all_loss(y, distances,
+                                               return_delta=True)
+
+        else:
 
-        # compute loss for each triplet
-        losses, deltas, _, _ = self.triplet_loss(
-            distances, anchors, positives, negatives,
-            return_delta=True)
+            # sample triplets
+            triplets = getattr(self, 'batch_{0}'.format(self.sampling))
+            anchors, positives, negatives = triplets(y, distances)
+
+            # compute loss for each triplet
+            losses, deltas, _, _ = self.triplet_loss(
+                distances, anchors, positives, negatives,
+                return_delta=True)
+
+            # average over all triplets
+            loss = torch.mean(losses)
 
         if writer is not None:
-            pdist_npy = self.to_numpy(distances)
-            delta_npy = self.to_numpy(deltas)
-            same_speaker = pdist(y.reshape((-1, 1)), metric='equal')
-            self.log_positive_.append(pdist_npy[np.where(same_speaker)])
-            self.log_negative_.append(pdist_npy[np.where(~same_speaker)])
-            self.log_delta_.append(delta_npy)
+            same, _ = self.get_masks(y, device=distances.device)
+            upper = torch.ones_like(same).triu(diagonal=1)
+            self.log_det_.update(
+                True, self.to_numpy(distances[upper & same]))
+            self.log_det_.update(
+                False, self.to_numpy(distances[upper & ~same]))
+            self.log_delta_.append(self.to_numpy(deltas))
 
-        # average over all triplets
-        return torch.mean(losses)
+        return loss
 
     def on_epoch_end(self, iteration, checkpoint, writer=None, **kwargs):
         """Log a bunch of statistics at the end of current epoch
@@ -504,23 +731,17 @@ class TripletLoss(Trainer):
             return
 
         # log intra class vs. inter class distance distributions
-        log_positive = np.hstack(self.log_positive_)
-        log_negative = np.hstack(self.log_negative_)
-        writer.add_histogram(
-            'train/distance/intra_class', log_positive,
-            global_step=iteration, bins='doane')
-        writer.add_histogram(
-            'train/distance/inter_class', log_negative,
-            global_step=iteration, bins='doane')
+        writer.add_histogram_raw(
+            'train/distance/intra_class', global_step=iteration,
+            **self.log_det_.histogram(positive=True))
+        writer.add_histogram_raw(
+            'train/distance/inter_class', global_step=iteration,
+            **self.log_det_.histogram(positive=False))
 
         # log same/different experiment on training samples
-        _, _, _, eer = det_curve(
-            np.hstack([np.ones(len(log_positive)),
-                       np.zeros(len(log_negative))]),
-            np.hstack([log_positive, log_negative]),
-            distances=True)
-        writer.add_scalar('train/eer', eer,
+        writer.add_scalar('train/eer', self.log_det_.eer,
                           global_step=iteration)
+        self.log_det_.reset()
 
         # log raw triplet loss (before max(0, .))
         log_delta = np.vstack(self.log_delta_)
@@ -60,7 +60,7 @@ class WTFTripletLoss(TripletLoss):
         time. Defaults to sample triplets from the whole speaker set.
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most 8 batches.
         Set `parallel` to 0 to not use background generators.
     """
 
@@ -294,3 +294,188 @@ class HDBSCANClustering(object):
         cluster_labels[undefined] = closest_cluster
 
         return cluster_labels
+
+
+class DendrogramPurityCoverage(object):
+    """Purity and coverage of dendrograms, for all thresholds at once
+
+    Each file contributes one complete dendrogram of its reference speech
+    turns. Instead of flattening every dendrogram (and re-building and
+    evaluating the resulting annotations) for each candidate threshold,
+    the cooccurrence of each speech turn with each reference label is
+    computed once, and (weighted) purity and coverage are updated
+    incrementally as clusters are merged, in increasing threshold order.
+
+    Results are the same as those of `DiarizationPurityCoverageFMeasure(
+    weighted=True)` applied to `fcluster(dendrogram, threshold,
+    criterion='distance')` for every threshold.
+
+    Usage
+    -----
+    >>> evaluator = DendrogramPurityCoverage()
+    >>> for current_file in files:
+    ...     evaluator.add(reference, turns, dendrogram, uem=uem)
+    >>> thresholds, purity, coverage = evaluator.curve()
+    """
+
+    def __init__(self):
+        super(DendrogramPurityCoverage, self).__init__()
+
+        # total duration (denominator of both purity and coverage)
+        self.total_ = 0.
+
+        # purity and coverage numerators before any merge
+        self.purity_ = 0.
+        self.coverage_ = 0.
+
+        # one (threshold, purity increment, coverage increment) per merge
+        self.thresholds_ = []
+        self.delta_purity_ = []
+        self.delta_coverage_ = []
+
+    @staticmethod
+    def cooccurrence(reference, turns, uem=None):
+        """Duration of each reference label within each speech turn
+
+        Parameters
+        ----------
+        reference : pyannote.core.Annotation
+            Reference annotation.
+        turns : list of pyannote.core.Segment
+            Speech turns.
+        uem : pyannote.core.Timeline, optional
+            Evaluated regions. Defaults to the whole file.
+
+        Returns
+        -------
+        matrix : (n_labels, n_turns) np.ndarray
+        """
+
+        if uem is not None:
+            reference = reference.crop(uem, mode='intersection')
+
+        labels = {label: k for k, label in enumerate(reference.labels())}
+        segments = [(segment.start, segment.end, labels[label])
+                    for segment, _, label in reference.itertracks(yield_label=True)]
+        if not segments or not turns:
+            return np.zeros((len(labels), len(turns)))
+        s_start, s_end, s_label = (np.array(a) for a in zip(*segments))
+
+        t_start = np.array([turn.start for turn in turns])
+        t_end = np.array([turn.end for turn in turns])
+
+        # hypothesis[turn] = cluster keeps only the last of identical turns
+        last = {(turn.start, turn.end): i for i, turn in enumerate(turns)}
+        keep = np.zeros(len(turns), dtype=bool)
+        keep[list(last.values())] = True
+
+        overlap = np.minimum(s_end[:, np.newaxis], t_end) - \
+                  np.maximum(s_start[:, np.newaxis], t_start)
+        overlap = np.maximum(overlap, 0.) * keep
+
+        # cropping turns to the evaluated regions is not needed as
+        # reference segments already are
+        matrix = np.zeros((len(labels), len(turns)))
+        np.add.at(matrix, s_label, overlap)
+        return matrix
+
+    def add(self, reference, turns, dendrogram, uem=None):
+        """Add one file
+
+        Parameters
+        ----------
+        reference : pyannote.core.Annotation
+            Reference annotation.
+        turns : list of pyannote.core.Segment
+            Clustered speech turns.
+        dendrogram : (n_turns - 1, 4) np.ndarray
+            Complete dendrogram, as returned by scipy.cluster.hierarchy.linkage
+        uem : pyannote.core.Timeline, optional
+            Evaluated regions. Defaults to the whole file.
+        """
+
+        matrix = self.cooccurrence(reference, turns, uem=uem)
+        n_labels, n_turns = matrix.shape
+        if n_labels == 0:
+            return
+
+        self.total_ += np.sum(matrix)
+
+        # one column per cluster (initially, one cluster per turn)
+        columns = list(matrix.T)
+        largest_class = np.max(matrix, axis=0)
+        largest_cluster = np.max(matrix, axis=1)
+        self.purity_ += np.sum(largest_class)
+        self.coverage_ += np.sum(largest_cluster)
+        largest_class = list(largest_class)
+
+        if n_turns < 2:
+            return
+
+        # fcluster(criterion='distance') merges two clusters when all merges
+        # below them happen at a distance lower than the threshold. this is
+        # the same as merging in increasing order of their cumulative maximum
+        # distance (which is needed for non-monotonic methods like 'median')
+        height = np.array(dendrogram[:, 2], dtype=np.float64)
+        for m, (i, j) in enumerate(np.int64(dendrogram[:, :2])):
+            for child in (i, j):
+                if child >= n_turns:
+                    height[m] = max(height[m], height[child - n_turns])
+        order = np.argsort(height, kind='stable')
+
+        delta_purity = np.zeros(len(order))
+        delta_coverage = np.zeros(len(order))
+        columns.extend([None] * (n_turns - 1))
+        largest_class.extend([None] * (n_turns - 1))
+        for k, m in enumerate(order):
+            i, j = np.int64(dendrogram[m, :2])
+            new = n_turns + m
+            columns[new] = columns[i] + columns[j]
+            largest_class[new] = np.max(columns[new])
+            delta_purity[k] = largest_class[new] - largest_class[i] - \
+                              largest_class[j]
+            columns[i], columns[j] = None, None
+
+            # merging can only increase the largest cluster of each class
+            updated = np.maximum(largest_cluster, columns[new])
+            delta_coverage[k] = np.sum(updated) - np.sum(largest_cluster)
+            largest_cluster = updated
+
+        self.thresholds_.append(height[order])
+        self.delta_purity_.append(delta_purity)
+        self.delta_coverage_.append(delta_coverage)
+
+    def curve(self):
+        """Purity and coverage as a function of the threshold
+
+        Returns
+        -------
+        thresholds : (n_thresholds, ) np.ndarray
+            Increasing thresholds. First one is -inf (no merge).
+        purity : (n_thresholds, ) np.ndarray
+        coverage : (n_thresholds, ) np.ndarray
+            purity[k] and coverage[k] are obtained with any threshold within
+            [thresholds[k], thresholds[k + 1]).
+        """
+
+        if self.thresholds_:
+            thresholds = np.hstack(self.thresholds_)
+            order = np.argsort(thresholds, kind='stable')
+            thresholds = thresholds[order]
+            purity = np.cumsum(np.hstack(self.delta_purity_)[order])
+            coverage = np.cumsum(np.hstack(self.delta_coverage_)[order])
+
+            # only keep the state reached after the last merge of each threshold
+            last = np.hstack([thresholds[1:] != thresholds[:-1], [True]])
+            thresholds = thresholds[last]
+            purity, coverage = purity[last], coverage[last]
+        else:
+            thresholds = purity = coverage = np.zeros((0, ))
+
+        thresholds = np.hstack([[-np.inf], thresholds])
+        purity = self.purity_ + np.hstack([[0.], purity])
+        coverage = self.coverage_ + np.hstack([[0.], coverage])
+
+        if self.total_ > 0:
+            return thresholds, purity / self.total_, coverage / self.total_
+        return thresholds, np.ones_like(purity), np.ones_like(coverage)
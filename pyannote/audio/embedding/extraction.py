@@ -29,6 +29,8 @@
 import numpy as np
 from pyannote.core import SlidingWindow, SlidingWindowFeature
 from pyannote.audio.labeling.extraction import SequenceLabeling
+from pyannote.audio.export import is_exported
+from pyannote.audio.export import load_exported
 from pyannote.generators.batch import batchify
 import torch.nn as nn
 
@@ -41,7 +43,9 @@ class SequenceEmbedding(SequenceLabeling):
     model : `nn.Module` or `str`
         Model (or path to model). When a path, the directory structure created
         by pyannote-speaker-embedding should be kept unchanged so that one can
-        find the corresponding configuration file automatically.
+        find the corresponding configuration file automatically, unless the
+        model was exported with pyannote-speaker-embedding "export" mode (see
+        pyannote.audio.export).
     feature_extraction : callable, optional
         Feature extractor. When not provided and `model` is a path, it is
         inferred directly from the configuration file.
@@ -54,18 +58,35 @@ class SequenceEmbedding(SequenceLabeling):
         than `min_duration`). When `model` is a path and `min_duration` is not
         provided, it is inferred directly from the configuration file.
     step : float, optional
-        Subsequence step, in seconds. Defaults to 50% of `duration`.
+        Subsequence step, in seconds. Defaults to 50% of `duration` (or to the
+        step embedded in exported models).
     batch_size : int, optional
         Defaults to 32.
     device : torch.device, optional
-        Defaults to CPU.
+        Defaults to CPU. Exported models only run on CPU.
     """
 
     def __init__(self, model=None, feature_extraction=None,
                  step=None, duration=None, min_duration=None,
                  batch_size=32, device=None):
 
-        if not isinstance(model, nn.Module):
+        if not isinstance(model, nn.Module) and is_exported(model):
+
+            # exported models do not need the training stack
+            model, exported_extraction, config = load_exported(
+                model, device=device)
+            if feature_extraction is None:
+                feature_extraction = exported_extraction
+
+            if duration is None:
+                duration = config['duration']
+                if min_duration is None:
+                    min_duration = config.get('min_duration', None)
+
+            if step is None:
+                step = config.get('step', None)
+
+        elif not isinstance(model, nn.Module):
 
             from pyannote.audio.applications.speaker_embedding \
                 import SpeakerEmbedding
@@ -167,21 +188,54 @@ class SequenceEmbedding(SequenceLabeling):
         embeddings : `numpy array`
             Extracted embeddings
         """
+        return self.crop_batch([current_file], [segment])[0]
 
-        # HACK: change internal SlidingSegment's source to only extract
-        # embeddings on provided "crop". keep track of original source
-        # to set it back before the function returns
-        source = self.generator.source
-        self.generator.source = segment
+    def crop_batch(self, current_files, segments):
+        """Extract embeddings from several (file, time range) pairs at once
 
-        # compute embedding on sliding window
-        # over the whole duration of the source
-        batches = [batch for batch in self.from_file(current_file,
-                                                     incomplete=True)]
+        Sub-sequences of all pairs are packed together into full batches, so
+        that many short time ranges (e.g. speaker verification trials) do not
+        each end up in their own (mostly empty) batch.
 
-        self.generator.source = source
+        Parameters
+        ----------
+        current_files : iterable of `dict`
+            Files (from pyannote.database protocol).
+        segments : iterable of `Segment` or `Timeline`
+            Time range from which to extract embeddings, for each file.
 
-        if not batches:
-            return np.zeros((0, self.dimension))
+        Returns
+        -------
+        embeddings : `list` of `numpy array`
+            Extracted embeddings, one (n_subsequences, dimension) array for
+            each (file, time range) pair.
+
+        Usage
+        -----
+        >>> embeddings = sequence_embedding.crop_batch(
+        ...     [file1, file2], [file1['try_with'], file2['try_with']])
+        """
 
-        return np.vstack(batches)
+        # owner[i] is the index of the pair sub-sequence #i comes from
+        owner, X, fX = [], [], []
+
+        n_pairs = 0
+        for current_file, segment in zip(current_files, segments):
+            preprocessed = self.preprocess(current_file)
+            for subsequence in self.generator.iter_segments(segment):
+                X.append(self._process(subsequence, current_file=preprocessed))
+                owner.append(n_pairs)
+                if len(X) == self.batch_size:
+                    fX.append(self.forward(X))
+                    X = []
+            n_pairs += 1
+
+        if X:
+            fX.append(self.forward(X))
+
+        if not fX:
+            return [np.zeros((0, self.dimension)) for _ in range(n_pairs)]
+
+        fX = np.vstack(fX)
+        counts = np.bincount(owner, minlength=n_pairs)
+        return np.split(fX, np.cumsum(counts)[:-1])
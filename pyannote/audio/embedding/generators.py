@@ -33,6 +33,8 @@ from pyannote.generators.fragment import random_segment
 from pyannote.generators.fragment import random_subsegment
 from pyannote.generators.batch import batchify, EndOfBatch
 from pyannote.database.protocol import SpeakerDiarizationProtocol
+from pyannote.audio.train.generator import BatchBuffer
+from pyannote.audio.train.generator import get_loaders
 
 
 def get_dummy_protocol(current_file: dict) -> SpeakerDiarizationProtocol:
@@ -98,7 +100,7 @@ class SessionWiseSpeechSegmentGenerator(object):
         In case `duration` is None, set segment maximum duration.
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most 8 batches.
         Set `parallel` to 0 to not use background generators.
     """
 
@@ -201,12 +203,19 @@ class UnsupervisedSpeechSegmentGenerator(object):
         Number of days per epoch. Defaults to 7 (a week).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     def __init__(self, feature_extraction, duration=None, per_fold=None,
-                 per_epoch=7, parallel=1, **kwargs):
+                 per_epoch=7, parallel=1, processes=False, prefetch=8,
+                 **kwargs):
 
         super().__init__()
 
@@ -223,6 +232,8 @@ class UnsupervisedSpeechSegmentGenerator(object):
         self.per_epoch = per_epoch
 
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
 
     @property
     def batch_size(self):
@@ -282,31 +293,31 @@ class UnsupervisedSpeechSegmentGenerator(object):
         return {'X': {'@': (None, None)},
                 'y': {'@': (None, np.stack)}}
 
+    def batches(self, n_buffers=2):
+        """Batch generator (without prefetching)
+
+        Parameters
+        ----------
+        n_buffers : int, optional
+            Not used (for compatibility with `get_loaders`).
+        """
+        return batchify(self.generator(), self.signature,
+                        batch_size=self.batch_size, prefetch=0)
+
     def __call__(self, protocol, subset='train'):
 
         self.initialize(protocol, subset=subset)
 
-        batch_size = self.batch_size
         batches_per_epoch = self.batches_per_epoch
 
-        generators = []
-        if self.parallel:
-
-            for i in range(self.parallel):
-                generator = self.generator()
-                batches = batchify(generator, self.signature,
-                                   batch_size=batch_size,
-                                   prefetch=batches_per_epoch)
-                generators.append(batches)
-        else:
-            generator = self.generator()
-            batches = batchify(generator, self.signature,
-                               batch_size=batch_size, prefetch=0)
-            generators.append(batches)
+        self.loaders_ = get_loaders(self.batches, parallel=self.parallel,
+                                    processes=self.processes,
+                                    prefetch=self.prefetch)
 
         while True:
             # get `batches_per_epoch` batches from each generator
-            for batches in generators:
+            for batches in self.loaders_:
+                self.loader_ = batches
                 for _ in range(batches_per_epoch):
                     yield next(batches)
 
@@ -336,14 +347,21 @@ class SpeechSegmentGenerator(object):
         In case `duration` is None, set segment maximum duration.
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     def __init__(self, feature_extraction,
                  per_label=3, per_fold=None, per_epoch=7,
                  duration=None, min_duration=None, max_duration=None,
-                 label_min_duration=0., parallel=1):
+                 label_min_duration=0., parallel=1, processes=False,
+                 prefetch=8):
 
         super(SpeechSegmentGenerator, self).__init__()
 
@@ -353,6 +371,8 @@ class SpeechSegmentGenerator(object):
         self.per_epoch = per_epoch
         self.duration = duration
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
         self.label_min_duration = label_min_duration
 
         if self.duration is None:
@@ -422,6 +442,176 @@ class SpeechSegmentGenerator(object):
         self.domains_ = {}
         self.domains_['database'] = {db: i for i, db in enumerate(databases)}
 
+        self.compile_()
+
+    def compile_(self):
+        """Compile sampling index used by `batches`
+
+        files_ : list
+            Files (one entry per file and label).
+        segments_ : (n_segments, 2) numpy array
+            Start and end time of every segment, grouped by label.
+        segment_file_ : (n_segments, ) numpy array
+            Index (in `files_`) of the file each segment belongs to.
+        label_offset_ : (n_labels + 1, ) numpy array
+            Segments of i-th label are segments_[label_offset_[i]:
+            label_offset_[i + 1]].
+        cumulative_weight_ : (n_segments + 1, ) numpy array
+            Cumulative sampling weight of segments (starting at 0).
+        """
+
+        self.files_ = []
+        segments, segment_file, weights, label_offset = [], [], [], [0]
+
+        for label, data in self.data_.items():
+            for label_segments, duration, current_file in data:
+
+                self.files_.append(current_file)
+                f = len(self.files_) - 1
+
+                # files are chosen with probability proportional to the total
+                # duration of label, then segments either with probability
+                # proportional to their duration (weighted) or uniformly.
+                for segment in label_segments:
+                    segments.append((segment.start, segment.end))
+                    segment_file.append(f)
+                    weights.append(segment.duration if self.weighted_
+                                   else duration / len(label_segments))
+
+            label_offset.append(len(segments))
+
+        self.segments_ = np.array(segments, dtype=np.float64).reshape(-1, 2)
+        self.segment_file_ = np.array(segment_file, dtype=np.int64)
+        self.label_offset_ = np.array(label_offset, dtype=np.int64)
+        self.cumulative_weight_ = np.hstack([[0.], np.cumsum(weights)])
+
+    def random_labels(self):
+        """Generate batches of labels
+
+        Labels are shuffled and consumed `per_fold` at a time, as `generator`
+        does (one label after the other).
+
+        Yields
+        ------
+        labels : (n_labels, ) numpy array
+            Index (in `labels`) of labels.
+        """
+
+        n_labels = len(self.data_) if self.per_fold is None else self.per_fold
+
+        labels = np.arange(len(self.data_))
+        position = len(labels)
+
+        while True:
+            chosen = []
+            while len(chosen) < n_labels:
+                if position == len(labels):
+                    np.random.shuffle(labels)
+                    position = 0
+                n = min(n_labels - len(chosen), len(labels) - position)
+                chosen.extend(labels[position:position + n])
+                position += n
+            yield np.array(chosen, dtype=np.int64)
+
+    def random_segments(self, labels):
+        """Draw one random segment for each label at once
+
+        Parameters
+        ----------
+        labels : (n_samples, ) numpy array
+            Index (in `labels`) of labels.
+
+        Returns
+        -------
+        segments : (n_samples, ) numpy array
+            Index (in `segments_`) of segments.
+        """
+        lo = self.label_offset_[labels]
+        hi = self.label_offset_[labels + 1]
+        low = self.cumulative_weight_[lo]
+        high = self.cumulative_weight_[hi]
+        u = low + np.random.random(len(labels)) * (high - low)
+        s = np.searchsorted(self.cumulative_weight_, u, side='right') - 1
+        return np.clip(s, lo, hi - 1)
+
+    def batch_extra(self, files):
+        """Get 'y_database' and 'extra' batch fields
+
+        Parameters
+        ----------
+        files : (n_samples, ) numpy array
+            Index (in `files_`) of files.
+
+        Returns
+        -------
+        y_database : (n_samples, ) numpy array
+            Index of database.
+        databases : list
+            Name of database.
+        """
+        databases = [self.files_[f]['database'] for f in files]
+        y_database = np.array([self.domains_['database'][database]
+                               for database in databases], dtype=np.int64)
+        return y_database, databases
+
+    def batches(self, n_buffers=2):
+        """Batch generator (without prefetching)
+
+        With fixed-duration segments, the whole batch is drawn at once and
+        its features are gathered into a preallocated array. Otherwise, this
+        falls back to batchifying samples yielded by `generator`.
+
+        Parameters
+        ----------
+        n_buffers : int, optional
+            Number of preallocated batches. A batch is overwritten
+            `n_buffers` batches later. Defaults to 2.
+
+        Returns
+        -------
+        batches : generator
+            Generator that yields batches indefinitely.
+        """
+
+        if self.duration is None:
+            return batchify(self.generator(), self.signature,
+                            batch_size=self.batch_size, prefetch=0)
+
+        return self.fixed_duration_batches(n_buffers=n_buffers)
+
+    def fixed_duration_batches(self, n_buffers=2):
+        """Vectorized version of batchifying `generator` for fixed duration"""
+
+        label_names = list(self.data_)
+        X_buffer = BatchBuffer(
+            self.feature_extraction.get_batch_shape(self.batch_size,
+                                                    self.duration),
+            n_buffers=n_buffers)
+
+        for labels in self.random_labels():
+
+            # 'per_label' segments for each label
+            y = np.repeat(labels, self.per_label)
+            s = self.random_segments(y)
+
+            # choose sub-segment at random at exactly duration
+            start, end = self.segments_[s, 0], self.segments_[s, 1]
+            starts = start + np.random.random(len(s)) * \
+                             (end - start - self.duration)
+
+            files = self.segment_file_[s]
+            X = self.feature_extraction.crop_batch(
+                [self.files_[f] for f in files], starts, self.duration,
+                out=X_buffer())
+
+            y_database, databases = self.batch_extra(files)
+
+            yield {'X': X,
+                   'y': y,
+                   'y_database': y_database,
+                   'extra': {'label': [label_names[i] for i in y],
+                             'database': databases}}
+
     def generator(self):
 
         labels = list(self.data_)
@@ -561,27 +751,16 @@ class SpeechSegmentGenerator(object):
 
         self.initialize(protocol, subset=subset)
 
-        batch_size = self.batch_size
         batches_per_epoch = self.batches_per_epoch
 
-        generators = []
-        if self.parallel:
-
-            for i in range(self.parallel):
-                generator = self.generator()
-                batches = batchify(generator, self.signature,
-                                   batch_size=batch_size,
-                                   prefetch=batches_per_epoch)
-                generators.append(batches)
-        else:
-            generator = self.generator()
-            batches = batchify(generator, self.signature,
-                               batch_size=batch_size, prefetch=0)
-            generators.append(batches)
+        self.loaders_ = get_loaders(self.batches, parallel=self.parallel,
+                                    processes=self.processes,
+                                    prefetch=self.prefetch)
 
         while True:
             # get `batches_per_epoch` batches from each generator
-            for batches in generators:
+            for batches in self.loaders_:
+                self.loader_ = batches
                 for _ in range(batches_per_epoch):
                     yield next(batches)
 
@@ -613,17 +792,25 @@ class SpeechTurnSubSegmentGenerator(SpeechSegmentGenerator):
         Number of days per epoch. Defaults to 7 (a week).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     def __init__(self, feature_extraction, duration, per_label=3,
-                 per_fold=None, per_turn=10, per_epoch=7, parallel=1):
+                 per_fold=None, per_turn=10, per_epoch=7, parallel=1,
+                 processes=False, prefetch=8):
 
         super(SpeechTurnSubSegmentGenerator, self).__init__(
             feature_extraction,
             per_label=per_label, per_fold=per_fold, per_epoch=per_epoch,
-            duration=None, min_duration=duration, max_duration=None)
+            duration=None, min_duration=duration, max_duration=None,
+            parallel=parallel, processes=processes, prefetch=prefetch)
 
         # this is to make sure speech turns are selected at random
         self.weighted_ = False
@@ -694,6 +881,73 @@ class SpeechTurnSubSegmentGenerator(SpeechSegmentGenerator):
             # let `batchify` know that the "segment batch" is complete
             yield endOfBatch
 
+    def batches(self, n_buffers=2):
+        """Batch generator (without prefetching)
+
+        Vectorized version of batchifying `generator`: speech turns of the
+        whole batch are drawn at once, and sub-segments features are gathered
+        into a preallocated array without extracting whole speech turns.
+
+        Parameters
+        ----------
+        n_buffers : int, optional
+            Number of preallocated batches. A batch is overwritten
+            `n_buffers` batches later. Defaults to 2.
+
+        Returns
+        -------
+        batches : generator
+            Generator that yields batches indefinitely.
+        """
+
+        label_names = list(self.data_)
+        step = self.feature_extraction.sliding_window.step
+
+        # number of speech turns per "speech turn batch"
+        if self.per_fold is not None:
+            n_speech_turns = self.per_label * self.per_fold
+        else:
+            n_speech_turns = self.per_label * len(self.data_)
+
+        X_buffer = BatchBuffer(
+            self.feature_extraction.get_batch_shape(
+                n_speech_turns * self.per_turn, self.duration_),
+            n_buffers=n_buffers)
+
+        for labels in self.random_labels():
+
+            # 'per_label' speech turns for each label
+            labels = np.repeat(labels, self.per_label)
+            s = self.random_segments(labels)
+            start, end = self.segments_[s, 0], self.segments_[s, 1]
+
+            # same heuristic as `iter_segments_`
+            n_samples = np.rint((end - start) / step).astype(np.int64)
+            n = (n_samples - self.n_samples_) // (self.n_samples_ // 2) + 1
+            n = np.minimum(n, self.per_turn)
+
+            # choose n sub-segments at random in each speech turn
+            z = np.repeat(np.arange(n_speech_turns), n)
+            offsets = np.floor(
+                np.random.random(len(z)) *
+                np.maximum(1, n_samples - self.n_samples_)[z])
+            starts = start[z] + offsets * step
+
+            files = self.segment_file_[s[z]]
+            X = self.feature_extraction.crop_batch(
+                [self.files_[f] for f in files], starts, self.duration_,
+                out=X_buffer()[:len(z)])
+
+            y = labels[z]
+            y_database, databases = self.batch_extra(files)
+
+            yield {'X': X,
+                   'y': y,
+                   'z': z,
+                   'y_database': y_database,
+                   'extra': {'label': [label_names[i] for i in y],
+                             'database': databases}}
+
     @property
     def batch_size(self):
         return -1
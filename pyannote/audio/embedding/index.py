@@ -0,0 +1,643 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+import io
+import yaml
+import numpy as np
+from pathlib import Path
+
+from pyannote.core.utils.distance import l2_normalize
+from pyannote.audio.util import mkdir_p
+
+
+def _sqeuclidean(X, Y, Y_sqnorm=None):
+    """Squared euclidean distance between rows of X and Y
+
+    Uses |x - y|² = |x|² - 2 x.y + |y|² so that most of the work is done by a
+    single matrix product.
+    """
+    if Y_sqnorm is None:
+        Y_sqnorm = np.sum(Y ** 2, axis=1)
+    X_sqnorm = np.sum(X ** 2, axis=1)
+    D = X_sqnorm[:, np.newaxis] - 2 * np.dot(X, Y.T) + Y_sqnorm
+    return np.maximum(D, 0.)
+
+
+def _merge_topk(D, I, d, i, k):
+    """Merge k best (D, I) with new candidates (d, i)
+
+    Parameters
+    ----------
+    D, I : (n_queries, k) np.ndarray
+        Current k smallest distances and corresponding indices.
+    d, i : (n_queries, n_candidates) np.ndarray
+        Candidate distances and indices.
+    k : int
+        Number of neighbors.
+
+    Returns
+    -------
+    D, I : (n_queries, k) np.ndarray
+        Updated k smallest distances and corresponding indices (sorted).
+    """
+    d = np.hstack([D, d])
+    i = np.hstack([I, i])
+    if d.shape[1] > k:
+        best = np.argpartition(d, k - 1, axis=1)[:, :k]
+        d = np.take_along_axis(d, best, axis=1)
+        i = np.take_along_axis(i, best, axis=1)
+    order = np.argsort(d, axis=1)
+    return (np.take_along_axis(d, order, axis=1),
+            np.take_along_axis(i, order, axis=1))
+
+
+def _kmeans(X, n_clusters, n_iter=20, block_size=4096, seed=None):
+    """(Pure NumPy) k-means clustering
+
+    Parameters
+    ----------
+    X : (n_samples, dimension) np.ndarray
+        Training samples.
+    n_clusters : int
+        Number of clusters.
+    n_iter : int, optional
+        Number of Lloyd iterations. Defaults to 20.
+    block_size : int, optional
+        Number of samples processed at once. Defaults to 4096.
+    seed : int, optional
+        Random seed.
+
+    Returns
+    -------
+    centroids : (n_clusters, dimension) np.ndarray
+    """
+
+    random_state = np.random.RandomState(seed)
+    n_samples, dimension = X.shape
+    n_clusters = min(n_clusters, n_samples)
+    centroids = X[random_state.choice(n_samples, size=n_clusters,
+                                      replace=False)].astype(np.float64)
+
+    for _ in range(n_iter):
+
+        sums = np.zeros((n_clusters, dimension))
+        counts = np.zeros((n_clusters, ))
+
+        C_sqnorm = np.sum(centroids ** 2, axis=1)
+        for b in range(0, n_samples, block_size):
+            X_ = X[b:b + block_size]
+            assignment = np.argmin(_sqeuclidean(X_, centroids, C_sqnorm),
+                                   axis=1)
+            np.add.at(sums, assignment, X_)
+            counts += np.bincount(assignment, minlength=n_clusters)
+
+        # re-seed empty clusters with random samples
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        if np.any(empty):
+            centroids[empty] = X[random_state.choice(n_samples,
+                                                     size=np.sum(empty))]
+
+    return centroids
+
+
+def _assign(X, centroids, block_size=4096):
+    """Index of closest centroid for each row of X"""
+    C_sqnorm = np.sum(centroids ** 2, axis=1)
+    return np.hstack([
+        np.argmin(_sqeuclidean(X[b:b + block_size], centroids, C_sqnorm),
+                  axis=1)
+        for b in range(0, len(X), block_size)]).astype(np.int64)
+
+
+class EmbeddingIndex(object):
+    """Nearest neighbor search among (a possibly large number of) embeddings
+
+    Parameters
+    ----------
+    metric : {'euclidean', 'cosine', 'angular'}, optional
+        Metric used for comparing embeddings. Defaults to 'cosine'.
+    approximate : `bool`, optional
+        Use approximate search based on an inverted file (IVF) index, with
+        optional product quantization (PQ) of the residuals. Defaults to
+        exact (brute-force) search, which is recommended for up to a few
+        hundred thousands indexed embeddings.
+    n_lists : `int`, optional
+        Number of inverted lists (i.e. k-means coarse centroids) used in
+        approximate mode. Defaults to 256.
+    n_probe : `int`, optional
+        Number of inverted lists visited per query in approximate mode.
+        Defaults to 8.
+    n_subquantizers : `int`, optional
+        Number of sub-quantizers used for product quantization. It must be a
+        divisor of the embedding dimension. Distances to embeddings of visited
+        lists are then approximated from `n_subquantizers` one-byte codes.
+        Defaults to not using product quantization (i.e. distances to
+        embeddings of visited lists are exact).
+    block_size : `int`, optional
+        Number of queries (and indexed embeddings) processed at once.
+        Controls peak memory usage. Defaults to 1024.
+    seed : `int`, optional
+        Random seed used for training approximate index.
+
+    Usage
+    -----
+    >>> index = EmbeddingIndex(metric='cosine')
+    >>> index.add(X, labels=labels)
+    >>> distances, indices = index.search(X_query, k=5)
+    >>> nearest_labels = [index.labels[i] for i in indices[:, 0]]
+    >>> index.save('/path/to/index')
+    >>> index = EmbeddingIndex.load('/path/to/index')
+    """
+
+    METRICS = ('euclidean', 'cosine', 'angular')
+
+    def __init__(self, metric='cosine', approximate=False, n_lists=256,
+                 n_probe=8, n_subquantizers=None, block_size=1024,
+                 seed=None):
+
+        super(EmbeddingIndex, self).__init__()
+
+        if metric not in self.METRICS:
+            msg = f'"metric" must be one of {self.METRICS}.'
+            raise ValueError(msg)
+
+        self.metric = metric
+        self.approximate = approximate
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_subquantizers = n_subquantizers
+        self.block_size = block_size
+        self.seed = seed
+
+        self.dimension_ = None
+        self.labels_ = []
+        self.vectors_ = None
+        self.sqnorm_ = None
+        self.buffer_ = None
+        self.sqnorm_buffer_ = None
+
+        # approximate mode
+        self.centroids_ = None
+        self.codebooks_ = None
+        self.lists_ = None
+        self.codes_ = None
+
+    @property
+    def labels(self):
+        """Label of each indexed embedding"""
+        return self.labels_
+
+    @property
+    def dimension(self):
+        """Dimension of indexed embeddings"""
+        return self.dimension_
+
+    @property
+    def is_trained(self):
+        """Whether approximate index is trained (always True when exact)"""
+        return not self.approximate or self.centroids_ is not None
+
+    def __len__(self):
+        return 0 if self.vectors_ is None else len(self.vectors_)
+
+    def _preprocess(self, X):
+        X = np.array(X, dtype=np.float32, ndmin=2)
+        if self.metric in ('cosine', 'angular'):
+            X = l2_normalize(X).astype(np.float32)
+        return X
+
+    def _postprocess(self, D):
+        """Convert squared euclidean distances into actual distances"""
+        if self.metric == 'euclidean':
+            return np.sqrt(D)
+        # vectors are L2-normalized: |x - y|² = 2 - 2 cos(x, y)
+        cosine = np.clip(1. - .5 * D, -1., 1.)
+        if self.metric == 'cosine':
+            return 1. - cosine
+        return np.arccos(cosine)
+
+    def train(self, X=None):
+        """Train approximate index (coarse quantizer and product quantizer)
+
+        Parameters
+        ----------
+        X : (n_samples, dimension) np.ndarray, optional
+            Training embeddings. Defaults to already indexed embeddings.
+
+        Returns
+        -------
+        index : `EmbeddingIndex`
+        """
+
+        if not self.approximate:
+            return self
+
+        X = self.vectors_ if X is None else self._preprocess(X)
+        if X is None or len(X) < 1:
+            msg = 'cannot train approximate index without training data.'
+            raise ValueError(msg)
+        _, dimension = X.shape
+
+        # coarse quantizer
+        self.centroids_ = _kmeans(X, self.n_lists, seed=self.seed,
+                                  block_size=self.block_size)
+
+        # product quantizer (on residuals)
+        if self.n_subquantizers is not None:
+
+            if dimension % self.n_subquantizers:
+                msg = (f'"n_subquantizers" ({self.n_subquantizers}) must be '
+                       f'a divisor of embedding dimension ({dimension}).')
+                raise ValueError(msg)
+
+            R = X - self.centroids_[_assign(X, self.centroids_,
+                                            block_size=self.block_size)]
+            R = R.reshape(len(X), self.n_subquantizers, -1)
+            self.codebooks_ = np.stack([
+                _kmeans(R[:, m], 256, seed=self.seed,
+                        block_size=self.block_size)
+                for m in range(self.n_subquantizers)])
+
+        # (re-)encode already indexed embeddings
+        if self.vectors_ is not None:
+            self.lists_, self.codes_ = self._quantize(self.vectors_)
+
+        return self
+
+    def _quantize(self, X):
+        """Assign (preprocessed) embeddings to inverted lists and encode them
+
+        Returns
+        -------
+        lists : (n_samples, ) np.ndarray
+            Index of inverted list.
+        codes : (n_samples, n_subquantizers) np.ndarray or None
+            Product quantization codes (None when not using PQ).
+        """
+
+        lists = _assign(X, self.centroids_, block_size=self.block_size)
+
+        if self.codebooks_ is None:
+            return lists, None
+
+        n_subquantizers, _, _ = self.codebooks_.shape
+        R = (X - self.centroids_[lists]).reshape(len(X), n_subquantizers, -1)
+        codes = np.stack([_assign(R[:, m], self.codebooks_[m],
+                                  block_size=self.block_size)
+                          for m in range(n_subquantizers)],
+                         axis=1).astype(np.uint8)
+        return lists, codes
+
+    def _reserve(self, n_samples):
+        """Make sure there is room for `n_samples` more embeddings
+
+        Embeddings are stored in a buffer whose capacity is doubled whenever
+        needed so that adding embeddings costs (amortized) O(n_samples).
+        """
+
+        n = len(self)
+        if self.buffer_ is not None and n + n_samples <= len(self.buffer_):
+            return
+
+        capacity = max(16, 2 * (n + n_samples))
+        buffer = np.empty((capacity, self.dimension_), dtype=np.float32)
+        sqnorm = np.empty((capacity, ), dtype=np.float32)
+        if n > 0:
+            buffer[:n] = self.vectors_
+            sqnorm[:n] = self.sqnorm_
+        self.buffer_, self.sqnorm_buffer_ = buffer, sqnorm
+        self.vectors_, self.sqnorm_ = buffer[:n], sqnorm[:n]
+
+    def add(self, X, labels=None):
+        """Add embeddings to the index
+
+        Parameters
+        ----------
+        X : (n_samples, dimension) np.ndarray
+            Embeddings.
+        labels : iterable, optional
+            Label of each embedding. Defaults to its index.
+
+        Returns
+        -------
+        index : `EmbeddingIndex`
+        """
+
+        X = self._preprocess(X)
+        n_samples, dimension = X.shape
+
+        if self.dimension_ is None:
+            self.dimension_ = dimension
+        elif self.dimension_ != dimension:
+            msg = (f'inconsistent embedding dimension '
+                   f'(is: {dimension}, should be: {self.dimension_})')
+            raise ValueError(msg)
+
+        start = len(self)
+        if labels is None:
+            labels = range(start, start + n_samples)
+        labels = list(labels)
+        if len(labels) != n_samples:
+            msg = 'there must be exactly one label per embedding.'
+            raise ValueError(msg)
+
+        self._reserve(n_samples)
+        end = start + n_samples
+        self.buffer_[start:end] = X
+        self.sqnorm_buffer_[start:end] = np.sum(X ** 2, axis=1)
+        self.vectors_ = self.buffer_[:end]
+        self.sqnorm_ = self.sqnorm_buffer_[:end]
+        self.labels_.extend(labels)
+
+        if self.approximate and self.centroids_ is not None:
+            lists, codes = self._quantize(X)
+            self.lists_ = np.hstack([self.lists_, lists])
+            if codes is not None:
+                self.codes_ = np.vstack([self.codes_, codes])
+
+        return self
+
+    def update(self, indices, X):
+        """Replace already indexed embeddings
+
+        Parameters
+        ----------
+        indices : (n_samples, ) np.ndarray
+            Index of embeddings to replace.
+        X : (n_samples, dimension) np.ndarray
+            New embeddings.
+
+        Returns
+        -------
+        index : `EmbeddingIndex`
+        """
+
+        X = self._preprocess(X)
+        indices = np.array(indices, dtype=np.int64, ndmin=1)
+
+        # make sure embeddings are stored in a (writable) buffer
+        self._reserve(0)
+
+        self.vectors_[indices] = X
+        self.sqnorm_[indices] = np.sum(X ** 2, axis=1)
+
+        if self.approximate and self.centroids_ is not None:
+            lists, codes = self._quantize(X)
+            self.lists_[indices] = lists
+            if codes is not None:
+                self.codes_[indices] = codes
+
+        return self
+
+    def add_precomputed(self, precomputed, current_file, annotation):
+        """Add one (average) embedding per label of an annotation
+
+        Parameters
+        ----------
+        precomputed : `pyannote.audio.features.Precomputed`
+            Precomputed embeddings.
+        current_file : `dict`
+            File as provided by a pyannote.database protocol.
+        annotation : `pyannote.core.Annotation`
+            Annotation. Labels for which no embedding is available are
+            skipped.
+
+        Returns
+        -------
+        labels : `list`
+            Labels that were actually added to the index.
+        """
+
+        embedding = precomputed(current_file)
+
+        X, labels = [], []
+        for label in annotation.labels():
+
+            timeline = annotation.label_timeline(label, copy=False)
+
+            # be more and more permissive until we have
+            # at least one embedding for current label
+            for mode in ['strict', 'center', 'loose']:
+                x = embedding.crop(timeline, mode=mode)
+                if len(x) > 0:
+                    break
+
+            # skip labels so small we don't have any embedding for it
+            if len(x) < 1:
+                continue
+
+            labels.append(label)
+            X.append(np.mean(x, axis=0))
+
+        if labels:
+            self.add(np.vstack(X), labels=labels)
+
+        return labels
+
+    def _search_exact(self, X, k):
+
+        n_queries = len(X)
+        D = np.full((n_queries, k), np.inf, dtype=np.float32)
+        I = np.full((n_queries, k), -1, dtype=np.int64)
+
+        for b in range(0, len(self), self.block_size):
+            Y = self.vectors_[b:b + self.block_size]
+            d = _sqeuclidean(X, Y, Y_sqnorm=self.sqnorm_[b:b + len(Y)])
+            i = np.broadcast_to(np.arange(b, b + len(Y)), d.shape)
+            D, I = _merge_topk(D, I, d, i, k)
+
+        return D, I
+
+    def _search_approximate(self, X, k):
+
+        n_queries = len(X)
+        D = np.full((n_queries, k), np.inf, dtype=np.float32)
+        I = np.full((n_queries, k), -1, dtype=np.int64)
+
+        # visit n_probe closest lists
+        n_probe = min(self.n_probe, len(self.centroids_))
+        probes = np.argpartition(_sqeuclidean(X, self.centroids_),
+                                 n_probe - 1, axis=1)[:, :n_probe]
+
+        for l in np.unique(probes):
+
+            members = np.where(self.lists_ == l)[0]
+            if len(members) < 1:
+                continue
+
+            # each inverted list is visited by all its queries at once, so
+            # that distance computation is vectorized
+            queries = np.where(np.any(probes == l, axis=1))[0]
+            X_ = X[queries]
+
+            if self.codebooks_ is None:
+                d = _sqeuclidean(X_, self.vectors_[members],
+                                 Y_sqnorm=self.sqnorm_[members])
+
+            else:
+                # asymmetric distance computation: squared distance between
+                # each query residual and each sub-quantizer centroid is
+                # computed once (look-up table), then summed over codes.
+                n_subquantizers, _, _ = self.codebooks_.shape
+                R = (X_ - self.centroids_[l]).reshape(
+                    len(queries), n_subquantizers, -1)
+                lut = (np.sum(R ** 2, axis=2)[:, :, np.newaxis]
+                       - 2 * np.einsum('qmd,mcd->qmc', R, self.codebooks_)
+                       + np.sum(self.codebooks_ ** 2, axis=2))
+                codes = self.codes_[members]
+                d = np.zeros((len(queries), len(members)))
+                for m in range(n_subquantizers):
+                    d += lut[:, m, codes[:, m]]
+                d = np.maximum(d, 0.)
+
+            i = np.broadcast_to(members, d.shape)
+            D[queries], I[queries] = _merge_topk(D[queries], I[queries],
+                                                 d, i, k)
+
+        return D, I
+
+    def search(self, X, k=1):
+        """Search k nearest neighbors
+
+        Parameters
+        ----------
+        X : (n_queries, dimension) np.ndarray
+            Query embeddings.
+        k : `int`, optional
+            Number of nearest neighbors. Defaults to 1.
+
+        Returns
+        -------
+        distances : (n_queries, k) np.ndarray
+            Distance to nearest neighbors (sorted by increasing distance).
+        indices : (n_queries, k) np.ndarray
+            Index of nearest neighbors (use `labels` to get their label).
+            Index is -1 (and distance is infinite) when less than k
+            neighbors could be found.
+        """
+
+        if not self.is_trained:
+            self.train()
+
+        X = self._preprocess(X)
+        n_queries, _ = X.shape
+
+        distances = np.full((n_queries, k), np.inf, dtype=np.float32)
+        indices = np.full((n_queries, k), -1, dtype=np.int64)
+
+        if len(self) < 1:
+            return distances, indices
+
+        search = self._search_approximate if self.approximate \
+                 else self._search_exact
+
+        for b in range(0, n_queries, self.block_size):
+            D, I = search(X[b:b + self.block_size], k)
+            distances[b:b + self.block_size] = D
+            indices[b:b + self.block_size] = I
+
+        # missing neighbors
+        indices[~np.isfinite(distances)] = -1
+
+        finite = np.isfinite(distances)
+        distances[finite] = self._postprocess(distances[finite])
+
+        return distances, indices
+
+    def save(self, root_dir):
+        """Save index to disk
+
+        Parameters
+        ----------
+        root_dir : `str` or `Path`
+            Path to directory where the index is stored.
+        """
+
+        root_dir = Path(root_dir).expanduser().resolve(strict=False)
+        mkdir_p(root_dir)
+
+        params = {'metric': self.metric,
+                  'approximate': self.approximate,
+                  'n_lists': self.n_lists,
+                  'n_probe': self.n_probe,
+                  'n_subquantizers': self.n_subquantizers,
+                  'block_size': self.block_size,
+                  'seed': self.seed,
+                  'dimension': self.dimension_,
+                  'labels': self.labels_}
+
+        with io.open(root_dir / 'metadata.yml', 'w') as f:
+            yaml.dump(params, f, default_flow_style=False)
+
+        for name in ['vectors', 'centroids', 'codebooks', 'lists', 'codes']:
+            value = getattr(self, f'{name}_')
+            if value is not None:
+                np.save(root_dir / f'{name}.npy', value)
+
+    @classmethod
+    def load(cls, root_dir, use_memmap=False):
+        """Load index from disk
+
+        Parameters
+        ----------
+        root_dir : `str` or `Path`
+            Path to directory where the index is stored.
+        use_memmap : `bool`, optional
+            Memory-map indexed embeddings instead of loading them in memory.
+            Defaults to False.
+
+        Returns
+        -------
+        index : `EmbeddingIndex`
+        """
+
+        root_dir = Path(root_dir).expanduser().resolve(strict=True)
+
+        with io.open(root_dir / 'metadata.yml', 'r') as f:
+            params = yaml.load(f)
+
+        dimension = params.pop('dimension')
+        labels = params.pop('labels')
+
+        index = cls(**params)
+        index.dimension_ = dimension
+        index.labels_ = list(labels)
+
+        for name in ['vectors', 'centroids', 'codebooks', 'lists', 'codes']:
+            path = root_dir / f'{name}.npy'
+            if path.exists():
+                mmap_mode = 'r' if use_memmap and name == 'vectors' else None
+                setattr(index, f'{name}_',
+                        np.load(str(path), mmap_mode=mmap_mode))
+
+        if index.vectors_ is not None:
+            index.sqnorm_ = np.sum(index.vectors_ ** 2, axis=1,
+                                   dtype=np.float32)
+
+        return index
@@ -48,11 +48,20 @@ class SincConv(nn.Module):
         Filter length.
     sample_rate : `int`, optional
         Sample rate. Defaults to 16000.
+    fft : `bool`, optional
+        Compute convolution in the frequency domain (block by block, using
+        overlap-save), which is faster on long waveforms (e.g. when embedding
+        whole recordings). Requires torch >= 1.7. Defaults to False.
 
     Usage
     -----
     See `torch.nn.Conv1d`
 
+    Notes
+    -----
+    When autograd is disabled (e.g. under `torch.no_grad()`), filters are only
+    computed once and cached until parameters are modified.
+
     Reference
     ---------
     Mirco Ravanelli, Yoshua Bengio,
@@ -71,7 +80,8 @@ class SincConv(nn.Module):
 
     def __init__(self, in_channels, out_channels, kernel_size,
                  stride=1, padding=0, dilation=1, bias=False, groups=1,
-                 sample_rate=16000, min_low_hz=50, min_band_hz=50):
+                 sample_rate=16000, min_low_hz=50, min_band_hz=50,
+                 fft=False):
 
         super().__init__()
 
@@ -85,6 +95,7 @@ class SincConv(nn.Module):
         self.stride = stride
         self.padding = padding
         self.dilation = dilation
+        self.fft = fft
 
         if bias:
             raise ValueError(f'SincConv does not support bias.')
@@ -110,37 +121,38 @@ class SincConv(nn.Module):
         # filter frequency band (out_channels, 1)
         self.band_hz_ = nn.Parameter(torch.Tensor(np.diff(hz)).view(-1, 1))
 
-        # Hamming window,  Make it a parameter so that it is sent to the same
-        # device as the actual parameter
-        self.window_ = torch.hamming_window(self.kernel_size)
+        # Hamming window (kernel_size, )
+        window = torch.hamming_window(self.kernel_size)
 
-        # (kernel_size, 1)
+        # (1, kernel_size)
         n = (self.kernel_size - 1) / 2
-        self.n_ = torch.range(-n, n).view(1, -1) / self.sample_rate
+        n = (torch.arange(self.kernel_size, dtype=torch.float) - n).view(1, -1)
+        n = n / self.sample_rate
+
+        # not registered as buffers so that they are not part of the state
+        # dict (for compatibility with existing pretrained weights), but
+        # sent to the same device as the parameters (see `_apply`)
+        self.window_ = window
+        self.n_ = n
+
+        # filters cached when autograd is disabled
+        self.filters_ = None
+        self.filters_key_ = None
 
     def sinc(self, x):
         sinc = torch.sin(x) / x
         sinc[:, self.kernel_size // 2] = 1.
         return sinc
 
-    def forward(self, waveforms):
-        """
-
-        Parameters
-        ----------
-        waveforms : `torch.Tensor` (batch_size, 1, n_samples)
-            Batch of waveforms.
+    def get_filters(self):
+        """Compute sinc band-pass filters
 
         Returns
         -------
-        features : `torch.Tensor` (batch_size, out_channels, n_samples_out)
-            Batch of sinc filters activations.
-
+        filters : `torch.Tensor` (out_channels, 1, kernel_size)
+            Filters.
         """
 
-        self.n_ = self.n_.to(waveforms.device)
-        self.window_ = self.window_.to(waveforms.device)
-
         # why torch.abs? see https://github.com/mravanelli/SincNet/issues/4
         low = self.min_low_hz / self.sample_rate + torch.abs(self.low_hz_)
         high = low + self.min_band_hz /self.sample_rate + torch.abs(self.band_hz_)
@@ -157,9 +169,114 @@ class SincConv(nn.Module):
         max_, _ = torch.max(band_pass, dim=1, keepdim=True)
         band_pass = band_pass / max_
 
-        filters = (band_pass * self.window_).view(
+        return (band_pass * self.window_).view(
             self.out_channels, 1, self.kernel_size)
 
+    def _apply(self, fn, *args, **kwargs):
+        # .to(device), .double(), etc.
+        module = super()._apply(fn, *args, **kwargs)
+        self.window_ = fn(self.window_)
+        self.n_ = fn(self.n_)
+        return module
+
+    def _filters_key(self):
+        # changes whenever parameters are updated in place (optimizer step,
+        # load_state_dict, ...) or replaced (e.g. sent to another device)
+        return tuple((p._version, p.data_ptr(), p.device, p.dtype)
+                     for p in (self.low_hz_, self.band_hz_))
+
+    def fft_conv1d(self, waveforms, filters):
+        """Frequency-domain equivalent of F.conv1d (overlap-save method)
+
+        Parameters
+        ----------
+        waveforms : `torch.Tensor` (batch_size, 1, n_samples)
+            Batch of waveforms.
+        filters : `torch.Tensor` (out_channels, 1, kernel_size)
+            Filters.
+
+        Returns
+        -------
+        features : `torch.Tensor` (batch_size, out_channels, n_samples_out)
+            Same as F.conv1d(waveforms, filters, ...)
+        """
+
+        # torch.fft module is only available since torch 1.7
+        try:
+            import torch.fft
+        except ImportError as e:
+            msg = 'SincConv(fft=True) requires torch >= 1.7.'
+            raise ImportError(msg) from e
+
+        if self.padding:
+            waveforms = F.pad(waveforms, (self.padding, self.padding))
+
+        if self.dilation > 1:
+            dilated = filters.new_zeros(
+                self.out_channels, 1,
+                self.dilation * (self.kernel_size - 1) + 1)
+            dilated[:, :, ::self.dilation] = filters
+            filters = dilated
+
+        batch_size, _, n_samples = waveforms.shape
+        kernel_size = filters.shape[2]
+        n_valid = n_samples - kernel_size + 1
+        if n_valid < 1:
+            msg = (f'Waveforms are too short ({n_samples:d} samples) for '
+                   f'{kernel_size:d}-sample long filters.')
+            raise ValueError(msg)
+
+        # each block of n_fft samples provides (n_fft - kernel_size + 1)
+        # valid outputs (circular correlation does not wrap around there)
+        n_fft = 2 ** int(math.ceil(math.log2(8 * kernel_size)))
+        hop = n_fft - kernel_size + 1
+        n_blocks = int(math.ceil(n_valid / hop))
+        waveforms = F.pad(
+            waveforms, (0, (n_blocks - 1) * hop + n_fft - n_samples))
+
+        # (batch_size, 1, n_blocks, n_fft // 2 + 1)
+        blocks = torch.fft.rfft(waveforms.unfold(2, n_fft, hop), n=n_fft)
+
+        # conjugate for cross-correlation (not convolution), like F.conv1d
+        # (1, out_channels, 1, n_fft // 2 + 1)
+        filters = torch.conj(torch.fft.rfft(filters, n=n_fft)).unsqueeze(0)
+
+        # (batch_size, out_channels, n_blocks, hop)
+        features = torch.fft.irfft(blocks * filters, n=n_fft)[..., :hop]
+        features = features.reshape(batch_size, self.out_channels, -1)
+
+        return features[:, :, :n_valid:self.stride]
+
+    def forward(self, waveforms):
+        """
+
+        Parameters
+        ----------
+        waveforms : `torch.Tensor` (batch_size, 1, n_samples)
+            Batch of waveforms.
+
+        Returns
+        -------
+        features : `torch.Tensor` (batch_size, out_channels, n_samples_out)
+            Batch of sinc filters activations.
+
+        """
+
+        # filters do not need to be recomputed at every forward pass when
+        # gradients are not needed (e.g. at inference time)
+        if torch.is_grad_enabled():
+            filters = self.get_filters()
+
+        else:
+            key = self._filters_key()
+            if self.filters_ is None or self.filters_key_ != key:
+                self.filters_ = self.get_filters()
+                self.filters_key_ = key
+            filters = self.filters_
+
+        if self.fft:
+            return self.fft_conv1d(waveforms, filters)
+
         return F.conv1d(waveforms, filters, stride=self.stride,
                         padding=self.padding, dilation=self.dilation,
                         bias=None, groups=1)
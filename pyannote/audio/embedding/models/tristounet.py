@@ -124,12 +124,9 @@ class TristouNet(nn.Module):
 
         if packed_sequences:
             _, n_features = sequence.data.size()
-            batch_size = sequence.batch_sizes[0].item()
-            device = sequence.data.device
         else:
             # check input feature dimension
-            batch_size, _, n_features = sequence.size()
-            device = sequence.device
+            _, _, n_features = sequence.size()
 
         if n_features != self.n_features:
             msg = 'Wrong feature dimension. Found {0}, should be {1}'
@@ -138,24 +135,11 @@ class TristouNet(nn.Module):
         output = sequence
 
         # recurrent layers
-        for hidden_dim, layer in zip(self.recurrent, self.recurrent_layers_):
-
-            if self.rnn == 'LSTM':
-                # initial hidden and cell states
-                h = torch.zeros(self.num_directions_, batch_size, hidden_dim,
-                                device=device, requires_grad=False)
-                c = torch.zeros(self.num_directions_, batch_size, hidden_dim,
-                                device=device, requires_grad=False)
-                hidden = (h, c)
-
-            elif self.rnn == 'GRU':
-                # initial hidden state
-                hidden = torch.zeros(
-                    self.num_directions_, batch_size, hidden_dim,
-                    device=device, requires_grad=False)
+        # (initial hidden and cell states are zero-initialized by PyTorch)
+        for layer in self.recurrent_layers_:
 
             # apply current recurrent layer and get output sequence
-            output, _ = layer(output, hidden)
+            output, _ = layer(output)
 
         if packed_sequences:
             output, lengths = pad_packed_sequence(output, batch_first=True)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Self-contained inference models
+
+A model exported with `export_model` is a single TorchScript archive that can
+be loaded (with `load_exported`) without the training stack: neither the
+experiment directory nor its config.yml, nor the architecture, task or
+application classes (and their tensorboardX dependency) are needed.
+
+The archive also embeds the configuration needed to apply the model
+(feature extraction, sliding window, output dimension) as YAML.
+"""
+
+import zipfile
+import yaml
+import torch
+from pyannote.core.utils.helper import get_class_by_name
+
+# name of the configuration file embedded in exported models
+EXPORT_YML = 'pyannote.yml'
+
+
+def export_model(model, exported_pt, example, config):
+    """Trace model and save it along with its configuration
+
+    Parameters
+    ----------
+    model : `nn.Module`
+        Model. Its forward pass should only depend on the shape of its input
+        (models relying on `PackedSequence` or on Python lists of layers
+        cannot be scripted, but can be traced).
+    exported_pt : `str` or `Path`
+        Path to exported model.
+    example : (1, n_samples, n_features) `torch.Tensor`
+        Example input sequence used for tracing. Model and example should be
+        on CPU: traced models are bound to the device they were traced on.
+    config : dict
+        Configuration embedded in exported model. Should contain (at least)
+        'feature_extraction' ({'name': ..., 'params': ...}) and 'duration'.
+        'n_classes' (resp. 'output_dim') is exposed as an attribute of the
+        loaded model (see `load_exported`).
+    """
+
+    # tracer warnings are not silenced on purpose: they report parts of the
+    # forward pass that are specialized to `example` (e.g. input checks on
+    # the number of features), which must not depend on the number of frames
+    model = model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+
+    extra_files = {EXPORT_YML: yaml.dump(config, default_flow_style=False)}
+    torch.jit.save(traced, str(exported_pt), _extra_files=extra_files)
+
+
+def is_exported(path):
+    """Check whether `path` is a model created by `export_model`"""
+
+    try:
+        with zipfile.ZipFile(str(path)) as archive:
+            names = archive.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return False
+    return any(name.endswith(f'/extra/{EXPORT_YML}') for name in names)
+
+
+def load_exported(exported_pt, device=None):
+    """Load model created by `export_model`
+
+    Parameters
+    ----------
+    exported_pt : `str` or `Path`
+        Path to exported model.
+    device : torch.device, optional
+        Only CPU is supported (exported models are traced on CPU).
+        Defaults to CPU.
+
+    Returns
+    -------
+    model : `torch.jit.ScriptModule`
+        Model, in evaluation mode.
+    feature_extraction : callable
+        Feature extractor.
+    config : dict
+        Embedded configuration.
+
+    Usage
+    -----
+    >>> model, feature_extraction, config = load_exported('0100.jit.pt')
+    >>> features = feature_extraction(current_file)
+    """
+
+    device = torch.device('cpu') if device is None else torch.device(device)
+    if device.type != 'cpu':
+        msg = (f'Exported models can only run on CPU (not on "{device}"): '
+               f'they are traced on CPU and may depend on it.')
+        raise ValueError(msg)
+
+    extra_files = {EXPORT_YML: ''}
+    model = torch.jit.load(str(exported_pt), map_location=device,
+                           _extra_files=extra_files)
+    config = yaml.safe_load(extra_files[EXPORT_YML])
+
+    for attribute in ['n_classes', 'output_dim']:
+        if attribute in config:
+            setattr(model, attribute, config[attribute])
+
+    FeatureExtraction = get_class_by_name(
+        config['feature_extraction']['name'],
+        default_module_name='pyannote.audio.features')
+    feature_extraction = FeatureExtraction(
+        **config['feature_extraction'].get('params', {}))
+
+    return model.eval(), feature_extraction, config
@@ -47,6 +47,14 @@ except Exception as e:
             f'because something went wrong when importing them: "{e}".')
         print(msg)
 
+try:
+    from .with_torch import TorchMFCC, TorchMelSpectrogram
+except Exception as e:
+        msg = (
+            f'Feature extractors based on "torch" are not available '
+            f'because something went wrong when importing them: "{e}".')
+        print(msg)
+
 try:
     from .with_python_speech_features import PySpeechFeaturesMFCC
 except Exception as e:
@@ -120,6 +120,27 @@ class FeatureExtraction(object):
                '`get_features` method.')
         raise NotImplementedError(msg)
 
+    def get_features_batch(self, Y, sample_rate):
+        """Extract features from a whole batch of waveforms
+
+        Default implementation extracts features one waveform after the
+        other. Subclasses are encouraged to provide a vectorized version.
+
+        Parameters
+        ----------
+        Y : (batch_size, n_samples) numpy array
+            Batch of (mono) waveforms.
+        sample_rate : int
+            Sample rate.
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) numpy array
+            Extracted features
+        """
+        return np.stack([self.get_features(y.reshape(-1, 1), sample_rate)
+                         for y in Y])
+
     def __call__(self, current_file):
         """Extract features from file
 
@@ -211,3 +232,99 @@ class FeatureExtraction(object):
         (start, end), = shifted_frames.crop(segment, mode=mode, fixed=fixed,
                                             return_ranges=True)
         return features[start:end]
+
+    def get_batch_shape(self, batch_size, duration):
+        """Get shape of batches returned by `crop_batch`
+
+        Parameters
+        ----------
+        batch_size : int
+            Batch size.
+        duration : float
+            Segments duration.
+
+        Returns
+        -------
+        shape : (batch_size, n_frames, dimension) tuple
+        """
+        n_frames = self.sliding_window.samples(duration, mode='center')
+        return (batch_size, n_frames, self.dimension)
+
+    def crop_batch(self, current_files, starts, duration, out=None):
+        """Extract fixed-duration features for a whole batch of segments
+
+        Waveforms of all segments (extended with context on both sides) are
+        cropped and augmented as one batch (see `RawAudio.crop_batch`), then
+        featurized in one call to `get_features_batch`. Segments whose context
+        would extend beyond the file boundaries fall back to `crop`.
+
+        Parameters
+        ----------
+        current_files : list of dict
+            `pyannote.database` files (one per segment).
+        starts : (batch_size, ) numpy array
+            Segments start time.
+        duration : float
+            Segments duration.
+        out : (batch_size, n_frames, dimension) numpy array, optional
+            Preallocated array where features are stored.
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) numpy array
+            Extracted features (stored in `out` when provided).
+
+        See also
+        --------
+        `FeatureExtraction.crop`
+        """
+
+        for current_file in current_files:
+            if 'duration' not in current_file:
+                msg = ('`FeatureExtraction.crop_batch` method expects '
+                       '`current_files` to contain a precomputed "duration" '
+                       'key.')
+                raise ValueError(msg)
+
+        starts = np.asarray(starts, dtype=np.float64)
+        context = self.get_context_duration()
+
+        # only segments whose context fits into the file can be batched
+        durations = np.array([f['duration'] for f in current_files])
+        inside = (starts - context >= 0) & \
+                 (starts + duration + context <= durations)
+        batched, = np.where(inside)
+        fallback, = np.where(~inside)
+
+        if len(batched) > 0:
+
+            # obtain (augmented) waveforms on extended segments
+            Y = self.raw_audio_.crop_batch(
+                [current_files[b] for b in batched], starts[batched] - context,
+                duration + 2 * context)
+
+            features = self.get_features_batch(Y[:, :, 0], self.sample_rate)
+
+            # get rid of additional context
+            frames = self.sliding_window
+            shifted_frames = SlidingWindow(start=-frames.step,
+                                           step=frames.step,
+                                           duration=frames.duration)
+            (start, end), = shifted_frames.crop(
+                Segment(context, context + duration), mode='center',
+                fixed=duration, return_ranges=True)
+
+            if out is None:
+                out = np.empty((len(starts), end - start, features.shape[2]),
+                               dtype=np.float32)
+            out[batched] = features[:, start:end]
+
+        for b in fallback:
+            X = self.crop(current_files[b],
+                          Segment(starts[b], starts[b] + duration),
+                          mode='center', fixed=duration)
+            if out is None:
+                out = np.empty((len(starts), ) + X.shape, dtype=np.float32)
+            out[b] = X
+
+        return out
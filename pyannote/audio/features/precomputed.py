@@ -212,6 +212,58 @@ class Precomputed(object):
         del memmap
         return result
 
+    def get_batch_shape(self, batch_size, duration):
+        """Get shape of batches returned by `crop_batch`"""
+        n_frames = self.sliding_window.samples(duration, mode='center')
+        return (batch_size, n_frames, self.dimension)
+
+    def crop_batch(self, current_files, starts, duration, out=None):
+        """Fast version of `crop` for a whole batch of fixed-duration segments
+
+        Segments are grouped by file, and the features of each group are
+        gathered by one fancy indexing operation on the file memmap.
+
+        Parameters
+        ----------
+        current_files : list of dict
+            `pyannote.database` files (one per segment).
+        starts : (batch_size, ) numpy array
+            Segments start time.
+        duration : float
+            Segments duration.
+        out : (batch_size, n_frames, dimension) numpy array, optional
+            Preallocated array where features are stored.
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) numpy array
+            Extracted features (stored in `out` when provided).
+        """
+
+        frames = self.sliding_window_
+        n_frames = frames.samples(duration, mode='center')
+        if out is None:
+            out = np.empty((len(starts), n_frames, self.dimension_),
+                           dtype=np.float32)
+
+        # same as frames.closest_frame for all segments at once
+        first = np.rint((np.asarray(starts) - frames.start
+                         - .5 * frames.duration) / frames.step).astype(np.int64)
+        indices = first[:, np.newaxis] + np.arange(n_frames)
+
+        groups = {}
+        for b, current_file in enumerate(current_files):
+            groups.setdefault(self.get_path(current_file), []).append(b)
+
+        for path, rows in groups.items():
+            memmap = open_memmap(path, mode='r')
+            # frames out of bounds are replaced by first/last frame,
+            # as in `SlidingWindowFeature.crop`
+            out[rows] = memmap[np.clip(indices[rows], 0, len(memmap) - 1)]
+            del memmap
+
+        return out
+
     def shape(self, item):
         """Faster version of precomputed(item).data.shape"""
         memmap = open_memmap(self.get_path(item), mode='r')
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""
+Vectorized spectral features
+----------------------------
+
+Batched (and librosa-compatible) versions of the STFT, mel-spectrogram, MFCC
+and delta features used by `Librosa*` feature extractors. Windows, mel
+filterbanks, DCT bases and delta kernels are computed once per configuration
+and cached.
+"""
+
+import inspect
+import functools
+import numpy as np
+import scipy.signal
+import librosa
+
+# padding mode used by (the installed version of) librosa when centering
+# frames ('reflect' up to librosa 0.9, 'constant' since librosa 0.10)
+try:
+    PAD_MODE = inspect.signature(librosa.core.stft).parameters[
+        'pad_mode'].default
+except (ValueError, KeyError):
+    PAD_MODE = 'reflect'
+
+# approximate number of float32 values processed at once by `stft`
+MAX_BLOCK_SIZE = 2 ** 22
+
+
+@functools.lru_cache(maxsize=None)
+def get_window(window, n_fft):
+    """Get (periodic) analysis window"""
+    return scipy.signal.get_window(window, n_fft,
+                                   fftbins=True).astype(np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def get_mel_basis(sample_rate, n_fft, n_mels, fmin=0.0, fmax=None,
+                  htk=False):
+    """Get (n_mels, 1 + n_fft // 2) mel filterbank"""
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft,
+                                    n_mels=n_mels, fmin=fmin, fmax=fmax,
+                                    htk=htk)
+    return mel_basis.astype(np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def get_dct_basis(n_mfcc, n_mels):
+    """Get (n_mfcc, n_mels) orthonormal DCT-II basis"""
+    samples = np.arange(1, 2 * n_mels, 2) * np.pi / (2. * n_mels)
+    basis = np.cos(np.arange(n_mfcc)[:, np.newaxis] * samples)
+    basis *= np.sqrt(2. / n_mels)
+    basis[0] = 1. / np.sqrt(n_mels)
+    return basis.astype(np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def get_delta_kernel(width, order):
+    """Get Savitzky-Golay derivative filter
+
+    Returns
+    -------
+    kernel : (width, ) numpy array
+        Kernel applied (as a dot product) to every `width`-long window.
+    left, right : (width // 2, width) numpy arrays
+        Linear operators applied to the first (resp. last) `width` frames to
+        obtain the first (resp. last) `width // 2` derivatives (polynomial
+        interpolation at edges).
+    """
+    kernel = scipy.signal.savgol_coeffs(width, order, deriv=order, use='dot')
+    edges = scipy.signal.savgol_filter(np.eye(width), width, order,
+                                       deriv=order, axis=0, mode='interp')
+    left, right = edges[:width // 2], edges[-(width // 2):]
+    return tuple(a.astype(np.float32) for a in (kernel, left, right))
+
+
+def frame(Y, n_fft, hop_length, center=True, pad_mode=PAD_MODE):
+    """Slice a batch of waveforms into (overlapping) frames
+
+    Parameters
+    ----------
+    Y : (batch_size, n_samples) numpy array
+        Batch of waveforms.
+    n_fft : int
+        Frame length (in samples).
+    hop_length : int
+        Frame step (in samples).
+    center : bool, optional
+        Pad waveforms so that frames are centered. Defaults to True.
+    pad_mode : str, optional
+        Padding mode. Defaults to the one used by librosa.
+
+    Returns
+    -------
+    frames : (batch_size, n_frames, n_fft) numpy array
+        Read-only view on (padded) waveforms.
+    """
+
+    Y = np.ascontiguousarray(Y, dtype=np.float32)
+    if center:
+        Y = np.pad(Y, [(0, 0), (n_fft // 2, n_fft // 2)], mode=pad_mode)
+
+    n_frames = 1 + (Y.shape[1] - n_fft) // hop_length
+    if n_frames < 1:
+        msg = (f'Waveforms are too short ({Y.shape[1]:d} samples) for '
+               f'n_fft={n_fft:d}.')
+        raise ValueError(msg)
+
+    batch_stride, sample_stride = Y.strides
+    return np.lib.stride_tricks.as_strided(
+        Y, shape=(Y.shape[0], n_frames, n_fft),
+        strides=(batch_stride, hop_length * sample_stride, sample_stride),
+        writeable=False)
+
+
+def stft(Y, n_fft, hop_length, window='hann', power=1.0):
+    """Batched (magnitude) short-time Fourier transform
+
+    Parameters
+    ----------
+    Y : (batch_size, n_samples) numpy array
+        Batch of waveforms.
+    n_fft : int
+        Frame length (in samples).
+    hop_length : int
+        Frame step (in samples).
+    window : str, optional
+        Window function. Defaults to 'hann'.
+    power : float, optional
+        Exponent for the magnitude spectrogram. Defaults to 1.
+
+    Returns
+    -------
+    S : (batch_size, n_frames, 1 + n_fft // 2) numpy array
+        Magnitude spectrogram (to the power of `power`)
+    """
+
+    frames = frame(Y, n_fft, hop_length)
+    batch_size, n_frames, _ = frames.shape
+    fft_window = get_window(window, n_fft)
+
+    S = np.empty((batch_size, n_frames, 1 + n_fft // 2), dtype=np.float32)
+    block_size = max(1, MAX_BLOCK_SIZE // (batch_size * n_fft))
+    for i in range(0, n_frames, block_size):
+        block = np.abs(np.fft.rfft(fft_window * frames[:, i:i + block_size],
+                                   axis=-1))
+        if power != 1.0:
+            block **= power
+        S[:, i:i + block_size] = block
+
+    return S
+
+
+def melspectrogram(Y, sample_rate, n_fft, hop_length, n_mels=128,
+                   fmin=0.0, fmax=None, htk=False, power=2.0):
+    """Batched mel-spectrogram
+
+    Returns
+    -------
+    M : (batch_size, n_frames, n_mels) numpy array
+        Mel-spectrogram
+    """
+    S = stft(Y, n_fft, hop_length, window='hann', power=power)
+    mel_basis = get_mel_basis(sample_rate, n_fft, n_mels, fmin=fmin,
+                              fmax=fmax, htk=htk)
+    return S @ mel_basis.T
+
+
+def power_to_db(S, ref=1.0, amin=1e-10, top_db=80.0):
+    """Batched `librosa.power_to_db`
+
+    Contrary to `librosa.power_to_db`, `top_db` thresholding is applied
+    independently to each element of the batch.
+    """
+    log_S = 10.0 * np.log10(np.maximum(amin, S))
+    log_S -= 10.0 * np.log10(np.maximum(amin, ref))
+    if top_db is not None:
+        peak = np.max(log_S, axis=tuple(range(1, log_S.ndim)), keepdims=True)
+        log_S = np.maximum(log_S, peak - top_db)
+    return log_S
+
+
+def mfcc(Y, sample_rate, n_mfcc, n_fft, hop_length, n_mels=128,
+         fmin=0.0, fmax=None, htk=False):
+    """Batched MFCC
+
+    Returns
+    -------
+    C : (batch_size, n_frames, n_mfcc) numpy array
+        Mel-frequency cepstral coefficients
+    """
+    M = power_to_db(melspectrogram(Y, sample_rate, n_fft, hop_length,
+                                   n_mels=n_mels, fmin=fmin, fmax=fmax,
+                                   htk=htk))
+    return M @ get_dct_basis(n_mfcc, n_mels).T
+
+
+def delta(X, width=9, order=1):
+    """Batched `librosa.feature.delta` (along the time axis)
+
+    Parameters
+    ----------
+    X : (batch_size, n_frames, dimension) numpy array
+        Features.
+    width : int, optional
+        Number of frames over which to compute the derivative. Must be an
+        odd integer. Defaults to 9.
+    order : int, optional
+        Order of the derivative. Defaults to 1.
+
+    Returns
+    -------
+    D : (batch_size, n_frames, dimension) numpy array
+        Derivatives.
+    """
+
+    n_frames = X.shape[1]
+    if width < 3 or width % 2 != 1:
+        msg = f'width must be an odd integer >= 3 (is {width}).'
+        raise ValueError(msg)
+    if n_frames < width:
+        msg = (f'width ({width:d}) cannot exceed the number of frames '
+               f'({n_frames:d}).')
+        raise ValueError(msg)
+
+    kernel, left, right = get_delta_kernel(width, order)
+    half = width // 2
+
+    D = np.empty_like(X, dtype=np.float32)
+
+    # interior: sliding dot product with the kernel
+    D[:, half:n_frames - half] = 0.
+    for k, weight in enumerate(kernel):
+        D[:, half:n_frames - half] += weight * X[:, k:n_frames - width + 1 + k]
+
+    # edges: polynomial interpolation
+    D[:, :half] = np.einsum('ij,bjd->bid', left, X[:, :width])
+    D[:, n_frames - half:] = np.einsum('ij,bjd->bid', right,
+                                       X[:, n_frames - width:])
+
+    return D
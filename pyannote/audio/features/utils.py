@@ -32,6 +32,7 @@ import librosa
 from librosa.util import valid_audio
 from librosa.util.exceptions import ParameterError
 
+from pyannote.core import Segment
 from pyannote.core import SlidingWindow, SlidingWindowFeature
 import tempfile
 
@@ -242,7 +243,8 @@ class RawAudio(object):
     def get_context_duration(self):
         return 0.
 
-    def crop(self, current_file, segment, mode='center', fixed=None):
+    def crop(self, current_file, segment, mode='center', fixed=None,
+             augment=True):
         """Fast version of self(current_file).crop(segment, **kwargs)
 
         Parameters
@@ -251,6 +253,8 @@ class RawAudio(object):
             `pyannote.database` file.
         segment : `pyannote.core.Segment`
             Segment from which to extract features.
+        augment : bool, optional
+            Set to False to skip data augmentation. Defaults to True.
 
         Returns
         -------
@@ -323,7 +327,57 @@ class RawAudio(object):
                    f"between {segment.start:.3f}s and {segment.end:.3f}s.")
             raise ValueError(msg)
 
-        if self.augmentation is not None:
+        if augment and self.augmentation is not None:
             data = self.augmentation(data, sample_rate)
 
         return data
+
+    def get_batch_shape(self, batch_size, duration):
+        """Get shape of batches returned by `crop_batch`"""
+        n_frames = self.sliding_window.samples(duration, mode='center')
+        return (batch_size, n_frames, self.dimension)
+
+    def crop_batch(self, current_files, starts, duration, out=None):
+        """Extract fixed-duration waveforms for a whole batch of segments
+
+        Waveforms are first cropped (without augmentation) into one
+        (batch_size, n_samples) array, and then augmented all at once using
+        `Augmentation.augment_batch`.
+
+        Parameters
+        ----------
+        current_files : list of dict
+            `pyannote.database` files (one per segment).
+        starts : (batch_size, ) numpy array
+            Segments start time.
+        duration : float
+            Segments duration.
+        out : (batch_size, n_samples, 1) numpy array, optional
+            Preallocated array where waveforms are stored.
+
+        Returns
+        -------
+        waveforms : (batch_size, n_samples, 1) numpy array
+            (Augmented) waveforms (stored in `out` when provided).
+        """
+
+        if not self.mono:
+            msg = '`RawAudio.crop_batch` only supports mono waveforms.'
+            raise ValueError(msg)
+
+        for b, (current_file, start) in enumerate(zip(current_files, starts)):
+            y = self.crop(current_file, Segment(start, start + duration),
+                          mode='center', fixed=duration, augment=False)
+            if out is None:
+                out = np.empty((len(starts), ) + y.shape, dtype=np.float32)
+            out[b] = y
+
+        if self.augmentation is not None:
+            out[:, :, 0] = self.augmentation.augment_batch(
+                out[:, :, 0], self.sample_rate)
+
+            if not np.all(np.isfinite(out)):
+                msg = (f"Something went wrong when augmenting waveforms.")
+                raise ValueError(msg)
+
+        return out
@@ -31,10 +31,10 @@ Feature extraction with librosa
 -------------------------------
 """
 
-import librosa
 import numpy as np
 
 from .base import FeatureExtraction
+from . import spectral
 from pyannote.core.segment import SlidingWindow
 
 
@@ -112,10 +112,26 @@ class LibrosaSpectrogram(LibrosaFeatureExtraction):
             Features
         """
 
-        fft = librosa.core.stft(y=y.squeeze(), n_fft=self.n_fft_,
-                                hop_length=self.hop_length_,
-                                center=True, window='hamming')
-        return np.abs(fft).T
+        return self.get_features_batch(y.reshape(1, -1), sample_rate)[0]
+
+    def get_features_batch(self, Y, sample_rate):
+        """Vectorized feature extraction
+
+        Parameters
+        ----------
+        Y : (batch_size, n_samples) numpy array
+            Batch of waveforms
+        sample_rate : int
+            Sample rate
+
+        Returns
+        -------
+        data : (batch_size, n_frames, n_dimensions) numpy array
+            Features
+        """
+
+        return spectral.stft(Y, self.n_fft_, self.hop_length_,
+                             window='hamming')
 
 
 class LibrosaMelSpectrogram(LibrosaFeatureExtraction):
@@ -164,12 +180,31 @@ class LibrosaMelSpectrogram(LibrosaFeatureExtraction):
             Features
         """
 
-        X = librosa.feature.melspectrogram(
-            y.squeeze(), sr=sample_rate, n_mels=self.n_mels,
-            n_fft=self.n_fft_, hop_length=self.hop_length_,
-            power=2.0)
+        return self.get_features_batch(y.reshape(1, -1), sample_rate)[0]
+
+    def get_features_batch(self, Y, sample_rate):
+        """Vectorized feature extraction
+
+        Parameters
+        ----------
+        Y : (batch_size, n_samples) numpy array
+            Batch of waveforms
+        sample_rate : int
+            Sample rate
+
+        Returns
+        -------
+        data : (batch_size, n_frames, n_mels) numpy array
+            Features
+        """
+
+        X = spectral.melspectrogram(Y, sample_rate, self.n_fft_,
+                                    self.hop_length_, n_mels=self.n_mels,
+                                    power=2.0)
 
-        return librosa.amplitude_to_db(X, ref=1.0, amin=1e-5, top_db=80.0).T
+        # same as librosa.amplitude_to_db(X, ref=1.0, amin=1e-5, top_db=80.)
+        return spectral.power_to_db(X ** 2, ref=1.0, amin=1e-10,
+                                    top_db=80.0)
 
 
 class LibrosaMFCC(LibrosaFeatureExtraction):
@@ -266,46 +301,60 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
             Features
         """
 
+        return self.get_features_batch(y.reshape(1, -1), sample_rate)[0]
+
+    def get_features_batch(self, Y, sample_rate):
+        """Vectorized feature extraction
+
+        Parameters
+        ----------
+        Y : (batch_size, n_samples) numpy array
+            Batch of waveforms
+        sample_rate : int
+            Sample rate
+
+        Returns
+        -------
+        data : (batch_size, n_frames, n_dimensions) numpy array
+            Features
+        """
+
         # adding because C0 is the energy
         n_mfcc = self.coefs + 1
 
         n_fft = int(self.duration * sample_rate)
         hop_length = int(self.step * sample_rate)
 
-        mfcc = librosa.feature.mfcc(
-            y=y.squeeze(), sr=sample_rate, n_mfcc=n_mfcc,
-            n_fft=n_fft, hop_length=hop_length,
-            n_mels=self.n_mels, htk=True,
-            fmin=self.fmin, fmax=self.fmax)
+        mfcc = spectral.mfcc(Y, sample_rate, n_mfcc, n_fft, hop_length,
+                             n_mels=self.n_mels, htk=True,
+                             fmin=self.fmin, fmax=self.fmax)
 
         if self.De or self.D:
-            mfcc_d = librosa.feature.delta(
-                mfcc, width=9, order=1, axis=-1)
+            mfcc_d = spectral.delta(mfcc, width=9, order=1)
 
         if self.DDe or self.DD:
-            mfcc_dd = librosa.feature.delta(
-                mfcc, width=9, order=2, axis=-1)
+            mfcc_dd = spectral.delta(mfcc, width=9, order=2)
 
         stack = []
 
         if self.e:
-            stack.append(mfcc[0, :])
+            stack.append(mfcc[:, :, :1])
 
-        stack.append(mfcc[1:, :])
+        stack.append(mfcc[:, :, 1:])
 
         if self.De:
-            stack.append(mfcc_d[0, :])
+            stack.append(mfcc_d[:, :, :1])
 
         if self.D:
-            stack.append(mfcc_d[1:, :])
+            stack.append(mfcc_d[:, :, 1:])
 
         if self.DDe:
-            stack.append(mfcc_dd[0, :])
+            stack.append(mfcc_dd[:, :, :1])
 
         if self.DD:
-            stack.append(mfcc_dd[1:, :])
+            stack.append(mfcc_dd[:, :, 1:])
 
-        return np.vstack(stack).T
+        return np.concatenate(stack, axis=-1)
 
     def get_dimension(self):
         n_features = 0
@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""
+Feature extraction with torch
+-----------------------------
+
+`torch.nn.Module` counterparts of `LibrosaMelSpectrogram` and `LibrosaMFCC`.
+Filterbanks, DCT bases and delta kernels are registered as buffers, so that
+features can be extracted on the same device as the model.
+"""
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from .base import FeatureExtraction
+from . import spectral
+from pyannote.core import Segment
+from pyannote.core import SlidingWindow
+
+
+class STFT(nn.Module):
+    """Power spectrogram computed as a strided 1D convolution
+
+    Parameters
+    ----------
+    n_fft : int
+        Frame length (in samples).
+    hop_length : int
+        Frame step (in samples).
+    window : str, optional
+        Window function. Defaults to 'hann'.
+    power : float, optional
+        Exponent for the magnitude spectrogram. Defaults to 2.
+    """
+
+    def __init__(self, n_fft, hop_length, window='hann', power=2.0):
+        super().__init__()
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.power = power
+
+        n_freq = 1 + n_fft // 2
+        phase = 2 * np.pi * np.outer(np.arange(n_freq), np.arange(n_fft)) / n_fft
+        fft_window = spectral.get_window(window, n_fft)
+        kernel = np.vstack([np.cos(phase), -np.sin(phase)]) * fft_window
+        self.register_buffer(
+            'kernel', torch.tensor(kernel[:, np.newaxis], dtype=torch.float32))
+
+    def forward(self, waveforms):
+        """
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples) `torch.Tensor`
+
+        Returns
+        -------
+        S : (batch_size, 1 + n_fft // 2, n_frames) `torch.Tensor`
+        """
+        x = waveforms.unsqueeze(1)
+        pad = self.n_fft // 2
+        x = F.pad(x, (pad, pad), mode=spectral.PAD_MODE)
+        x = F.conv1d(x, self.kernel, stride=self.hop_length)
+        real, imag = torch.chunk(x, 2, dim=1)
+        S = real ** 2 + imag ** 2
+        if self.power != 2.0:
+            S = S ** (.5 * self.power)
+        return S
+
+
+def power_to_db(S, amin=1e-10, top_db=80.0):
+    """Same as `spectral.power_to_db` (with ref=1.0) for `torch.Tensor`"""
+    log_S = 10.0 * torch.log10(torch.clamp(S, min=amin))
+    if top_db is not None:
+        batch_size = log_S.shape[0]
+        peak, _ = log_S.contiguous().view(batch_size, -1).max(dim=1)
+        peak = peak.view((batch_size, ) + (1, ) * (log_S.dim() - 1))
+        log_S = torch.max(log_S, peak - top_db)
+    return log_S
+
+
+class Delta(nn.Module):
+    """Same as `spectral.delta` for `torch.Tensor`
+
+    Parameters
+    ----------
+    width : int, optional
+        Number of frames over which to compute the derivative. Defaults to 9.
+    order : int, optional
+        Order of the derivative. Defaults to 1.
+    """
+
+    def __init__(self, width=9, order=1):
+        super().__init__()
+        self.width = width
+        kernel, left, right = spectral.get_delta_kernel(width, order)
+        self.register_buffer('kernel', torch.tensor(kernel).view(1, 1, -1))
+        self.register_buffer('left', torch.tensor(left))
+        self.register_buffer('right', torch.tensor(right))
+
+    def forward(self, X):
+        """
+        Parameters
+        ----------
+        X : (batch_size, dimension, n_frames) `torch.Tensor`
+
+        Returns
+        -------
+        D : (batch_size, dimension, n_frames) `torch.Tensor`
+        """
+        batch_size, dimension, n_frames = X.shape
+        if n_frames < self.width:
+            msg = (f'width ({self.width:d}) cannot exceed the number of '
+                   f'frames ({n_frames:d}).')
+            raise ValueError(msg)
+
+        x = X.contiguous().view(batch_size * dimension, 1, n_frames)
+        interior = F.conv1d(x, self.kernel).view(batch_size, dimension, -1)
+        left = torch.matmul(X[:, :, :self.width], self.left.t())
+        right = torch.matmul(X[:, :, -self.width:], self.right.t())
+        return torch.cat([left, interior, right], dim=2)
+
+
+class MelSpectrogram(nn.Module):
+    """Log-mel spectrogram (same as `LibrosaMelSpectrogram`)
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    n_mels : int, optional
+        Defaults to 96.
+    """
+
+    def __init__(self, sample_rate=16000, duration=0.025, step=0.010,
+                 n_mels=96):
+        super().__init__()
+        self.n_mels = n_mels
+        n_fft = int(duration * sample_rate)
+        hop_length = int(step * sample_rate)
+        self.stft = STFT(n_fft, hop_length, window='hann', power=2.0)
+        mel_basis = spectral.get_mel_basis(sample_rate, n_fft, n_mels)
+        self.register_buffer('mel_basis', torch.tensor(mel_basis))
+
+    @property
+    def dimension(self):
+        return self.n_mels
+
+    def forward(self, waveforms):
+        """
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples) or (batch_size, n_samples, 1)
+            `torch.Tensor`
+
+        Returns
+        -------
+        features : (batch_size, n_frames, n_mels) `torch.Tensor`
+        """
+        if waveforms.dim() == 3:
+            waveforms = waveforms[:, :, 0]
+        M = torch.matmul(self.mel_basis, self.stft(waveforms))
+        # same as librosa.amplitude_to_db(M, ref=1.0, amin=1e-5, top_db=80.)
+        return power_to_db(M ** 2, amin=1e-10, top_db=80.0).transpose(1, 2)
+
+
+class MFCC(nn.Module):
+    """MFCC (and derivatives) (same as `LibrosaMFCC`)
+
+    Parameters
+    ----------
+    See `LibrosaMFCC`.
+    """
+
+    def __init__(self, sample_rate=16000, duration=0.025, step=0.01,
+                 e=False, De=True, DDe=True, coefs=19, D=True, DD=True,
+                 fmin=0.0, fmax=None, n_mels=40):
+        super().__init__()
+
+        self.e = e
+        self.coefs = coefs
+        self.De = De
+        self.DDe = DDe
+        self.D = D
+        self.DD = DD
+
+        n_fft = int(duration * sample_rate)
+        hop_length = int(step * sample_rate)
+        self.stft = STFT(n_fft, hop_length, window='hann', power=2.0)
+        mel_basis = spectral.get_mel_basis(sample_rate, n_fft, n_mels,
+                                           fmin=fmin, fmax=fmax, htk=True)
+        self.register_buffer('mel_basis', torch.tensor(mel_basis))
+
+        # adding because C0 is the energy
+        dct_basis = spectral.get_dct_basis(self.coefs + 1, n_mels)
+        self.register_buffer('dct_basis', torch.tensor(dct_basis))
+
+        self.delta = Delta(width=9, order=1)
+        self.delta2 = Delta(width=9, order=2)
+
+    @property
+    def dimension(self):
+        n_features = 0
+        n_features += self.e
+        n_features += self.De
+        n_features += self.DDe
+        n_features += self.coefs
+        n_features += self.coefs * self.D
+        n_features += self.coefs * self.DD
+        return n_features
+
+    def forward(self, waveforms):
+        """
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples) or (batch_size, n_samples, 1)
+            `torch.Tensor`
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) `torch.Tensor`
+        """
+        if waveforms.dim() == 3:
+            waveforms = waveforms[:, :, 0]
+
+        M = power_to_db(torch.matmul(self.mel_basis, self.stft(waveforms)))
+        mfcc = torch.matmul(self.dct_basis, M)
+
+        if self.De or self.D:
+            mfcc_d = self.delta(mfcc)
+
+        if self.DDe or self.DD:
+            mfcc_dd = self.delta2(mfcc)
+
+        stack = []
+
+        if self.e:
+            stack.append(mfcc[:, :1])
+
+        stack.append(mfcc[:, 1:])
+
+        if self.De:
+            stack.append(mfcc_d[:, :1])
+
+        if self.D:
+            stack.append(mfcc_d[:, 1:])
+
+        if self.DDe:
+            stack.append(mfcc_dd[:, :1])
+
+        if self.DD:
+            stack.append(mfcc_dd[:, 1:])
+
+        return torch.cat(stack, dim=1).transpose(1, 2)
+
+
+class TorchFeatureExtraction(FeatureExtraction):
+    """torch feature extraction base class
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    augmentation : `pyannote.audio.augmentation.Augmentation`, optional
+        Data augmentation.
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    fused : bool, optional
+        When True, training batches contain (augmented) raw waveforms and
+        features are only extracted (with `transform`) right before the
+        forward pass, on the same device as the model. Defaults to False
+        (i.e. features are extracted on CPU by batch generators).
+    """
+
+    def __init__(self, sample_rate=16000, augmentation=None,
+                 duration=0.025, step=0.01, fused=False):
+
+        super().__init__(sample_rate=sample_rate,
+                         augmentation=augmentation)
+        self.duration = duration
+        self.step = step
+        self.fused = fused
+
+        self.sliding_window_ = SlidingWindow(start=-.5*self.duration,
+                                             duration=self.duration,
+                                             step=self.step)
+
+    def get_sliding_window(self):
+        return self.sliding_window_
+
+    def get_dimension(self):
+        return self.module_.dimension
+
+    def get_features(self, y, sample_rate):
+        """Feature extraction
+
+        Parameters
+        ----------
+        y : (n_samples, 1) numpy array
+            Waveform
+        sample_rate : int
+            Sample rate
+
+        Returns
+        -------
+        data : (n_frames, n_dimensions) numpy array
+            Features
+        """
+        return self.get_features_batch(y.reshape(1, -1), sample_rate)[0]
+
+    def get_features_batch(self, Y, sample_rate):
+        """Vectorized feature extraction (on CPU)
+
+        Parameters
+        ----------
+        Y : (batch_size, n_samples) numpy array
+            Batch of waveforms
+        sample_rate : int
+            Sample rate
+
+        Returns
+        -------
+        data : (batch_size, n_frames, n_dimensions) numpy array
+            Features
+        """
+
+        if sample_rate != self.sample_rate:
+            msg = (f'Mismatch between expected ({self.sample_rate:d}) and '
+                   f'actual ({sample_rate}) sample rates.')
+            raise ValueError(msg)
+
+        device = self.module_.mel_basis.device
+        Y = torch.from_numpy(np.ascontiguousarray(Y, dtype=np.float32))
+        with torch.no_grad():
+            return self.module_(Y.to(device)).cpu().numpy()
+
+    def get_batch_shape(self, batch_size, duration):
+        if not self.fused:
+            return super().get_batch_shape(batch_size, duration)
+        return self.raw_audio_.get_batch_shape(batch_size, duration)
+
+    def crop_batch(self, current_files, starts, duration, out=None):
+        if not self.fused:
+            return super().crop_batch(current_files, starts, duration,
+                                      out=out)
+        return self.raw_audio_.crop_batch(current_files, starts, duration,
+                                          out=out)
+
+    def transform(self, waveforms):
+        """Extract features from a batch of waveforms returned by `crop_batch`
+        (in `fused` mode)
+
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples, 1) `torch.Tensor`
+            Batch of waveforms.
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) `torch.Tensor`
+            Features, with the same number of frames as `crop_batch` would
+            have returned in non-`fused` mode.
+        """
+
+        duration = waveforms.shape[1] / self.sample_rate
+        frames = self.sliding_window
+        shifted_frames = SlidingWindow(start=-frames.step,
+                                       step=frames.step,
+                                       duration=frames.duration)
+        (start, end), = shifted_frames.crop(Segment(0, duration),
+                                            mode='center', fixed=duration,
+                                            return_ranges=True)
+
+        module = self.module_.to(waveforms.device)
+        return module(waveforms.float())[:, start:end]
+
+
+class TorchMelSpectrogram(TorchFeatureExtraction):
+    """torch mel-spectrogram
+
+    Same features as `LibrosaMelSpectrogram`.
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    augmentation : `pyannote.audio.augmentation.Augmentation`, optional
+        Data augmentation.
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    n_mels : int, optional
+        Defaults to 96.
+    fused : bool, optional
+        See `TorchFeatureExtraction`. Defaults to False.
+
+    Usage
+    -----
+    In `config.yml`:
+
+    feature_extraction:
+       name: TorchMelSpectrogram
+       params:
+          n_mels: 96
+          fused: True
+    """
+
+    def __init__(self, sample_rate=16000, augmentation=None,
+                 duration=0.025, step=0.010, n_mels=96, fused=False):
+
+        super().__init__(sample_rate=sample_rate, augmentation=augmentation,
+                         duration=duration, step=step, fused=fused)
+
+        self.n_mels = n_mels
+        self.module_ = MelSpectrogram(sample_rate=sample_rate,
+                                      duration=duration, step=step,
+                                      n_mels=n_mels)
+
+
+class TorchMFCC(TorchFeatureExtraction):
+    """torch MFCC
+
+    Same features as `LibrosaMFCC`.
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    augmentation : `pyannote.audio.augmentation.Augmentation`, optional
+        Data augmentation.
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    e : bool, optional
+        Energy. Defaults to False.
+    coefs : int, optional
+        Number of coefficients. Defaults to 19.
+    De : bool, optional
+        Keep energy first derivative. Defaults to True.
+    D : bool, optional
+        Add first order derivatives. Defaults to True.
+    DDe : bool, optional
+        Keep energy second derivative. Defaults to True.
+    DD : bool, optional
+        Add second order derivatives. Defaults to True.
+    fused : bool, optional
+        See `TorchFeatureExtraction`. Defaults to False.
+
+    Usage
+    -----
+    In `config.yml`:
+
+    feature_extraction:
+       name: TorchMFCC
+       params:
+          coefs: 19
+          fused: True
+    """
+
+    def __init__(self, sample_rate=16000, augmentation=None,
+                 duration=0.025, step=0.01,
+                 e=False, De=True, DDe=True,
+                 coefs=19, D=True, DD=True,
+                 fmin=0.0, fmax=None, n_mels=40, fused=False):
+
+        super().__init__(sample_rate=sample_rate, augmentation=augmentation,
+                         duration=duration, step=step, fused=fused)
+
+        self.module_ = MFCC(sample_rate=sample_rate, duration=duration,
+                            step=step, e=e, De=De, DDe=DDe, coefs=coefs,
+                            D=D, DD=DD, fmin=fmin, fmax=fmax, n_mels=n_mels)
@@ -37,6 +37,10 @@ from pyannote.generators.batch import FileBasedBatchGenerator
 from pyannote.generators.fragment import SlidingSegments
 from pyannote.database import get_unique_identifier
 from pyannote.audio.features import Precomputed
+from pyannote.audio.train.utils import forward_by_length
+from pyannote.audio.train.utils import StagingBuffer
+from pyannote.audio.export import is_exported
+from pyannote.audio.export import load_exported
 
 
 class SequenceLabeling(FileBasedBatchGenerator):
@@ -48,25 +52,56 @@ class SequenceLabeling(FileBasedBatchGenerator):
         Model (or path to model). When a path, the directory structure created
         by pyannote command line tools (e.g. pyannote-speech-detection) should
         be kept unchanged so that one can find the corresponding configuration
-        file automatically.
+        file automatically, unless the model was exported (e.g. with
+        pyannote-speech-detection "export" mode): its configuration is then
+        embedded in the model file itself (see pyannote.audio.export).
     feature_extraction : callable, optional
         Feature extractor. When not provided and `model` is a path, it is
         inferred directly from the configuration file.
     duration : float, optional
         Subsequence duration, in seconds. When `model` is a path and `duration`
         is not provided, it is inferred directly from the configuration file.
+        Defaults to 1 second otherwise.
     step : float, optional
-        Subsequence step, in seconds. Defaults to 50% of `duration`.
+        Subsequence step, in seconds. Defaults to 50% of `duration` (or to the
+        step embedded in exported models).
     batch_size : int, optional
         Defaults to 32.
     device : torch.device, optional
-        Defaults to CPU.
+        Defaults to CPU. Exported models only run on CPU.
+    long_sequence : bool, optional
+        Process whole files with `model.forward_long` (chunk by chunk, see
+        `StackedRNN.forward_long`) instead of averaging predictions over
+        overlapping sliding windows. Each frame is then processed only once
+        (or a bit more with bidirectional models). Defaults to False.
+    margin : float, optional
+        Context (in seconds) added on both sides of each chunk when
+        `long_sequence` is True and the model is bidirectional. Defaults to
+        25% of `duration`.
     """
 
-    def __init__(self, model=None, feature_extraction=None, duration=1,
-                 min_duration=None, step=None, batch_size=32, device=None):
+    def __init__(self, model=None, feature_extraction=None, duration=None,
+                 min_duration=None, step=None, batch_size=32, device=None,
+                 long_sequence=False, margin=None):
 
-        if not isinstance(model, nn.Module):
+        self.device = torch.device('cpu') if device is None \
+                                          else torch.device(device)
+
+        if not isinstance(model, nn.Module) and is_exported(model):
+
+            # exported models do not need the training stack
+            model, exported_extraction, config = load_exported(
+                model, device=self.device)
+            if feature_extraction is None:
+                feature_extraction = exported_extraction
+
+            if duration is None:
+                duration = config['duration']
+
+            if step is None:
+                step = config.get('step', None)
+
+        elif not isinstance(model, nn.Module):
 
             # TODO. make all labeling apps inherit from a unique Labeling app
             from pyannote.audio.applications.speech_detection \
@@ -81,13 +116,21 @@ class SequenceLabeling(FileBasedBatchGenerator):
             if duration is None:
                 duration = app.task_.duration
 
-        self.device = torch.device('cpu') if device is None \
-                                          else torch.device(device)
+        if duration is None:
+            duration = 1.
+
         self.model = model.eval().to(self.device)
         self.feature_extraction = feature_extraction
         self.duration = duration
         self.min_duration = min_duration
 
+        self.long_sequence = long_sequence
+        if self.long_sequence and not hasattr(self.model, 'forward_long'):
+            msg = (f'{self.model.__class__.__name__} does not support long '
+                   f'sequence inference (no "forward_long" method).')
+            raise ValueError(msg)
+        self.margin = .25 * duration if margin is None else margin
+
         generator = SlidingSegments(duration=duration, step=step,
                                     min_duration=min_duration, source='audio')
         self.step = generator.step if step is None else step
@@ -198,27 +241,17 @@ class SequenceLabeling(FileBasedBatchGenerator):
             Batch of sequence embeddings.
         """
 
-        lengths = [len(x) for x in X]
-        variable_lengths = len(set(lengths)) > 1
+        if not hasattr(self, 'staging_'):
+            self.staging_ = StagingBuffer()
 
-        if variable_lengths:
-            _, sort = torch.sort(torch.tensor(lengths), descending=True)
-            _, unsort = torch.sort(sort)
-            sequences = [torch.tensor(X[i],
-                                      dtype=torch.float32,
-                                      device=self.device) for i in sort]
-            packed = pack_sequence(sequences)
-        else:
-            packed = torch.tensor(np.stack(X),
-                                  dtype=torch.float32,
-                                  device=self.device)
-
-        fX = self.model(packed).detach().to('cpu').numpy()
+        with torch.no_grad():
+            fX = forward_by_length(self.model, X, device=self.device,
+                                   staging=self.staging_)
 
-        if variable_lengths:
-            return fX[unsort]
+        if isinstance(fX, list):
+            return [fx.detach().to('cpu').numpy() for fx in fX]
 
-        return fX
+        return fX.detach().to('cpu').numpy()
 
     def __call__(self, current_file):
         """Compute predictions on a sliding window
@@ -234,6 +267,9 @@ class SequenceLabeling(FileBasedBatchGenerator):
             Predictions.
         """
 
+        if self.long_sequence:
+            return self._long_sequence(current_file)
+
         # frame and sub-sequence sliding windows
         frames = self.feature_extraction.sliding_window
         batches = [batch for batch in self.from_file(current_file,
@@ -279,3 +315,35 @@ class SequenceLabeling(FileBasedBatchGenerator):
         data = data / np.maximum(k, 1)
 
         return SlidingWindowFeature(data, frames)
+
+    def _long_sequence(self, current_file):
+        """Compute predictions on the whole file at once
+
+        Parameters
+        ----------
+        current_file : `dict`
+            File (from pyannote.database protocol)
+
+        Returns
+        -------
+        predictions : `SlidingWindowFeature`
+            Predictions.
+        """
+
+        preprocessed = self.preprocess(current_file)
+        if 'features' in preprocessed:
+            features = preprocessed['features']
+        else:
+            features = self.feature_extraction(current_file)
+
+        frames = features.sliding_window
+        chunk_size = frames.samples(self.duration, mode='center')
+        margin = frames.samples(self.margin, mode='center')
+
+        X = torch.from_numpy(np.asarray(features.data, dtype=np.float32))
+        with torch.no_grad():
+            fX = self.model.forward_long(X[np.newaxis], chunk_size=chunk_size,
+                                         margin=margin,
+                                         batch_size=self.batch_size)
+
+        return SlidingWindowFeature(fX[0].numpy(), frames)
@@ -163,25 +163,41 @@ class StackedRNN(nn.Module):
             output = F.instance_norm(output)
             output = output.transpose(1, 2)
 
-        # stack recurrent layers
-        for hidden_dim, layer in zip(self.recurrent, self.recurrent_layers_):
+        output, _ = self.forward_chunk(output)
+        return output
 
-            if self.rnn == 'LSTM':
-                # initial hidden and cell states
-                h = torch.zeros(self.num_directions_, batch_size, hidden_dim,
-                                device=device, requires_grad=False)
-                c = torch.zeros(self.num_directions_, batch_size, hidden_dim,
-                                device=device, requires_grad=False)
-                hidden = (h, c)
+    def forward_chunk(self, sequences, hidden=None):
+        """Apply recurrent, linear and final layers
 
-            elif self.rnn == 'GRU':
-                # initial hidden state
-                hidden = torch.zeros(
-                    self.num_directions_, batch_size, hidden_dim,
-                    device=device, requires_grad=False)
+        Parameters
+        ----------
+        sequences : (batch_size, n_samples, n_features) `torch.Tensor`
+            (Already normalized) input sequences.
+        hidden : list, optional
+            Initial hidden state of each recurrent layer, as returned by a
+            previous call. Defaults to zeros.
+
+        Returns
+        -------
+        output : (batch_size, n_samples, n_classes) `torch.Tensor`
+        hidden : list
+            Final hidden state of each recurrent layer.
+        """
+
+        if hidden is None:
+            hidden = [None] * len(self.recurrent_layers_)
+
+        output = sequences
+
+        # stack recurrent layers
+        # (a None initial state is zero-initialized internally by PyTorch)
+        last_hidden = []
+        for hidden_dim, layer, h in zip(self.recurrent,
+                                        self.recurrent_layers_, hidden):
 
             # apply current recurrent layer and get output sequence
-            output, _ = layer(output, hidden)
+            output, h = layer(output, h)
+            last_hidden.append(h)
 
             # average both directions in case of bidirectional layers
             if self.bidirectional:
@@ -201,10 +217,88 @@ class StackedRNN(nn.Module):
         output = self.final_layer_(output)
 
         if self.task_type == TASK_CLASSIFICATION:
-            return torch.log_softmax(output, dim=2)
+            output = torch.log_softmax(output, dim=2)
 
         elif self.task_type == TASK_MULTI_LABEL_CLASSIFICATION:
-            return torch.sigmoid(output)
+            output = torch.sigmoid(output)
 
         elif self.task_type == TASK_REGRESSION:
-            return torch.sigmoid(output)
+            output = torch.sigmoid(output)
+
+        return output, last_hidden
+
+    def forward_long(self, sequences, chunk_size=1000, margin=100,
+                     batch_size=32):
+        """Process arbitrarily long sequences, chunk by chunk
+
+        Unidirectional models process sequences only once, chunk after chunk,
+        carrying the hidden state of recurrent layers from one chunk to the
+        next: this is the same as a single call to `forward`, with bounded
+        memory usage. Bidirectional models process each chunk with an extra
+        `margin` of context on both sides (output of the margins is dropped).
+
+        Parameters
+        ----------
+        sequences : (batch_size, n_samples, n_features) `torch.Tensor`
+            Input sequences. Chunks are sent to the model device one at a
+            time, so `sequences` may live on another device (e.g. CPU).
+        chunk_size : int, optional
+            Number of samples processed at once. Defaults to 1000.
+        margin : int, optional
+            Number of context samples (bidirectional models only) on each
+            side of each chunk. Defaults to 100.
+        batch_size : int, optional
+            Number of chunks processed at once (bidirectional models only).
+            Defaults to 32.
+
+        Returns
+        -------
+        output : (batch_size, n_samples, n_classes) `torch.Tensor`
+            Output sequences, on the same device as `sequences`.
+        """
+
+        if self.instance_normalize:
+            msg = (f'{self.__class__.__name__} does not support long sequence '
+                   f'inference with "instance_normalize" option.')
+            raise ValueError(msg)
+
+        n_sequences, n_samples, n_features = sequences.shape
+        if n_features != self.n_features:
+            msg = 'Wrong feature dimension. Found {0}, should be {1}'
+            raise ValueError(msg.format(n_features, self.n_features))
+
+        # (dynamically quantized models have no parameters left)
+        parameter = next(self.parameters(), None)
+        device = torch.device('cpu') if parameter is None \
+                                     else parameter.device
+        output = torch.empty(n_sequences, n_samples, self.n_classes,
+                             device=sequences.device)
+
+        if not self.bidirectional:
+            hidden = None
+            for start in range(0, n_samples, chunk_size):
+                chunk = sequences[:, start:start + chunk_size].to(device)
+                chunk, hidden = self.forward_chunk(chunk, hidden=hidden)
+                output[:, start:start + chunk_size] = chunk
+            return output
+
+        # group chunks (with their margins) by length so that they can be
+        # processed as a batch: most of them share the same length
+        windows = {}
+        for start in range(0, n_samples, chunk_size):
+            end = min(start + chunk_size, n_samples)
+            lo, hi = max(0, start - margin), min(n_samples, end + margin)
+            windows.setdefault(hi - lo, []).append((lo, start, end))
+
+        for length, group in windows.items():
+            for g in range(0, len(group), batch_size):
+                batch = group[g:g + batch_size]
+                chunk = torch.cat([sequences[:, lo:lo + length]
+                                   for lo, _, _ in batch]).to(device)
+                chunk, _ = self.forward_chunk(chunk)
+                for b, (lo, start, end) in enumerate(batch):
+                    output[:, start:end] = chunk[
+                        b * n_sequences:(b + 1) * n_sequences,
+                        start - lo:end - lo]
+
+        return output
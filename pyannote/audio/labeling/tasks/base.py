@@ -27,10 +27,10 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 import warnings
-import torch
+import tempfile
 import numpy as np
 from tqdm import tqdm
-from pyannote.metrics.binary_classification import det_curve
+from pyannote.audio.train.metrics import StreamingDetCurve
 from pyannote.database import get_unique_identifier
 from pyannote.database import get_annotated
 from pyannote.core.utils.numpy import one_hot_encoding
@@ -41,13 +41,11 @@ from pyannote.core import Timeline
 from pyannote.core import SlidingWindowFeature
 
 from pyannote.generators.batch import batchify
-from pyannote.generators.fragment import random_segment
-from pyannote.generators.fragment import random_subsegment
 from pyannote.generators.fragment import SlidingSegments
 
-from collections import deque
-
 from pyannote.audio.train.trainer import Trainer
+from pyannote.audio.train.generator import BatchBuffer
+from pyannote.audio.train.generator import get_loaders
 
 from .. import TASK_CLASSIFICATION
 from .. import TASK_MULTI_LABEL_CLASSIFICATION
@@ -72,8 +70,14 @@ class LabelingTaskGenerator(object):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     exhaustive : bool, optional
         Ensure training files are covered exhaustively (useful in case of
         non-uniform label distribution).
@@ -82,7 +86,8 @@ class LabelingTaskGenerator(object):
     """
 
     def __init__(self, feature_extraction, duration=3.2, batch_size=32,
-                 per_epoch=1, parallel=1, exhaustive=False, shuffle=False):
+                 per_epoch=1, parallel=1, processes=False, prefetch=8,
+                 exhaustive=False, shuffle=False):
 
         super(LabelingTaskGenerator, self).__init__()
 
@@ -91,6 +96,8 @@ class LabelingTaskGenerator(object):
         self.batch_size = batch_size
         self.per_epoch = per_epoch
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
         self.exhaustive = exhaustive
         self.shuffle = shuffle
 
@@ -109,6 +116,22 @@ class LabelingTaskGenerator(object):
 
         labels_ : list
             Sorted list of (unique) lables in protocol.
+
+        It also compiles a sampling index so that random samples can be drawn
+        with a couple of array operations (see `random_sequences`):
+
+        segments_ : (n_segments, 2) numpy array
+            Start and end time of every annotated segment (across all files)
+            longer than `duration`.
+        segment_file_ : (n_segments, ) numpy array
+            Index (in `uris_`) of the file each segment belongs to.
+        cumulative_duration_ : (n_segments, ) numpy array
+            Cumulative duration of segments.
+        y_ : (n_frames, n_dimensions) numpy memmap
+            Labels of all files, concatenated in one contiguous array.
+        y_offset_, y_length_, y_start_ : (n_files, ) numpy arrays
+            Index of first frame (in `y_`), number of frames, and time of
+            first frame of each file.
         """
 
         self.data_ = {}
@@ -159,17 +182,69 @@ class LabelingTaskGenerator(object):
         self.databases_ = sorted(databases)
         self.labels_ = sorted(labels)
 
-        for current_file in getattr(protocol, subset)():
-
+        # one-hot encoding can only be done once all labels are known. use
+        # files stored above rather than looping over the protocol again.
+        self.uris_ = list(self.data_)
+        Y = []
+        for uri in self.uris_:
+            current_file = self.data_[uri]['current_file']
             y, _ = one_hot_encoding(current_file['annotation'],
                                     get_annotated(current_file),
                                     self.feature_extraction.sliding_window,
                                     labels=self.labels_, mode='center')
+            Y.append(SlidingWindowFeature(self.postprocess_y(y.data),
+                                          y.sliding_window))
 
-            uri = get_unique_identifier(current_file)
+        self.compile_(Y)
+
+    def compile_(self, Y):
+        """Compile sampling index and concatenate labels
+
+        Parameters
+        ----------
+        Y : list of `SlidingWindowFeature`
+            Labels of each file in `uris_`.
+        """
+
+        # flat list of segments, with file index
+        segments, segment_file = [], []
+        for f, uri in enumerate(self.uris_):
+            for segment in self.data_[uri]['segments']:
+                segments.append((segment.start, segment.end))
+                segment_file.append(f)
+        self.segments_ = np.array(segments, dtype=np.float64).reshape(-1, 2)
+        self.segment_file_ = np.array(segment_file, dtype=np.int64)
+        self.cumulative_duration_ = np.cumsum(
+            self.segments_[:, 1] - self.segments_[:, 0])
+
+        # labels of all files in one contiguous (int8, when possible) memmap
+        self.y_length_ = np.array([len(y.data) for y in Y], dtype=np.int64)
+        self.y_offset_ = np.hstack([[0], np.cumsum(self.y_length_)[:-1]])
+        self.y_start_ = np.array([y.sliding_window.start for y in Y])
+
+        # number of frames in fixed-duration sequences
+        self.n_frames_ = self.feature_extraction.sliding_window.samples(
+            self.duration, mode='center')
+
+        if not Y:
+            return
+
+        if all(np.issubdtype(y.data.dtype, np.integer) for y in Y) and \
+           all(np.all(np.abs(y.data) < 128) for y in Y):
+            dtype = np.int8
+        else:
+            dtype = np.float32
 
+        _, n_dimensions = Y[0].data.shape
+        self.y_file_ = tempfile.TemporaryFile()
+        self.y_ = np.memmap(self.y_file_, dtype=dtype, mode='w+',
+                            shape=(int(np.sum(self.y_length_)), n_dimensions))
+
+        for uri, y, offset, length in zip(self.uris_, Y, self.y_offset_,
+                                          self.y_length_):
+            self.y_[offset:offset + length] = y.data
             self.data_[uri]['y'] = SlidingWindowFeature(
-                self.postprocess_y(y.data), y.sliding_window)
+                self.y_[offset:offset + length], y.sliding_window)
 
     def postprocess_y(self, Y):
         """This function does nothing but return its input.
@@ -182,40 +257,183 @@ class LabelingTaskGenerator(object):
         else:
             return self.random_samples()
 
-    def random_samples(self):
-        """Random samples
+    def random_sequences(self, n_sequences):
+        """Draw random fixed-duration sequences
+
+        Files are chosen with probability proportional to their (annotated)
+        duration, then segments with probability proportional to their
+        duration, then sequence start time uniformly within segment. This is
+        done for all files at once by one `np.searchsorted` in cumulative
+        segment durations.
+
+        Parameters
+        ----------
+        n_sequences : int
+            Number of sequences.
 
         Returns
         -------
-        samples : generator
-            Generator that yields {'X': ..., 'y': ...} samples indefinitely.
+        files : (n_sequences, ) numpy array
+            Index (in `uris_`) of sequence file.
+        starts : (n_sequences, ) numpy array
+            Sequence start time.
         """
+        total = self.cumulative_duration_[-1]
+        s = np.searchsorted(self.cumulative_duration_,
+                            np.random.random(n_sequences) * total,
+                            side='right')
+        s = np.minimum(s, len(self.segments_) - 1)
+        start, end = self.segments_[s, 0], self.segments_[s, 1]
+        starts = start + np.random.random(n_sequences) * \
+                         (end - start - self.duration)
+        return self.segment_file_[s], starts
+
+    def crop_y(self, f, start):
+        """Fast version of data_[uris_[f]]['y'].crop(sequence, mode='center',
+                                                     fixed=duration)
 
-        uris = list(self.data_)
-        durations = np.array([self.data_[uri]['duration'] for uri in uris])
-        probabilities = durations / np.sum(durations)
+        Parameters
+        ----------
+        f : int
+            Index (in `uris_`) of file.
+        start : float
+            Sequence start time.
+
+        Returns
+        -------
+        y : (n_frames, n_dimensions) numpy array
+            Labels.
+        """
+        frames = self.feature_extraction.sliding_window
+        i = int(np.rint((start - self.y_start_[f] - .5 * frames.duration) /
+                        frames.step))
+        length = self.y_length_[f]
+
+        # frames out of bounds are replaced by first/last frame
+        if i < 0 or i + self.n_frames_ > length:
+            indices = np.clip(np.arange(i, i + self.n_frames_), 0, length - 1)
+            return self.y_[self.y_offset_[f] + indices]
+
+        i += self.y_offset_[f]
+        return self.y_[i:i + self.n_frames_]
+
+    def crop_y_batch(self, files, starts, out=None):
+        """Vectorized version of `crop_y`
+
+        Parameters
+        ----------
+        files : (batch_size, ) numpy array
+            Index (in `uris_`) of files.
+        starts : (batch_size, ) numpy array
+            Sequences start time.
+        out : (batch_size, n_frames, n_dimensions) numpy array, optional
+            Preallocated array where labels are stored.
+
+        Returns
+        -------
+        y : (batch_size, n_frames, n_dimensions) numpy array
+            Labels.
+        """
+        frames = self.feature_extraction.sliding_window
+        first = np.rint((starts - self.y_start_[files] - .5 * frames.duration) /
+                        frames.step).astype(np.int64)
+        indices = first[:, np.newaxis] + np.arange(self.n_frames_)
+
+        # frames out of bounds are replaced by first/last frame
+        np.clip(indices, 0, self.y_length_[files, np.newaxis] - 1,
+                out=indices)
+        indices += self.y_offset_[files, np.newaxis]
+
+        return np.take(self.y_, indices, axis=0, out=out, mode='clip')
+
+    def random_batches(self, n_buffers=2):
+        """Random batches
+
+        Draws `batch_size` sequences at once (see `random_sequences`) and
+        gathers their features and labels into preallocated arrays.
+
+        Parameters
+        ----------
+        n_buffers : int, optional
+            Number of preallocated batches. A batch is overwritten
+            `n_buffers` batches later. Defaults to 2.
+
+        Returns
+        -------
+        batches : generator
+            Generator that yields {'X': ..., 'y': ...} batches indefinitely,
+            where 'X' is a (batch_size, n_frames, dimension) float32 array.
+
+        See also
+        --------
+        `pyannote.audio.train.generator.BatchBuffer`
+        """
+
+        _, n_dimensions = self.y_.shape
+        X_buffer = BatchBuffer(
+            self.feature_extraction.get_batch_shape(self.batch_size,
+                                                    self.duration),
+            n_buffers=n_buffers)
+        y_buffer = BatchBuffer(
+            (self.batch_size, self.n_frames_, n_dimensions),
+            dtype=self.y_.dtype, n_buffers=n_buffers)
 
         while True:
 
-            # choose file at random with probability
-            # proportional to its (annotated) duration
-            uri = uris[np.random.choice(len(uris), p=probabilities)]
+            files, starts = self.random_sequences(self.batch_size)
+            current_files = [self.data_[self.uris_[f]]['current_file']
+                             for f in files]
+
+            X = self.feature_extraction.crop_batch(
+                current_files, starts, self.duration, out=X_buffer())
+
+            y = self.crop_y_batch(files, starts, out=y_buffer())
+
+            # same as np.squeeze on each sample
+            if n_dimensions == 1:
+                y = y[:, :, 0]
+
+            yield {'X': X, 'y': y}
+
+    def batches(self, n_buffers=2):
+        """Batch generator (without prefetching)
+
+        Parameters
+        ----------
+        n_buffers : int, optional
+            Number of preallocated batches used by `random_batches`.
+            Defaults to 2.
+
+        Returns
+        -------
+        batches : generator
+            Generator that yields {'X': ..., 'y': ...} batches indefinitely.
+        """
+        if self.exhaustive:
+            return batchify(self.sliding_samples(), self.signature,
+                            batch_size=self.batch_size, prefetch=0)
+        return self.random_batches(n_buffers=n_buffers)
+
+    def random_samples(self):
+        """Random samples
 
-            datum = self.data_[uri]
-            current_file = datum['current_file']
+        Returns
+        -------
+        samples : generator
+            Generator that yields {'X': ..., 'y': ...} samples indefinitely.
+        """
 
-            # choose one segment at random with probability
-            # proportional to its duration
-            segment = next(random_segment(datum['segments'], weighted=True))
+        while True:
 
-            # choose fixed-duration subsegment at random
-            sequence = next(random_subsegment(segment, self.duration))
+            (f, ), (start, ) = self.random_sequences(1)
+            current_file = self.data_[self.uris_[f]]['current_file']
+            sequence = Segment(start, start + self.duration)
 
             X = self.feature_extraction.crop(current_file,
                                       sequence, mode='center',
                                       fixed=self.duration)
 
-            y = datum['y'].crop(sequence, mode='center', fixed=self.duration)
+            y = self.crop_y(f, start)
 
             yield {'X': X, 'y': np.squeeze(y)}
 
@@ -299,38 +517,19 @@ class LabelingTaskGenerator(object):
         # number of batches needed to complete an epoch
         batches_per_epoch = self.batches_per_epoch
 
-        generators = []
-
-        if self.parallel:
-            for _ in range(self.parallel):
-
-                # initialize one sample generator
-                samples = self.samples()
-
-                # batchify it and make sure at least
-                # `batches_per_epoch` batches are prefetched.
-                batches = batchify(samples, self.signature,
-                                   batch_size=self.batch_size,
-                                   prefetch=batches_per_epoch)
-
-                # add batch generator to the list of (background) generators
-                generators.append(batches)
-        else:
-
-            # initialize one sample generator
-            samples = self.samples()
-
-            # batchify it without prefetching
-            batches = batchify(samples, self.signature,
-                               batch_size=self.batch_size, prefetch=0)
-
-            # add it to the list of generators
-            # NOTE: this list will only contain one generator
-            generators.append(batches)
+        # one prefetching loader per background thread, one loader for all
+        # worker processes, or one batch generator without prefetching
+        self.loaders_ = get_loaders(self.batches, parallel=self.parallel,
+                                    processes=self.processes,
+                                    prefetch=self.prefetch)
 
         # loop on (background) generators indefinitely
         while True:
-            for batches in generators:
+            for batches in self.loaders_:
+
+                # keep track of current loader (for queue depth monitoring)
+                self.loader_ = batches
+
                 # yield `batches_per_epoch` batches from current generator
                 # so that each epoch is covered by exactly one generator
                 for _ in range(batches_per_epoch):
@@ -353,17 +552,25 @@ class LabelingTask(Trainer):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     def __init__(self, duration=3.2, batch_size=32, per_epoch=1,
-                 parallel=1):
+                 parallel=1, processes=False, prefetch=8):
         super(LabelingTask, self).__init__()
         self.duration = duration
         self.batch_size = batch_size
         self.per_epoch = per_epoch
         self.parallel = parallel
+        self.processes = processes
+        self.prefetch = prefetch
 
     def get_batch_generator(self, feature_extraction):
         """This method should be overriden by subclass
@@ -379,7 +586,8 @@ class LabelingTask(Trainer):
         return LabelingTaskGenerator(
             feature_extraction, duration=self.duration,
             per_epoch=self.per_epoch, batch_size=self.batch_size,
-            parallel=self.parallel)
+            parallel=self.parallel, processes=self.processes,
+            prefetch=self.prefetch)
 
     @property
     def task_type(self):
@@ -409,29 +617,34 @@ class LabelingTask(Trainer):
 
         self.loss_func_ = model.get_loss()
 
-        self.log_y_pred_ = deque([], maxlen=batches_per_epoch)
-        self.log_y_true_ = deque([], maxlen=batches_per_epoch)
+        # one detection error tradeoff curve per class
+        # (only the first one is used for binary classification).
+        # log-probabilities are binned over an adaptive range: probabilities
+        # of a confident model would all end up in the last of fixed bins
+        self.log_det_ = [StreamingDetCurve()
+                         for _ in range(self.n_classes)]
 
     def batch_loss(self, batch, model, device, writer=None):
 
-        X = torch.tensor(batch['X'], dtype=torch.float32, device=device)
+        X = self.to_tensor(batch['X'], device)
         fX = model(X)
 
         if self.task_type == TASK_CLASSIFICATION:
-            y = torch.tensor(batch['y'], dtype=torch.int64, device=device)
+            y = self.to_tensor(batch['y'], device, dtype=np.int64)
             target = y.contiguous().view((-1, ))
             fX = fX.view((-1, self.n_classes))
             if writer is not None:
-                self.log_y_pred_.append(self.to_numpy(fX))
-                self.log_y_true_.append(self.to_numpy(y))
+                y_pred = self.to_numpy(fX)
+                y_true = self.to_numpy(target)
+                n_logged = 1 if self.n_classes < 3 else self.n_classes
+                for k in range(n_logged):
+                    self.log_det_[k].update(y_true == k, y_pred[:, k])
 
         elif self.task_type == TASK_MULTI_LABEL_CLASSIFICATION:
-            target = torch.tensor(batch['y'], dtype=torch.float32,
-                                  device=device)
+            target = self.to_tensor(batch['y'], device)
 
         elif self.task_type == TASK_REGRESSION:
-            target = torch.tensor(batch['y'], dtype=torch.float32,
-                                  device=device)
+            target = self.to_tensor(batch['y'], device)
 
         return self.loss_func_(fX, target,
                                weight=self.weight.to(device=device))
@@ -443,18 +656,13 @@ class LabelingTask(Trainer):
 
         # TODO. add support for multi-class
 
-        log_y_pred = np.hstack(self.log_y_pred_)
-        log_y_true = np.hstack(self.log_y_true_)
-        log_y_pred = log_y_pred.reshape((-1, self.n_classes))
-        log_y_true = log_y_true.reshape((-1, ))
         if self.n_classes < 3:
-            _, _, _, eer = det_curve(log_y_true == 0,
-                                     log_y_pred[:, 0])
             writer.add_scalar(f'train/eer',
-                eer, global_step=iteration)
+                self.log_det_[0].eer, global_step=iteration)
         else:
             for k in range(self.n_classes):
-                _, _, _, eer = det_curve(log_y_true == k,
-                                         log_y_pred[:, k])
                 writer.add_scalar(f'train/eer/{k}',
-                    eer, global_step=iteration)
+                    self.log_det_[k].eer, global_step=iteration)
+
+        for log_det in self.log_det_:
+            log_det.reset()
@@ -58,8 +58,14 @@ class ResegmentationGenerator(LabelingTaskGenerator):
         Batch size. Defaults to 32.
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
     """
 
     def __init__(self, precomputed, **kwargs):
@@ -132,7 +138,9 @@ class Resegmentation(LabelingTask):
     def get_batch_generator(self, precomputed):
         return ResegmentationGenerator(
             precomputed, duration=self.duration, per_epoch=self.per_epoch,
-            batch_size=self.batch_size, parallel=self.parallel)
+            batch_size=self.batch_size, parallel=self.parallel,
+            processes=self.processes,
+            prefetch=self.prefetch)
 
     @property
     def task_type(self):
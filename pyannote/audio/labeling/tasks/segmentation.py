@@ -60,8 +60,14 @@ class SegmentationGenerator(LabelingTaskGenerator):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -182,8 +188,14 @@ class Segmentation(LabelingTask):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -221,7 +233,8 @@ class Segmentation(LabelingTask):
             overlap=self.overlap > 0., change=self.change > 0.,
             collar=self.collar, duration=self.duration,
             batch_size=self.batch_size, per_epoch=self.per_epoch,
-            parallel=self.parallel)
+            parallel=self.parallel, processes=self.processes,
+            prefetch=self.prefetch)
 
     @property
     def task_type(self):
@@ -62,8 +62,14 @@ class SpeakerChangeDetectionGenerator(LabelingTaskGenerator):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -188,8 +194,14 @@ class SpeakerChangeDetection(LabelingTask):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -226,7 +238,9 @@ class SpeakerChangeDetection(LabelingTask):
         return SpeakerChangeDetectionGenerator(
             precomputed, collar=self.collar, variant=self.variant,
             duration=self.duration, batch_size=self.batch_size,
-            per_epoch=self.per_epoch, parallel=self.parallel)
+            per_epoch=self.per_epoch, parallel=self.parallel,
+            processes=self.processes,
+            prefetch=self.prefetch)
 
     @property
     def n_classes(self):
@@ -53,8 +53,14 @@ class SpeechActivityDetectionGenerator(LabelingTaskGenerator):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -128,8 +134,14 @@ class SpeechActivityDetection(LabelingTask):
         Defaults to one day (1).
     parallel : int, optional
         Number of prefetching background generators. Defaults to 1.
-        Each generator will prefetch enough batches to cover a whole epoch.
+        Each generator prefetches at most `prefetch` batches.
         Set `parallel` to 0 to not use background generators.
+    processes : bool, optional
+        Generate batches in `parallel` worker processes instead of background
+        threads. Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background generator, or
+        maximum memory size of those batches (e.g. '512MB'). Defaults to 8.
 
     Usage
     -----
@@ -161,7 +173,8 @@ class SpeechActivityDetection(LabelingTask):
         return SpeechActivityDetectionGenerator(
             precomputed, overlap=self.overlap, duration=self.duration,
             per_epoch=self.per_epoch, batch_size=self.batch_size,
-            parallel=self.parallel)
+            parallel=self.parallel, processes=self.processes,
+            prefetch=self.prefetch)
 
     @property
     def task_type(self):
@@ -29,3 +29,4 @@
 from .speech_activity_detection import SpeechActivityDetection
 from .speech_turn_segmentation import SpeechTurnSegmentation
 from .speaker_diarization import SpeakerDiarization
+from .speaker_linking import SpeakerLinking
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Parallel per-file execution of pipelines
+
+Files are fanned out across persistent worker processes. Each worker is given
+the pipeline class, its constructor arguments and its share of files once and
+for all, and instantiates the pipeline on its side. Then, for every call, only
+parameters and file uris are sent to the workers, and only outputs (or losses)
+are sent back.
+
+Workers (and their pipeline) outlive the call, so that intermediate results
+cached by the pipeline (see `SpeakerDiarization`) are reused from one call to
+the next (e.g. from one tuning trial to the next). A given file is always
+processed by the same worker.
+"""
+
+import weakref
+import traceback
+import multiprocessing as mp
+from typing import Iterable, List, Optional
+
+from pyannote.core import Annotation
+from pyannote.database import get_unique_identifier
+
+
+def _worker(connection, pipeline_class, args, kwargs, files):
+    """Worker process main loop
+
+    Parameters
+    ----------
+    connection : `multiprocessing.connection.Connection`
+        Receives (func, params, uris) messages (or None to stop) and sends
+        back (success, outputs or exception) messages.
+    pipeline_class : type
+        Pipeline class.
+    args, kwargs :
+        Pipeline constructor arguments.
+    files : `dict`
+        Files processed by this worker, indexed by their uri.
+    """
+
+    pipeline = pipeline_class(*args, **kwargs)
+    current_params = None
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+
+        func, params, uris = message
+        try:
+            if params != current_params:
+                pipeline.with_params(params)
+                current_params = params
+            outputs = [func(pipeline, files[uri]) for uri in uris]
+        except Exception as e:
+            try:
+                connection.send((False, e))
+            # exception cannot be pickled
+            except Exception:
+                connection.send((False, RuntimeError(traceback.format_exc())))
+        else:
+            connection.send((True, outputs))
+
+    connection.close()
+
+
+class _WorkerPool:
+    """Persistent worker processes, each with its own share of files"""
+
+    def __init__(self, pipeline_class, args, kwargs, files, n_jobs):
+
+        self.n_jobs = n_jobs
+
+        # round-robin assignment of files to workers
+        self.worker_ = {}
+        shares = [dict() for _ in range(n_jobs)]
+        for i, (uri, current_file) in enumerate(files.items()):
+            self.worker_[uri] = i % n_jobs
+            shares[i % n_jobs][uri] = current_file
+
+        self.connections_ = []
+        self.processes_ = []
+        for share in shares:
+            parent_connection, child_connection = mp.Pipe()
+            process = mp.Process(
+                target=_worker, daemon=True,
+                args=(child_connection, pipeline_class, args, kwargs, share))
+            process.start()
+            child_connection.close()
+            self.connections_.append(parent_connection)
+            self.processes_.append(process)
+
+    def map(self, func, params, uris):
+
+        requests = [[] for _ in range(self.n_jobs)]
+        for uri in uris:
+            requests[self.worker_[uri]].append(uri)
+
+        outputs, error, worker_uris = {}, None, []
+        try:
+            # send all requests first so that workers run concurrently
+            for connection, worker_uris in zip(self.connections_, requests):
+                connection.send((func, params, worker_uris))
+
+            for connection, worker_uris in zip(self.connections_, requests):
+                success, worker_outputs = connection.recv()
+                if not success:
+                    error = worker_outputs
+                    continue
+                outputs.update(zip(worker_uris, worker_outputs))
+
+        # worker process died (crash, out of memory, failed instantiation...)
+        except (EOFError, OSError) as e:
+            self.close(terminate=True)
+            msg = f'Worker process died while processing {worker_uris}.'
+            raise RuntimeError(msg) from e
+
+        if error is not None:
+            raise error
+
+        return [outputs[uri] for uri in uris]
+
+    @property
+    def closed(self):
+        """Whether worker processes have been stopped"""
+        return not self.processes_
+
+    def close(self, terminate=False):
+        """Stop worker processes
+
+        Parameters
+        ----------
+        terminate : bool, optional
+            Kill workers instead of waiting for them to finish their current
+            request. Defaults to False.
+        """
+        for connection in self.connections_:
+            try:
+                connection.send(None)
+                connection.close()
+            except (OSError, ValueError):
+                pass
+        for process in self.processes_:
+            if terminate:
+                process.terminate()
+            process.join()
+        self.connections_, self.processes_ = [], []
+
+
+def _apply(pipeline, current_file: dict) -> Annotation:
+    return pipeline(current_file)
+
+
+def _loss(pipeline, current_file: dict) -> float:
+    return pipeline.loss(current_file, pipeline(current_file))
+
+
+class ParallelMixin:
+    """Add batch_apply and batch_loss methods to a pipeline
+
+    Usage
+    -----
+    >>> class MyPipeline(ParallelMixin, Pipeline):
+    ...     pass
+    >>> pipeline = MyPipeline().with_params(params)
+    >>> hypotheses = pipeline.batch_apply(files, n_jobs=8)
+    >>> losses = pipeline.batch_loss(files, n_jobs=8)
+    >>> pipeline.close_workers()
+
+    Notes
+    -----
+    Worker processes are started by the first parallel call and reused by
+    the following ones, as long as they are given the same number of jobs and
+    (a subset of) the same files. Intermediate results cached by the pipeline
+    (see `SpeakerDiarization`) therefore survive from one call to the next,
+    in the workers. Workers are stopped by `close_workers`, or when the
+    pipeline is garbage collected.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # remember constructor arguments so that workers can instantiate
+        # their own copy of the pipeline (instead of unpickling this one,
+        # with its caches and precomputed scores)
+        pipeline = super().__new__(cls)
+        object.__setattr__(pipeline, 'init_args_', (args, kwargs))
+        return pipeline
+
+    def __getstate__(self):
+        # worker processes cannot be pickled
+        state = dict(self.__dict__)
+        state.pop('pool_', None)
+        return state
+
+    def close_workers(self):
+        """Stop worker processes (if any)"""
+        pool = self.__dict__.get('pool_')
+        if pool is not None:
+            pool.close()
+            object.__setattr__(self, 'pool_', None)
+
+    def _get_pool(self, files: dict, n_jobs: int) -> _WorkerPool:
+
+        pool = self.__dict__.get('pool_')
+        if pool is not None and not pool.closed and pool.n_jobs == n_jobs and \
+           all(uri in pool.worker_ for uri in files):
+            return pool
+
+        self.close_workers()
+        args, kwargs = self.init_args_
+        pool = _WorkerPool(self.__class__, args, kwargs, files, n_jobs)
+        object.__setattr__(self, 'pool_', pool)
+        # stop workers when pipeline is garbage collected
+        weakref.finalize(self, pool.close)
+        return pool
+
+    def _map(self, func, files: Iterable[dict],
+             n_jobs: Optional[int] = 1) -> list:
+
+        files = list(files)
+
+        if n_jobs is None:
+            n_jobs = mp.cpu_count()
+        n_jobs = min(n_jobs, len(files))
+
+        if n_jobs < 2:
+            return [func(self, current_file) for current_file in files]
+
+        uris = [get_unique_identifier(current_file) for current_file in files]
+        pool = self._get_pool(dict(zip(uris, files)), n_jobs)
+        try:
+            return pool.map(func, self.params, uris)
+        finally:
+            # do not keep a broken pool around
+            if pool.closed:
+                object.__setattr__(self, 'pool_', None)
+
+    def batch_apply(self, files: Iterable[dict],
+                    n_jobs: Optional[int] = 1) -> List[Annotation]:
+        """Apply pipeline on multiple files in parallel
+
+        Parameters
+        ----------
+        files : iterable of `dict`
+            Files as provided by a pyannote.database protocol.
+        n_jobs : `int`, optional
+            Number of worker processes. Defaults to 1 (i.e. no parallelism).
+            Use None to use as many workers as there are CPUs.
+
+        Returns
+        -------
+        outputs : `list`
+            Pipeline outputs, in the same order as `files`.
+        """
+        return self._map(_apply, files, n_jobs=n_jobs)
+
+    def batch_loss(self, files: Iterable[dict],
+                   n_jobs: Optional[int] = 1) -> List[float]:
+        """Apply pipeline and compute loss on multiple files in parallel
+
+        Parameters
+        ----------
+        files : iterable of `dict`
+            Files as provided by a pyannote.database protocol.
+        n_jobs : `int`, optional
+            Number of worker processes. Defaults to 1 (i.e. no parallelism).
+            Use None to use as many workers as there are CPUs.
+
+        Returns
+        -------
+        losses : `list` of `float`
+            Per-file loss, in the same order as `files`.
+        """
+        return self._map(_loss, files, n_jobs=n_jobs)
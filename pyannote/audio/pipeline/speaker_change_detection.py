@@ -32,6 +32,7 @@ import numpy as np
 
 import chocolate
 from pyannote.pipeline import Pipeline
+from .parallel import ParallelMixin
 
 from pyannote.core import Annotation
 from pyannote.core import SlidingWindowFeature
@@ -44,7 +45,7 @@ from pyannote.database import get_unique_identifier
 from pyannote.metrics.segmentation import SegmentationPurityCoverageFMeasure
 
 
-class SpeakerChangeDetection(Pipeline):
+class SpeakerChangeDetection(ParallelMixin, Pipeline):
     """Speaker change detection pipeline
 
     Parameters
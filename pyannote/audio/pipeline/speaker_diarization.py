@@ -30,21 +30,47 @@ from pathlib import Path
 
 from pyannote.core import Annotation
 from pyannote.database import get_annotated
+from pyannote.database import get_unique_identifier
 
 from pyannote.metrics.diarization import GreedyDiarizationErrorRate
 
 from .speech_turn_segmentation import SpeechTurnSegmentation
 from .speech_turn_clustering import SpeechTurnClustering
 from .speech_turn_assignment import SpeechTurnClosestAssignment
+from .utils import get_cache
+from .utils import get_params_hash
+from .utils import memoize
 
 from typing import Optional
 from pyannote.pipeline import Pipeline
+from .parallel import ParallelMixin
 import chocolate
 
 
-class SpeakerDiarization(Pipeline):
+class SpeakerDiarization(ParallelMixin, Pipeline):
     """Speaker diarization pipeline
 
+    Parameters
+    ----------
+    sad_scores : `Path`
+        Path to precomputed speech activity detection scores.
+    scd_scores : `Path`
+        Path to precomputed speaker change detection scores
+    embedding : `Path
+        Path to precomputed embeddings.
+    metric : {'euclidean', 'cosine', 'angular'}, optional
+        Metric used for comparing embeddings. Defaults to 'cosine'.
+    method : {'pool', 'affinity_propagation'}, optional
+        Clustering method. Defaults to 'pool'.
+    cache_size : `int`, optional
+        Number of intermediate results (speech turns, embeddings, dendrograms)
+        kept in memory by each step of the pipeline. Speech turns are cached
+        by (file, speech turn segmentation parameters), embeddings and
+        dendrograms by (file, speech turns). Therefore, tuning iterations that
+        only change downstream hyper-parameters (e.g. `min_duration` or the
+        clustering threshold) skip upstream computations. Use 0 to deactivate
+        caching. Defaults to 1000.
+
     Hyper-parameters
     ----------------
     min_duration : `float`
@@ -56,10 +82,14 @@ class SpeakerDiarization(Pipeline):
                        scd_scores: Optional[Path] = None,
                        embedding: Optional[Path] = None,
                        metric: Optional[str] = 'cosine',
-                       method: Optional[str] = 'pool'):
+                       method: Optional[str] = 'pool',
+                       cache_size: Optional[int] = 1000):
 
         super().__init__()
 
+        self.cache_size = cache_size
+        self.cache_ = get_cache(self.cache_size)
+
         self.sad_scores = sad_scores
         self.scd_scores = scd_scores
         self.speech_turn_segmentation = SpeechTurnSegmentation(
@@ -72,10 +102,12 @@ class SpeakerDiarization(Pipeline):
         self.metric = metric
         self.method = method
         self.speech_turn_clustering = SpeechTurnClustering(
-            embedding=self.embedding, metric=self.metric, method=self.method)
+            embedding=self.embedding, metric=self.metric, method=self.method,
+            cache_size=self.cache_size)
 
         self.speech_turn_assignment = SpeechTurnClosestAssignment(
-            embedding=self.embedding, metric=self.metric)
+            embedding=self.embedding, metric=self.metric,
+            cache_size=self.cache_size)
 
     def __call__(self, current_file: dict) -> Annotation:
         """Apply speaker diarization
@@ -91,8 +123,14 @@ class SpeakerDiarization(Pipeline):
             Speaker diarization output.
         """
 
-        # segmentation into speech turns
-        speech_turns = self.speech_turn_segmentation(current_file)
+        # segmentation into speech turns only depends on the parameters of
+        # the segmentation sub-pipeline: do not recompute it when only
+        # downstream parameters have changed
+        key = (get_unique_identifier(current_file),
+               get_params_hash(self.speech_turn_segmentation.params))
+        speech_turns = memoize(self.cache_, key,
+                               self.speech_turn_segmentation, current_file)
+        speech_turns = speech_turns.copy()
 
         # in case there is one speech turn or less, there is no need to apply
         # any kind of clustering approach.
@@ -171,17 +209,21 @@ class Yin2018(SpeakerDiarization):
         Path to precomputed embeddings.
     metric : {'euclidean', 'cosine', 'angular'}, optional
         Metric used for comparing embeddings. Defaults to 'cosine'.
+    cache_size : `int`, optional
+        See `SpeakerDiarization`. Defaults to 1000.
     """
     def __init__(self, sad_scores: Optional[Path] = None,
                        scd_scores: Optional[Path] = None,
                        embedding: Optional[Path] = None,
-                       metric: Optional[str] = 'cosine'):
+                       metric: Optional[str] = 'cosine',
+                       cache_size: Optional[int] = 1000):
 
         super().__init__(sad_scores=sad_scores,
                          scd_scores=scd_scores,
                          embedding=embedding,
                          metric=metric,
-                         method='affinity_propagation')
+                         method='affinity_propagation',
+                         cache_size=cache_size)
 
         self.freeze({
             'min_duration': 0.,
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+import chocolate
+from pyannote.core import Annotation
+from pyannote.core.utils.distance import dist_range
+from pyannote.database import get_annotated
+from pyannote.database import get_unique_identifier
+from pyannote.metrics.identification import IdentificationErrorRate
+from pyannote.pipeline import Pipeline
+from .speaker_diarization import SpeakerDiarization
+from ..features import Precomputed
+from ..embedding.index import EmbeddingIndex
+from ..util import mkdir_p
+
+
+class SpeakerLinking(Pipeline):
+    """Incremental cross-file speaker linking
+
+    Files are processed one after the other. Speakers found by speaker
+    diarization in a new file are either linked to one of the speakers
+    already stored (when close enough), or added to the store as new
+    speakers. Previous files are never re-clustered.
+
+    Each stored speaker is described by the (count-weighted) sum of the
+    embeddings of all its linked clusters, so that updating the store only
+    costs O(number of clusters in new file).
+
+    Parameters
+    ----------
+    sad_scores : `Path`
+        Path to precomputed speech activity detection scores.
+    scd_scores : `Path`
+        Path to precomputed speaker change detection scores
+    embedding : `Path
+        Path to precomputed embeddings.
+    metric : {'euclidean', 'cosine', 'angular'}, optional
+        Metric used for comparing embeddings. Defaults to 'cosine'.
+    method : {'pool', 'affinity_propagation'}, optional
+        Clustering method used by speaker diarization. Defaults to 'pool'.
+    store : `Path`, optional
+        Path to directory where speakers are stored. When it exists, stored
+        speakers are loaded when instantiating the pipeline. Use `dump_store`
+        to save speakers. Defaults to starting with an empty store.
+
+    Hyper-parameters
+    ----------------
+    threshold : `float`
+        Do not link a cluster to a stored speaker if their distance is
+        greater than `threshold`.
+
+    Usage
+    -----
+    >>> pipeline = SpeakerLinking(sad_scores=..., scd_scores=...,
+    ...                           embedding=..., store='/path/to/store')
+    >>> pipeline.with_params(params)
+    >>> for current_file in new_files:
+    ...     linked = pipeline(current_file)
+    >>> pipeline.dump_store()
+
+    Notes
+    -----
+    Speaker diarization is skipped when `current_file` provides a
+    'diarization' key (i.e. precomputed speaker diarization output).
+
+    Setting parameters (`with_params`) restores the store to its initial
+    state (i.e. reloaded from `store` directory when it exists, empty
+    otherwise), so that speakers linked with previous parameters (e.g. in a
+    previous tuning trial) do not leak into the next run. Use `reset_store`
+    or `load_store` to do that manually between runs with the same
+    parameters.
+    """
+
+    def __init__(self, sad_scores: Optional[Path] = None,
+                       scd_scores: Optional[Path] = None,
+                       embedding: Optional[Path] = None,
+                       metric: Optional[str] = 'cosine',
+                       method: Optional[str] = 'pool',
+                       store: Optional[Path] = None):
+
+        super().__init__()
+
+        self.embedding = embedding
+        self.precomputed_ = Precomputed(self.embedding)
+        self.metric = metric
+        self.method = method
+
+        self.speaker_diarization = SpeakerDiarization(
+            sad_scores=sad_scores, scd_scores=scd_scores,
+            embedding=self.embedding, metric=self.metric, method=self.method)
+
+        min_dist, max_dist = dist_range(metric=self.metric, normalize=False)
+        if not np.isfinite(max_dist):
+            # this is arbitray and might lead to suboptimal results
+            max_dist = 1e6
+            msg = (f'bounding distance threshold to {max_dist:g}: '
+                   f'this might lead to suboptimal results.')
+            warnings.warn(msg)
+        self.threshold = chocolate.uniform(min_dist, max_dist)
+
+        self.store = store
+        self._initialize_store()
+
+    def _initialize_store(self):
+        if self.store is not None and Path(self.store).exists():
+            self.load_store(self.store)
+        else:
+            self.reset_store()
+
+    def with_params(self, params: dict) -> 'SpeakerLinking':
+        """Instantiate pipeline and restore store to its initial state
+
+        Parameters
+        ----------
+        params : `dict`
+            Parameters
+
+        Returns
+        -------
+        self : `SpeakerLinking`
+            Instantiated pipeline.
+        """
+        super().with_params(params)
+        self._initialize_store()
+        return self
+
+    @property
+    def speakers(self):
+        """Stored speakers"""
+        return self.index_.labels
+
+    def reset_store(self):
+        """Remove all stored speakers"""
+        self.index_ = EmbeddingIndex(metric=self.metric)
+        self.sums_ = None
+        self.counts_ = None
+        self.cooccurrence_ = {}
+
+    def load_store(self, store: Path):
+        """Load stored speakers from disk
+
+        Parameters
+        ----------
+        store : `Path`
+            Path to directory where speakers were stored by `dump_store`.
+        """
+        store = Path(store).expanduser().resolve(strict=True)
+        self.index_ = EmbeddingIndex.load(store / 'index')
+        if self.index_.metric != self.metric:
+            msg = (f'inconsistent "metric" (is: {self.metric}, '
+                   f'should be: {self.index_.metric})')
+            raise ValueError(msg)
+        self.sums_, self.counts_ = None, None
+        self.cooccurrence_ = {}
+        if len(self.speakers) > 0:
+            self.sums_ = np.load(str(store / 'sums.npy'))
+            self.counts_ = np.load(str(store / 'counts.npy'))
+
+    def dump_store(self, store: Optional[Path] = None):
+        """Save stored speakers to disk
+
+        Parameters
+        ----------
+        store : `Path`, optional
+            Path to directory where speakers are stored.
+            Defaults to `store` parameter passed at instantiation.
+        """
+        if store is None:
+            store = self.store
+        if store is None:
+            msg = 'no "store" directory was provided.'
+            raise ValueError(msg)
+        store = Path(store).expanduser().resolve(strict=False)
+        mkdir_p(store)
+        self.index_.save(store / 'index')
+        n_speakers = len(self.speakers)
+        if n_speakers > 0:
+            np.save(store / 'sums.npy', self.sums_[:n_speakers])
+            np.save(store / 'counts.npy', self.counts_[:n_speakers])
+
+    def _add_speakers(self, sums: np.ndarray, counts: np.ndarray) -> list:
+        """Add new speakers to the store
+
+        Parameters
+        ----------
+        sums : `np.ndarray`
+            (n_new_speakers, dimension) sum of embeddings
+        counts : `np.ndarray`
+            (n_new_speakers, ) number of embeddings
+
+        Returns
+        -------
+        labels : `list` of `str`
+            Labels of new speakers.
+        """
+
+        n_speakers = len(self.speakers)
+        n_new_speakers, dimension = sums.shape
+        end = n_speakers + n_new_speakers
+
+        # grow storage by doubling its capacity whenever it is needed, so
+        # that adding new speakers costs (amortized) O(n_new_speakers)
+        if self.sums_ is None or end > len(self.sums_):
+            capacity = max(16, 2 * end)
+            new_sums = np.zeros((capacity, dimension))
+            new_counts = np.zeros((capacity, ))
+            if n_speakers > 0:
+                new_sums[:n_speakers] = self.sums_[:n_speakers]
+                new_counts[:n_speakers] = self.counts_[:n_speakers]
+            self.sums_, self.counts_ = new_sums, new_counts
+
+        self.sums_[n_speakers:end] = sums
+        self.counts_[n_speakers:end] = counts
+
+        labels = [f'speaker{k:06d}' for k in range(n_speakers, end)]
+        self.index_.add(sums / counts[:, np.newaxis], labels=labels)
+        return labels
+
+    def _update_speakers(self, indices: np.ndarray, sums: np.ndarray,
+                         counts: np.ndarray):
+        """Update stored speakers with newly linked clusters
+
+        Parameters
+        ----------
+        indices : `np.ndarray`
+            (n_updated_speakers, ) index of updated speakers
+        sums : `np.ndarray`
+            (n_updated_speakers, dimension) sum of embeddings
+        counts : `np.ndarray`
+            (n_updated_speakers, ) number of embeddings
+        """
+        self.sums_[indices] += sums
+        self.counts_[indices] += counts
+        self.index_.update(
+            indices, self.sums_[indices] / self.counts_[indices, np.newaxis])
+
+    def __call__(self, current_file: dict) -> Annotation:
+        """Apply speaker diarization and link speakers to stored ones
+
+        Parameters
+        ----------
+        current_file : `dict`
+            File as provided by a pyannote.database protocol. May contain a
+            'diarization' key providing precomputed speaker diarization.
+
+        Returns
+        -------
+        linked : `pyannote.core.Annotation`
+            Speaker diarization output, with labels shared across files.
+        """
+
+        diarization = current_file.get('diarization')
+        if diarization is None:
+            diarization = self.speaker_diarization(current_file)
+
+        embedding = self.precomputed_(current_file)
+
+        # one (sum of embeddings, number of embeddings) pair per cluster
+        labels = diarization.labels()
+        sums, counts, linked_labels, skipped_labels = [], [], [], []
+        for label in labels:
+
+            timeline = diarization.label_timeline(label, copy=False)
+
+            # be more and more permissive until we have
+            # at least one embedding for current cluster
+            for mode in ['strict', 'center', 'loose']:
+                x = embedding.crop(timeline, mode=mode)
+                if len(x) > 0:
+                    break
+
+            # skip clusters so small we don't have any embedding for it
+            if len(x) < 1:
+                skipped_labels.append(label)
+                continue
+
+            linked_labels.append(label)
+            sums.append(np.sum(x, axis=0))
+            counts.append(len(x))
+
+        # clusters without embedding cannot be linked: make sure their label
+        # does not collide with labels of other files
+        uri = get_unique_identifier(current_file)
+        mapping = {label: f'{uri}_{label}' for label in skipped_labels}
+
+        if not linked_labels:
+            return diarization.rename_labels(mapping=mapping)
+
+        sums, counts = np.vstack(sums), np.array(counts, dtype=np.float64)
+        n_clusters = len(linked_labels)
+        n_speakers = len(self.speakers)
+
+        # find candidate speakers among the n_clusters closest stored
+        # speakers of each cluster (vectorized search)
+        cost = np.zeros((n_clusters, 0))
+        candidates = np.zeros((0, ), dtype=np.int64)
+        if n_speakers > 0:
+            distances, indices = self.index_.search(
+                sums / counts[:, np.newaxis], k=min(n_clusters, n_speakers))
+            candidates = np.unique(indices[indices > -1])
+            cost = np.full((n_clusters, len(candidates)), np.inf)
+            columns = np.searchsorted(candidates, indices)
+            rows = np.broadcast_to(np.arange(n_clusters)[:, np.newaxis],
+                                   indices.shape)
+            valid = indices > -1
+            cost[rows[valid], columns[valid]] = distances[valid]
+
+        # clusters of the same file are assumed to be different speakers:
+        # link clusters and stored speakers with a one-to-one assignment
+        linked = np.zeros((n_clusters, ), dtype=bool)
+        if len(candidates) > 0:
+            penalty = 2. * self.threshold + 1.
+            finite_cost = np.where(cost > self.threshold, penalty, cost)
+            rows, columns = linear_sum_assignment(finite_cost)
+            keep = cost[rows, columns] <= self.threshold
+            rows, columns = rows[keep], columns[keep]
+            speakers = candidates[columns]
+            self._update_speakers(speakers, sums[rows], counts[rows])
+            for r, k in zip(rows, speakers):
+                mapping[linked_labels[r]] = self.speakers[k]
+            linked[rows] = True
+
+        # unlinked clusters become new speakers
+        new = np.where(~linked)[0]
+        if len(new) > 0:
+            new_labels = self._add_speakers(sums[new], counts[new])
+            for r, new_label in zip(new, new_labels):
+                mapping[linked_labels[r]] = new_label
+
+        return diarization.rename_labels(mapping=mapping)
+
+    def loss(self, current_file: dict, hypothesis: Annotation) -> float:
+        """Compute cross-file speaker error rate
+
+        Unlike per-file diarization error rate (where each file gets its own
+        optimal mapping between reference and hypothesis labels), a single
+        one-to-one mapping is used for all files processed since the store
+        was last initialized. It is computed on the co-occurrence between
+        reference speakers and linked speakers accumulated over all those
+        files (current file included). Hence, linking the same reference
+        speaker to two different stored speakers (or two reference speakers
+        to the same stored speaker) is counted as an error.
+
+        Parameters
+        ----------
+        current_file : `dict`
+            File as provided by a pyannote.database protocol. Its 'annotation'
+            labels are expected to be consistent across files.
+        hypothesis : `pyannote.core.Annotation`
+            Speaker linking output (i.e. `pipeline(current_file)`).
+
+        Returns
+        -------
+        error : `float`
+            Identification error rate of current file, using the cross-file
+            label mapping.
+        """
+
+        reference = current_file['annotation']
+        uem = get_annotated(current_file)
+
+        # accumulate co-occurrence between reference and linked speakers
+        hypothesis_ = hypothesis.crop(uem)
+        for segment, _, label in reference.crop(uem).itertracks(
+                yield_label=True):
+            cropped = hypothesis_.crop(segment, mode='intersection')
+            for other, _, other_label in cropped.itertracks(yield_label=True):
+                key = (label, other_label)
+                self.cooccurrence_[key] = \
+                    self.cooccurrence_.get(key, 0.) + other.duration
+
+        # optimal one-to-one cross-file mapping
+        labels = sorted(set(label for label, _ in self.cooccurrence_))
+        other_labels = sorted(set(other for _, other in self.cooccurrence_))
+        row = {label: r for r, label in enumerate(labels)}
+        column = {other_label: c for c, other_label in enumerate(other_labels)}
+        matrix = np.zeros((len(labels), len(other_labels)))
+        for (label, other_label), duration in self.cooccurrence_.items():
+            matrix[row[label], column[other_label]] = duration
+        rows, columns = linear_sum_assignment(-matrix)
+        mapping = {other_labels[c]: labels[r]
+                   for r, c in zip(rows, columns) if matrix[r, c] > 0}
+
+        metric = IdentificationErrorRate(collar=0.0, skip_overlap=False)
+        return metric(reference, hypothesis.rename_labels(mapping=mapping),
+                      uem=uem)
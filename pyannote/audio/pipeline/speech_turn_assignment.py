@@ -34,9 +34,14 @@ import numpy as np
 from pyannote.pipeline import Pipeline
 from pyannote.pipeline.blocks.classification import ClosestAssignment
 from pyannote.core import Annotation
+from pyannote.database import get_unique_identifier
 from .utils import assert_int_labels
 from .utils import assert_string_labels
+from .utils import get_annotation_hash
+from .utils import get_cache
+from .utils import memoize
 from ..features import Precomputed
+from ..embedding.index import EmbeddingIndex
 
 
 class SpeechTurnClosestAssignment(Pipeline):
@@ -48,10 +53,16 @@ class SpeechTurnClosestAssignment(Pipeline):
         Path to precomputed embeddings.
     metric : {'euclidean', 'cosine', 'angular'}, optional
         Metric used for comparing embeddings. Defaults to 'cosine'.
+    cache_size : `int`, optional
+        Number of annotations for which embeddings are kept in memory, so
+        that they are not recomputed when the same speech turns (or targets)
+        are processed again (e.g. during tuning). Use 0 to deactivate caching.
+        Defaults to 1000.
     """
 
     def __init__(self, embedding: Optional[Path] = None,
-                       metric: Optional[str] = 'cosine'):
+                       metric: Optional[str] = 'cosine',
+                       cache_size: Optional[int] = 1000):
         super().__init__()
 
         self.embedding = embedding
@@ -59,39 +70,40 @@ class SpeechTurnClosestAssignment(Pipeline):
 
         self.metric = metric
 
+        self.cache_size = cache_size
+        self.cache_ = get_cache(self.cache_size)
+
+        # closest target search relies on EmbeddingIndex. this sub-pipeline
+        # is only kept for its "threshold" hyper-parameter.
         self.closest_assignment = ClosestAssignment(metric=self.metric)
 
-    def __call__(self, current_file: dict,
-                       speech_turns: Annotation,
-                       targets: Annotation) -> Annotation:
-        """Assign each speech turn to closest target (if close enough)
+    def _embed(self, current_file: dict, annotation: Annotation):
+        """Compute one embedding per label
 
         Parameters
         ----------
         current_file : `dict`
             File as provided by a pyannote.database protocol.
-        speech_turns : `Annotation`
-            Speech turns. Should only contain `int` labels.
-        targets : `Annotation`
-            Targets. Should only contain `str` labels.
+        annotation : `Annotation`
+            Annotation.
 
         Returns
         -------
-        assigned : `Annotation`
-            Assigned speech turns.
+        X : `np.ndarray`
+            (n_embedded_labels, dimension) embeddings.
+        embedded_labels : `list`
+            Labels for which an embedding is available.
+        skipped_labels : `list`
+            Labels for which no embedding is available.
         """
 
-        assert_string_labels(targets, 'targets')
-        assert_int_labels(speech_turns, 'speech_turns')
-
         embedding = self.precomputed_(current_file)
 
-        # gather targets embedding
-        labels = targets.labels()
-        X_targets, targets_labels = [], []
+        labels = annotation.labels()
+        X, embedded_labels, skipped_labels = [], [], []
         for l, label in enumerate(labels):
 
-            timeline = targets.label_timeline(label, copy=False)
+            timeline = annotation.label_timeline(label, copy=False)
 
             # be more and more permissive until we have
             # at least one embedding for current speech turn
@@ -102,37 +114,72 @@ class SpeechTurnClosestAssignment(Pipeline):
 
             # skip labels so small we don't have any embedding for it
             if len(x) < 1:
+                skipped_labels.append(label)
                 continue
 
-            targets_labels.append(label)
-            X_targets.append(np.mean(x, axis=0))
+            embedded_labels.append(label)
+            X.append(np.mean(x, axis=0))
 
-        # gather speech turns embedding
-        labels = speech_turns.labels()
-        X, assigned_labels, skipped_labels = [], [], []
-        for l, label in enumerate(labels):
+        return np.vstack(X), embedded_labels, skipped_labels
 
-            timeline = speech_turns.label_timeline(label, copy=False)
+    def _index(self, current_file: dict, targets: Annotation):
+        """Build index of target embeddings
 
-            # be more and more permissive until we have
-            # at least one embedding for current speech turn
-            for mode in ['strict', 'center', 'loose']:
-                x = embedding.crop(timeline, mode=mode)
-                if len(x) > 0:
-                    break
+        Parameters
+        ----------
+        current_file : `dict`
+            File as provided by a pyannote.database protocol.
+        targets : `Annotation`
+            Targets.
 
-            # skip labels so small we don't have any embedding for it
-            if len(x) < 1:
-                skipped_labels.append(label)
-                continue
+        Returns
+        -------
+        index : `EmbeddingIndex`
+            Index of one embedding per target (labeled by target label).
+        """
+        X_targets, targets_labels, _ = self._embed(current_file, targets)
+        index = EmbeddingIndex(metric=self.metric)
+        return index.add(X_targets, labels=targets_labels)
 
-            assigned_labels.append(label)
-            X.append(np.mean(x, axis=0))
+    def __call__(self, current_file: dict,
+                       speech_turns: Annotation,
+                       targets: Annotation) -> Annotation:
+        """Assign each speech turn to closest target (if close enough)
 
-        # assign speech turns to closest class
-        assignments = self.closest_assignment(np.vstack(X_targets),
-                                              np.vstack(X))
-        mapping = {label: targets_labels[k]
-                   for label, k in zip(assigned_labels, assignments)
-                   if not k < 0}
+        Parameters
+        ----------
+        current_file : `dict`
+            File as provided by a pyannote.database protocol.
+        speech_turns : `Annotation`
+            Speech turns. Should only contain `int` labels.
+        targets : `Annotation`
+            Targets. Should only contain `str` labels.
+
+        Returns
+        -------
+        assigned : `Annotation`
+            Assigned speech turns.
+        """
+
+        assert_string_labels(targets, 'targets')
+        assert_int_labels(speech_turns, 'speech_turns')
+
+        uri = get_unique_identifier(current_file)
+
+        # index targets embedding
+        key = ('targets', uri, get_annotation_hash(targets))
+        index = memoize(self.cache_, key, self._index, current_file, targets)
+
+        # gather speech turns embedding
+        key = (uri, get_annotation_hash(speech_turns))
+        X, assigned_labels, _ = memoize(
+            self.cache_, key, self._embed, current_file, speech_turns)
+
+        # assign speech turns to closest target (if close enough)
+        distances, indices = index.search(X, k=1)
+        threshold = self.closest_assignment.threshold
+        mapping = {label: index.labels[k]
+                   for label, d, k in zip(assigned_labels,
+                                          distances[:, 0], indices[:, 0])
+                   if k > -1 and d <= threshold}
         return speech_turns.rename_labels(mapping=mapping)
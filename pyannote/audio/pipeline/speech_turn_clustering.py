@@ -30,13 +30,20 @@ import numpy as np
 from pathlib import Path
 from typing import Optional
 
+from scipy.cluster.hierarchy import fcluster
 from pyannote.core import Annotation
+from pyannote.core.utils.hierarchy import linkage
+from pyannote.core.utils.distance import l2_normalize
+from pyannote.database import get_unique_identifier
 from pyannote.pipeline import Pipeline
 from pyannote.audio.features import Precomputed
 from pyannote.pipeline.blocks.clustering import \
     HierarchicalAgglomerativeClustering
 from pyannote.pipeline.blocks.clustering import AffinityPropagationClustering
 from .utils import assert_string_labels
+from .utils import get_annotation_hash
+from .utils import get_cache
+from .utils import memoize
 
 
 class SpeechTurnClustering(Pipeline):
@@ -49,11 +56,17 @@ class SpeechTurnClustering(Pipeline):
     metric : {'euclidean', 'cosine', 'angular'}, optional
         Metric used for comparing embeddings. Defaults to 'cosine'.
     method : {'pool', 'affinity_propagation'}
+    cache_size : `int`, optional
+        Number of files for which embeddings (and dendrogram) are kept in
+        memory, so that they are not recomputed when only the clustering
+        hyper-parameters change (e.g. during tuning). Use 0 to deactivate
+        caching. Defaults to 1000.
     """
 
     def __init__(self, embedding: Optional[Path],
                        metric: Optional[str] = 'cosine',
-                       method: Optional[str] = 'pool'):
+                       method: Optional[str] = 'pool',
+                       cache_size: Optional[int] = 1000):
         super().__init__()
 
         self.embedding = embedding
@@ -62,6 +75,11 @@ class SpeechTurnClustering(Pipeline):
         self.metric = metric
         self.method = method
 
+        # per-file embeddings (and dendrogram) do not depend on any
+        # hyper-parameter: cache them so that they are computed only once
+        self.cache_size = cache_size
+        self.cache_ = get_cache(self.cache_size)
+
         if self.method == 'affinity_propagation':
             self.clustering = AffinityPropagationClustering(
                 metric=self.metric)
@@ -81,25 +99,29 @@ class SpeechTurnClustering(Pipeline):
             self.clustering = HierarchicalAgglomerativeClustering(
                 method=self.method, metric=self.metric)
 
-    def __call__(self, current_file: dict,
-                       speech_turns: Annotation) -> Annotation:
-        """Apply speech turn clustering
+    def _embed(self, current_file: dict, speech_turns: Annotation):
+        """Compute one embedding per label (and dendrogram when needed)
 
         Parameters
         ----------
         current_file : `dict`
             File as provided by a pyannote.database protocol.
         speech_turns : `Annotation`
-            Speech turns. Should only contain `str` labels.
+            Speech turns.
 
         Returns
         -------
-        speech_turns : `pyannote.core.Annotation`
-            Clustered speech turns.
+        X : `np.ndarray`
+            (n_clustered_labels, dimension) embeddings.
+        clustered_labels : `list`
+            Labels for which an embedding is available.
+        skipped_labels : `list`
+            Labels for which no embedding is available.
+        dendrogram : `np.ndarray` or None
+            Complete dendrogram of `X` (as returned by `linkage`). None when
+            using affinity propagation or when there are less than 2 labels.
         """
 
-        assert_string_labels(speech_turns, 'speech_turns')
-
         embedding = self.precomputed_(current_file)
 
         labels = speech_turns.labels()
@@ -123,8 +145,49 @@ class SpeechTurnClustering(Pipeline):
             clustered_labels.append(label)
             X.append(np.mean(x, axis=0))
 
+        X = np.vstack(X)
+
+        # compute agglomerative clustering all the way up to one cluster once
+        # and for all (flat clusters depend on "threshold" hyper-parameter)
+        dendrogram = None
+        if self.method != 'affinity_propagation' and len(X) > 1:
+            X_ = l2_normalize(X) if self.clustering.normalize else X
+            dendrogram = linkage(X_, method=self.method, metric=self.metric)
+
+        return X, clustered_labels, skipped_labels, dendrogram
+
+    def __call__(self, current_file: dict,
+                       speech_turns: Annotation) -> Annotation:
+        """Apply speech turn clustering
+
+        Parameters
+        ----------
+        current_file : `dict`
+            File as provided by a pyannote.database protocol.
+        speech_turns : `Annotation`
+            Speech turns. Should only contain `str` labels.
+
+        Returns
+        -------
+        speech_turns : `pyannote.core.Annotation`
+            Clustered speech turns.
+        """
+
+        assert_string_labels(speech_turns, 'speech_turns')
+
+        key = (get_unique_identifier(current_file),
+               get_annotation_hash(speech_turns))
+        X, clustered_labels, skipped_labels, dendrogram = memoize(
+            self.cache_, key, self._embed, current_file, speech_turns)
+
         # apply clustering of label embeddings
-        clusters = self.clustering(np.vstack(X))
+        if self.method == 'affinity_propagation':
+            clusters = self.clustering(X)
+        elif dendrogram is None:
+            clusters = np.ones((len(X), ), dtype=int)
+        else:
+            clusters = fcluster(dendrogram, self.clustering.threshold,
+                                criterion='distance')
 
         # map each clustered label to its cluster (between 1 and N_CLUSTERS)
         mapping = {label: k for label, k in zip(clustered_labels, clusters)}
@@ -132,7 +195,7 @@ class SpeechTurnClustering(Pipeline):
         # map each skipped label to its own cluster
         # (between -1 and -N_SKIPPED_LABELS)
         for l, label in enumerate(skipped_labels):
-            mapping[skipped_labels] = -(l + 1)
+            mapping[label] = -(l + 1)
 
         # do the actual mapping
         return speech_turns.rename_labels(mapping=mapping)
@@ -31,6 +31,7 @@ from pathlib import Path
 
 from pyannote.core import Annotation
 from pyannote.pipeline import Pipeline
+from .parallel import ParallelMixin
 from .speaker_change_detection import SpeakerChangeDetection
 from .speech_activity_detection import SpeechActivityDetection
 
@@ -58,7 +59,7 @@ class OracleSpeechTurnSegmentation(Pipeline):
         return current_file['annotation'].relabel_tracks(generator='string')
 
 
-class SpeechTurnSegmentation(Pipeline):
+class SpeechTurnSegmentation(ParallelMixin, Pipeline):
     """Combine speech activity and speaker change detections for segmentation
 
     Parameters
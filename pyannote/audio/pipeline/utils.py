@@ -27,6 +27,11 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 
+import json
+import hashlib
+from typing import Callable, Hashable, Optional
+
+from cachetools import LRUCache
 from pyannote.core import Annotation
 
 
@@ -58,3 +63,88 @@ def assert_int_labels(annotation: Annotation, name: str):
     if any(not isinstance(label, int) for label in annotation.labels()):
         msg = f'{name} must contain `int` labels only.'
         raise ValueError(msg)
+
+
+def get_annotation_hash(annotation: Annotation) -> str:
+    """Compute a hash that only depends on the content of an annotation
+
+    Parameters
+    ----------
+    annotation : `pyannote.core.Annotation`
+        Annotation.
+
+    Returns
+    -------
+    hash : `str`
+        Hexadecimal hash of (segment, track, label) triplets.
+    """
+    content = [(segment.start, segment.end, str(track), str(label))
+               for segment, track, label
+               in annotation.itertracks(yield_label=True)]
+    return hashlib.md5(repr(content).encode('utf8')).hexdigest()
+
+
+def get_params_hash(params: dict) -> str:
+    """Compute a hash that only depends on the value of (nested) parameters
+
+    Parameters
+    ----------
+    params : `dict`
+        Parameters, as returned by `Pipeline.params`.
+
+    Returns
+    -------
+    hash : `str`
+        Hexadecimal hash of parameters.
+    """
+    content = json.dumps(params, sort_keys=True, default=repr)
+    return hashlib.md5(content.encode('utf8')).hexdigest()
+
+
+def get_cache(cache_size: int) -> Optional[LRUCache]:
+    """Create cache for intermediate results
+
+    Parameters
+    ----------
+    cache_size : `int`
+        Maximum number of intermediate results kept in memory.
+        Use 0 to deactivate caching.
+
+    Returns
+    -------
+    cache : `LRUCache` or None
+        None when `cache_size` is 0.
+    """
+    if cache_size < 1:
+        return None
+    return LRUCache(maxsize=cache_size)
+
+
+def memoize(cache: Optional[LRUCache], key: Hashable,
+            func: Callable, *args, **kwargs):
+    """Return func(*args, **kwargs), computing it only if not already cached
+
+    Parameters
+    ----------
+    cache : `LRUCache` or None
+        Cache, as returned by `get_cache`. Use None to deactivate caching.
+    key : hashable
+        Key that uniquely identifies the result of `func(*args, **kwargs)`.
+        It is the responsability of the caller to make sure it covers
+        everything the result depends on (e.g. file URI and parameters).
+    func : callable
+        Function whose result is cached.
+
+    Returns
+    -------
+    result :
+        Result of `func(*args, **kwargs)`.
+    """
+
+    if cache is None:
+        return func(*args, **kwargs)
+
+    if key not in cache:
+        cache[key] = func(*args, **kwargs)
+
+    return cache[key]
@@ -29,6 +29,7 @@
 
 import numpy as np
 import scipy.signal
+import scipy.special
 from pyannote.core import Segment, Timeline
 from pyannote.core.utils.generators import pairwise
 from sklearn.mixture import GaussianMixture
@@ -248,6 +249,31 @@ class Binarize(object):
         return active
 
 
+def _moving_sum(data, window):
+    """Centered moving sum along last axis
+
+    Same as scipy.signal.convolve(data, np.ones((1, window)), mode='same')
+    but in O(n_samples) using cumulative sums, whatever `window`.
+
+    Parameters
+    ----------
+    data : (n_rows, n_samples) np.ndarray
+    window : int
+        Window size, in number of samples.
+
+    Returns
+    -------
+    smoothed : (n_rows, n_samples) np.ndarray
+    """
+    n_rows, n_samples = data.shape
+    cumsum = np.zeros((n_rows, n_samples + 1))
+    np.cumsum(data, axis=1, out=cumsum[:, 1:])
+    i = np.arange(n_samples)
+    end = np.minimum(n_samples, i + (window - 1) // 2 + 1)
+    start = np.maximum(0, i - window // 2)
+    return cumsum[:, end] - cumsum[:, start]
+
+
 class GMMResegmentation(object):
     """
     Parameters
@@ -258,6 +284,18 @@ class GMMResegmentation(object):
         Number of EM iterations to train the models. Defaults to 10.
     window : float, optional
         Duration of the smoothing window. Defaults to 1 second.
+    ubm : {'file'} or `sklearn.mixture.GaussianMixture`, optional
+        Set to 'file' to train one universal background model (UBM) on all
+        speech frames of the file, or provide a pre-trained (diagonal
+        covariance) UBM. Each label model is then obtained by MAP adaptation
+        of the UBM means, and all label models are scored at once. This is
+        much faster than the default behavior, which is to train one GMM
+        from scratch for each label.
+    relevance_factor : float, optional
+        Relevance factor used for MAP adaptation. Defaults to 16.
+    block_size : int, optional
+        Number of frames scored at once when using an UBM. Controls peak
+        memory usage. Defaults to 10000.
 
     Note
     ----
@@ -271,12 +309,100 @@ class GMMResegmentation(object):
     TODO: add option to also resegment speech/non-speech
 
     """
-    def __init__(self, n_components=128, n_iter=10, window=1.):
+    def __init__(self, n_components=128, n_iter=10, window=1., ubm=None,
+                 relevance_factor=16., block_size=10000):
         super().__init__()
         self.n_components = n_components
         self.n_iter = n_iter
         self.window = window
+        self.ubm = ubm
+        self.relevance_factor = relevance_factor
+        self.block_size = block_size
+
+        if isinstance(self.ubm, GaussianMixture) and \
+           self.ubm.covariance_type != 'diag':
+            msg = 'Pre-trained UBM must use diagonal covariances.'
+            raise ValueError(msg)
+
+    def _fit_gmm(self, data):
+        return GaussianMixture(n_components=self.n_components,
+                               covariance_type='diag',
+                               tol=0.001, reg_covar=1e-06,
+                               max_iter=self.n_iter, n_init=1,
+                               init_params='kmeans',
+                               weights_init=None,
+                               means_init=None,
+                               precisions_init=None,
+                               random_state=None,
+                               warm_start=False,
+                               verbose=0,
+                               verbose_interval=10).fit(data)
+
+    def _log_probs_independent(self, annotation, features):
+        """Score every frame with one GMM trained from scratch per label"""
+
+        log_probs = []
+
+        # FIXME: embarrasingly parallel
+        for label in annotation.labels():
+
+            # gather all features for current label
+            span = annotation.label_timeline(label)
+            data = features.crop(span, mode='center')
+
+            # train a GMM
+            gmm = self._fit_gmm(data)
+
+            # compute log-probability across the whole file
+            log_prob = gmm.score_samples(features.data)
+            log_probs.append(log_prob)
 
+        return np.vstack(log_probs)
+
+    def _log_probs_ubm(self, annotation, features):
+        """Score every frame with MAP-adapted UBMs (one per label)"""
+
+        labels = annotation.labels()
+
+        ubm = self.ubm
+        if not isinstance(ubm, GaussianMixture):
+            # train UBM on all speech frames
+            span = annotation.get_timeline().support()
+            ubm = self._fit_gmm(features.crop(span, mode='center'))
+
+        # MAP adaptation of the means
+        means = np.empty((len(labels), ) + ubm.means_.shape)
+        for l, label in enumerate(labels):
+            span = annotation.label_timeline(label)
+            data = features.crop(span, mode='center')
+            gamma = ubm.predict_proba(data)
+            n = np.sum(gamma, axis=0)
+            expected = np.dot(gamma.T, data) / np.maximum(n, 1e-10)[:, None]
+            alpha = (n / (n + self.relevance_factor))[:, None]
+            means[l] = alpha * expected + (1. - alpha) * ubm.means_
+
+        # all models share UBM weights and (diagonal) precisions. therefore
+        # log N(x; mu, sigma²) only differs in its cross term x.(mu/sigma²),
+        # which is computed for all labels and components in one product.
+        n_labels, n_components, dimension = means.shape
+        precisions = 1. / ubm.covariances_
+        constant = (np.log(ubm.weights_)
+                    + .5 * np.sum(np.log(precisions), axis=1)
+                    - .5 * dimension * np.log(2 * np.pi))
+        scaled_means = (means * precisions).reshape(-1, dimension)
+        squared_means = np.sum(means ** 2 * precisions, axis=2)
+
+        n_frames, _ = features.data.shape
+        log_probs = np.empty((n_labels, n_frames))
+        for i in range(0, n_frames, self.block_size):
+            X = features.data[i:i + self.block_size]
+            XX = np.dot(X ** 2, precisions.T)[:, None, :]
+            XM = np.dot(X, scaled_means.T).reshape(len(X), n_labels, -1)
+            log_prob = constant - .5 * (XX - 2 * XM + squared_means)
+            log_probs[:, i:i + self.block_size] = \
+                scipy.special.logsumexp(log_prob, axis=2).T
+
+        return log_probs
 
     def apply(self, annotation, features):
         """
@@ -296,39 +422,16 @@ class GMMResegmentation(object):
         """
 
         sliding_window = features.sliding_window
-        window = np.ones((1, sliding_window.samples(self.window)))
-
-        log_probs = []
         labels = annotation.labels()
 
-        # FIXME: embarrasingly parallel
-        for label in labels:
-
-            # gather all features for current label
-            span = annotation.label_timeline(label)
-            data = features.crop(span, mode='center')
-
-            # train a GMM
-            gmm = GaussianMixture(n_components=self.n_components,
-                                  covariance_type='diag',
-                                  tol=0.001, reg_covar=1e-06,
-                                  max_iter=self.n_iter, n_init=1,
-                                  init_params='kmeans',
-                                  weights_init=None,
-                                  means_init=None,
-                                  precisions_init=None,
-                                  random_state=None,
-                                  warm_start=False,
-                                  verbose=0,
-                                  verbose_interval=10).fit(data)
-
-            # compute log-probability across the whole file
-            log_prob = gmm.score_samples(features.data)
-            log_probs.append(log_prob)
+        if self.ubm is None:
+            log_probs = self._log_probs_independent(annotation, features)
+        else:
+            log_probs = self._log_probs_ubm(annotation, features)
 
         # smooth log-probability using a sliding window
-        log_probs = scipy.signal.convolve(np.vstack(log_probs),
-                                          window, mode='same')
+        log_probs = _moving_sum(log_probs,
+                                sliding_window.samples(self.window))
 
         # assign each frame to the most likely label
         y = np.argmax(log_probs, axis=0)
@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Batch-level generator utilities
+
+Batch generators that draw a whole batch at once can gather their features
+directly into preallocated arrays (see `BatchBuffer`) instead of yielding one
+dictionary per sample to `pyannote.generators.batch.batchify`.
+
+They can then be prefetched either by a background thread (`Prefetcher`) or
+by worker processes writing into shared memory (`ProcessLoader`), both with
+bounded queues (see `get_loaders`).
+"""
+
+import re
+import random
+import threading
+from collections import deque
+import traceback
+import multiprocessing as mp
+from functools import partial
+from queue import Empty
+
+import numpy as np
+
+
+class BatchBuffer(object):
+    """Ring of preallocated batch arrays
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of each array.
+    dtype : numpy dtype, optional
+        Defaults to np.float32.
+    n_buffers : int, optional
+        Number of arrays in the ring. Defaults to 2.
+
+    Usage
+    -----
+    >>> buffer = BatchBuffer((32, 200, 59), n_buffers=2)
+    >>> X = buffer()  # first array
+    >>> Y = buffer()  # second array
+    >>> Z = buffer()  # first array again (X is overwritten)
+
+    Notes
+    -----
+    An array returned by `buffer()` is returned again `n_buffers` calls later.
+    Consumers that keep references to previous batches (e.g. `Prefetcher`
+    queues) must therefore use more arrays than they keep.
+    """
+
+    def __init__(self, shape, dtype=np.float32, n_buffers=2):
+        super().__init__()
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.n_buffers = n_buffers
+
+        self.buffers_ = [np.empty(self.shape, dtype=self.dtype)
+                         for _ in range(self.n_buffers)]
+        self.index_ = -1
+
+    def __call__(self):
+        self.index_ = (self.index_ + 1) % self.n_buffers
+        return self.buffers_[self.index_]
+
+
+def parse_size(size):
+    """Parse memory size
+
+    Parameters
+    ----------
+    size : int or str
+        Size in bytes, or human-readable size (e.g. '512MB' or '2 GB').
+
+    Returns
+    -------
+    size : int
+        Size in bytes.
+    """
+
+    if not isinstance(size, str):
+        return int(size)
+
+    match = re.match(r'^\s*([0-9.]+)\s*([KMGT]?)I?B?\s*$', size.upper())
+    if match is None:
+        msg = f'Could not parse "{size}" as a memory size (e.g. "512MB").'
+        raise ValueError(msg)
+
+    value, unit = match.groups()
+    return int(float(value) * 1024 ** ' KMGT'.index(unit or ' '))
+
+
+def get_nbytes(batch):
+    """Total size (in bytes) of numpy arrays in `batch`"""
+    if not isinstance(batch, dict):
+        return 0
+    return sum(value.nbytes for value in batch.values()
+               if isinstance(value, np.ndarray))
+
+
+class Prefetcher(object):
+    """Prefetch batches in a background thread, with back-pressure
+
+    The background thread stops generating batches as soon as the queue
+    contains `max_batches` batches, or `max_bytes` bytes of numpy arrays.
+
+    Parameters
+    ----------
+    batches : iterable
+        Batch generator.
+    max_batches : int, optional
+        Maximum number of prefetched batches. Defaults to 1.
+    max_bytes : int or str, optional
+        Maximum size of prefetched batches (e.g. '512MB'). Defaults to no
+        limit. The queue always accepts at least one batch.
+
+    Notes
+    -----
+    When `batches` reuses a `BatchBuffer`, it must have at least
+    `max_batches + 2` arrays: one being consumed, `max_batches` waiting in
+    the queue, and one being filled.
+    """
+
+    def __init__(self, batches, max_batches=1, max_bytes=None):
+        super().__init__()
+
+        self.max_batches = max(1, max_batches)
+        self.max_bytes = None if max_bytes is None else parse_size(max_bytes)
+
+        self.queue_ = deque()
+        self.nbytes_ = 0
+        self.done_ = False
+        self.error_ = None
+        self.stop_ = False
+        self.condition_ = threading.Condition()
+
+        self.thread_ = threading.Thread(target=self._produce,
+                                        args=(batches, ), daemon=True)
+        self.thread_.start()
+
+    def _full(self, nbytes):
+        if len(self.queue_) >= self.max_batches:
+            return True
+        return (self.max_bytes is not None and len(self.queue_) > 0 and
+                self.nbytes_ + nbytes > self.max_bytes)
+
+    def _produce(self, batches):
+        try:
+            for batch in batches:
+                nbytes = get_nbytes(batch)
+                with self.condition_:
+                    while self._full(nbytes) and not self.stop_:
+                        self.condition_.wait()
+                    if self.stop_:
+                        return
+                    self.queue_.append((batch, nbytes))
+                    self.nbytes_ += nbytes
+                    self.condition_.notify_all()
+        except Exception as e:
+            self.error_ = e
+        finally:
+            with self.condition_:
+                self.done_ = True
+                self.condition_.notify_all()
+
+    @property
+    def depth(self):
+        """Number of batches waiting in the queue"""
+        return len(self.queue_)
+
+    @property
+    def nbytes(self):
+        """Size (in bytes) of batches waiting in the queue"""
+        return self.nbytes_
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.condition_:
+            while not self.queue_ and not self.done_:
+                self.condition_.wait()
+            if not self.queue_:
+                if self.error_ is not None:
+                    raise self.error_
+                raise StopIteration()
+            batch, nbytes = self.queue_.popleft()
+            self.nbytes_ -= nbytes
+            self.condition_.notify_all()
+        return batch
+
+    def close(self):
+        """Stop background thread"""
+        with self.condition_:
+            self.stop_ = True
+            self.queue_.clear()
+            self.nbytes_ = 0
+            self.condition_.notify_all()
+
+
+def _pack(batch, memory):
+    """Write numpy arrays of `batch` into `memory`
+
+    Parameters
+    ----------
+    batch : dict
+        Batch.
+    memory : numpy array
+        uint8 shared memory slot.
+
+    Returns
+    -------
+    packed : dict
+        Same as `batch` except that numpy arrays that fit in `memory` are
+        replaced by (offset, dtype, shape) tuples.
+    """
+
+    packed, offset = {}, 0
+    for key, value in batch.items():
+
+        if isinstance(value, np.ndarray) and value.dtype != np.object_:
+
+            # keep 8-bytes alignment
+            start = offset + (-offset % 8)
+            end = start + value.nbytes
+            if end <= len(memory):
+                view = memory[start:end].view(value.dtype)
+                view[:] = value.reshape(-1)
+                packed[key] = (start, value.dtype.str, value.shape)
+                offset = end
+                continue
+
+        # anything else (or arrays that do not fit) is sent as is
+        packed[key] = value
+
+    return packed
+
+
+def _unpack(packed, memory):
+    """Inverse of `_pack` (arrays are views on `memory`)"""
+
+    batch = {}
+    for key, value in packed.items():
+        if isinstance(value, tuple):
+            start, dtype, shape = value
+            dtype = np.dtype(dtype)
+            end = start + dtype.itemsize * int(np.prod(shape))
+            value = memory[start:end].view(dtype).reshape(shape)
+        batch[key] = value
+    return batch
+
+
+def _loader_worker(get_batches, seed, shared, slot_size, free, ready, stop):
+    """Generate batches into shared memory slots (worker process)"""
+
+    # processes are forked: make sure they do not share the same random state
+    np.random.seed(seed)
+    random.seed(seed)
+
+    memory = np.frombuffer(shared, dtype=np.uint8)
+
+    try:
+        for batch in get_batches():
+
+            # wait for a free slot (or for the loader to be closed)
+            while True:
+                if stop.is_set():
+                    ready.cancel_join_thread()
+                    return
+                try:
+                    slot = free.get(timeout=0.1)
+                    break
+                except Empty:
+                    continue
+
+            slot_memory = memory[slot * slot_size:(slot + 1) * slot_size]
+            ready.put((slot, _pack(batch, slot_memory)))
+
+    except Exception:
+        ready.put((None, traceback.format_exc()))
+
+
+class ProcessLoader(object):
+    """Generate batches in worker processes
+
+    Each worker process runs its own batch generator and writes numpy arrays
+    of each batch into a ring of shared memory slots. Only (small) remaining
+    fields (e.g. lists of labels) are pickled.
+
+    Parameters
+    ----------
+    get_batches : callable
+        Called (without argument) in each worker to get a batch generator.
+        Batches must be dictionaries.
+    n_workers : int, optional
+        Number of worker processes. Defaults to 1.
+    n_slots : int, optional
+        Number of shared memory slots. At most `n_slots` - 1 batches are
+        waiting in the queue (plus one per worker, waiting for a free slot).
+        Defaults to 2 x `n_workers` + 1.
+    slot_size : int, optional
+        Size (in bytes) of each slot. Defaults to twice the size of arrays
+        in a first batch generated by the main process. Arrays that do not
+        fit are pickled.
+    seed : int, optional
+        Worker #k is seeded with `seed` + k. Defaults to a seed drawn from
+        the main process random state.
+
+    Usage
+    -----
+    >>> loader = ProcessLoader(generator.batches, n_workers=4)
+    >>> batch = next(loader)
+    >>> loader.close()
+
+    Notes
+    -----
+    Arrays of a batch are views on shared memory: they are only valid until
+    the next batch is requested. Worker processes are forked: this is only
+    supported on platforms where the 'fork' start method is available.
+    """
+
+    def __init__(self, get_batches, n_workers=1, n_slots=None,
+                 slot_size=None, seed=None):
+
+        super().__init__()
+
+        self.n_workers = n_workers
+        self.n_slots = 2 * n_workers + 1 if n_slots is None else n_slots
+        if self.n_slots < 2:
+            msg = f'"n_slots" must be at least 2 (is {self.n_slots}).'
+            raise ValueError(msg)
+
+        if slot_size is None:
+            batch = next(get_batches())
+            slot_size = 2 * sum(value.nbytes for value in batch.values()
+                                if isinstance(value, np.ndarray))
+        # leave room for alignment of up to 16 arrays
+        self.slot_size = int(slot_size) + 128
+
+        if seed is None:
+            seed = np.random.randint(2 ** 31 - self.n_workers)
+
+        context = mp.get_context('fork')
+        self.shared_ = context.RawArray('B', self.n_slots * self.slot_size)
+        self.memory_ = np.frombuffer(self.shared_, dtype=np.uint8)
+
+        self.free_ = context.Queue()
+        for slot in range(self.n_slots):
+            self.free_.put(slot)
+        self.ready_ = context.Queue()
+        self.stop_ = context.Event()
+
+        self.workers_ = []
+        for k in range(self.n_workers):
+            worker = context.Process(
+                target=_loader_worker,
+                args=(get_batches, seed + k, self.shared_, self.slot_size,
+                      self.free_, self.ready_, self.stop_),
+                daemon=True)
+            worker.start()
+            self.workers_.append(worker)
+
+        # slot of the last batch returned by __next__
+        self.slot_ = None
+
+    @property
+    def depth(self):
+        """Number of batches waiting in the queue"""
+        try:
+            return self.ready_.qsize()
+        # not available on some platforms
+        except NotImplementedError:
+            return 0
+
+    @property
+    def nbytes(self):
+        """Size (in bytes) of slots used by batches waiting in the queue"""
+        return self.depth * self.slot_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+
+        if self.stop_.is_set():
+            raise StopIteration()
+
+        # previous batch is no longer needed: release its slot
+        if self.slot_ is not None:
+            self.free_.put(self.slot_)
+            self.slot_ = None
+
+        while True:
+            try:
+                slot, packed = self.ready_.get(timeout=1.)
+                break
+            except Empty:
+                if not any(worker.is_alive() for worker in self.workers_):
+                    self.close()
+                    msg = 'All batch generation processes died.'
+                    raise RuntimeError(msg)
+
+        if slot is None:
+            self.close()
+            msg = f'Batch generation process failed:\n{packed}'
+            raise RuntimeError(msg)
+
+        self.slot_ = slot
+        memory = self.memory_[slot * self.slot_size:
+                              (slot + 1) * self.slot_size]
+        return _unpack(packed, memory)
+
+    def close(self):
+        """Stop worker processes"""
+
+        if self.stop_.is_set():
+            return
+        self.stop_.set()
+
+        # drain queues so that workers blocked on `put` can exit
+        for queue in [self.ready_, self.free_]:
+            try:
+                while True:
+                    queue.get_nowait()
+            except Empty:
+                pass
+
+        for worker in self.workers_:
+            worker.join(timeout=1.)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+    def __del__(self):
+        if hasattr(self, 'workers_'):
+            self.close()
+
+
+def get_loaders(get_batches, parallel=1, processes=False, prefetch=8):
+    """Get (prefetching) batch loaders
+
+    Parameters
+    ----------
+    get_batches : callable
+        Takes a `n_buffers` keyword argument (see `BatchBuffer`) and returns
+        a batch generator (without prefetching).
+    parallel : int, optional
+        Number of background threads (or worker processes). Defaults to 1.
+        Set `parallel` to 0 to not prefetch batches.
+    processes : bool, optional
+        Use `parallel` worker processes instead of background threads.
+        Defaults to False.
+    prefetch : int or str, optional
+        Maximum number of prefetched batches per background thread (or for
+        all worker processes), or maximum memory size of those batches
+        (e.g. '512MB'). Defaults to 8 batches.
+
+    Returns
+    -------
+    loaders : list
+        Batch iterators: one `Prefetcher` per background thread, one
+        `ProcessLoader` for all worker processes, or one batch generator
+        when `parallel` is 0.
+    """
+
+    if not parallel:
+        return [get_batches(n_buffers=2)]
+
+    if isinstance(prefetch, str):
+        max_bytes = parse_size(prefetch)
+        # estimate batch size from a first batch
+        nbytes = max(1, get_nbytes(next(get_batches(n_buffers=1))))
+    else:
+        max_bytes, nbytes = None, None
+
+    if processes:
+        slot_size = None if nbytes is None else 2 * nbytes
+        if max_bytes is None:
+            max_batches = prefetch
+        else:
+            max_batches = max(1, max_bytes // slot_size)
+        loader = ProcessLoader(partial(get_batches, n_buffers=1),
+                               n_workers=parallel, n_slots=max_batches + 1,
+                               slot_size=slot_size)
+        return [loader]
+
+    if max_bytes is None:
+        max_batches = prefetch
+    else:
+        max_batches = max(1, int(np.ceil(max_bytes / nbytes)))
+
+    return [Prefetcher(get_batches(n_buffers=max_batches + 2),
+                       max_batches=max_batches, max_bytes=max_bytes)
+            for _ in range(parallel)]
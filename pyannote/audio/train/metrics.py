@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2018 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+
+import numpy as np
+
+
+class StreamingDetCurve(object):
+    """Fixed-memory DET curve estimator
+
+    Scores are accumulated into two histograms (one for positive trials, one
+    for negative trials) sharing the same `n_bins` regularly spaced bins.
+    Unless `bounds` are provided, the range of these bins is initialized
+    with the first scores and doubled (by merging pairs of adjacent bins)
+    whenever a score falls outside of it. Memory usage does not depend on the
+    number of scores, and the equal error rate is estimated up to the width
+    of one bin.
+
+    Parameters
+    ----------
+    n_bins : int, optional
+        Number of histogram bins. Must be even. Defaults to 10000.
+    distances : bool, optional
+        When True, indicate that scores are actually distances (i.e. the
+        lower, the more likely the trial is positive). Defaults to False.
+    bounds : (float, float) tuple, optional
+        Fixed range of scores. Scores outside of this range are counted in
+        the first or last bin. Defaults to adapting the range to the scores.
+
+    Usage
+    -----
+    >>> det = StreamingDetCurve(distances=True)
+    >>> for batch in batches:
+    ...     det.update(batch['y_true'], batch['distances'])
+    >>> fpr, fnr, thresholds, eer = det.det_curve()
+    """
+
+    def __init__(self, n_bins=10000, distances=False, bounds=None):
+        super().__init__()
+
+        if n_bins < 2 or n_bins % 2:
+            msg = f'"n_bins" must be an even number (is {n_bins}).'
+            raise ValueError(msg)
+
+        self.n_bins = n_bins
+        self.distances = distances
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        """Forget all scores accumulated so far"""
+
+        # counts_[0] (resp. [1]) is the histogram of negative (resp. positive)
+        # trials, in "score" domain (i.e. distances are negated)
+        self.counts_ = np.zeros((2, self.n_bins), dtype=np.int64)
+
+        if self.bounds is None:
+            self.low_, self.width_ = None, None
+        else:
+            low, high = self._to_score(np.array(self.bounds, dtype=np.float64))
+            low, high = min(low, high), max(low, high)
+            self.low_, self.width_ = low, (high - low) / self.n_bins
+
+        # raw statistics (in original domain) used for logging histograms
+        self.min_ = np.full((2, ), np.inf)
+        self.max_ = np.full((2, ), -np.inf)
+        self.sum_ = np.zeros((2, ))
+        self.sum_squares_ = np.zeros((2, ))
+
+    def _to_score(self, values):
+        return -values if self.distances else values
+
+    def _grow(self, low, high):
+        """Double bins width until [low, high] fits in histogram range"""
+
+        half = self.n_bins // 2
+        while high >= self.low_ + self.n_bins * self.width_:
+            # keep lower bound, extend upper bound
+            merged = self.counts_.reshape(2, half, 2).sum(axis=2)
+            self.counts_[:, :half] = merged
+            self.counts_[:, half:] = 0
+            self.width_ *= 2
+
+        while low < self.low_:
+            # keep upper bound, extend lower bound
+            merged = self.counts_.reshape(2, half, 2).sum(axis=2)
+            self.counts_[:, half:] = merged
+            self.counts_[:, :half] = 0
+            self.low_ -= self.n_bins * self.width_
+            self.width_ *= 2
+
+    def update(self, y_true, y_score):
+        """Accumulate new trials
+
+        Parameters
+        ----------
+        y_true : (n_trials, ) array-like or bool
+            Boolean reference. Use a single boolean when all trials share
+            the same reference.
+        y_score : (n_trials, ) array-like
+            Predicted scores (or distances). Must be finite.
+        """
+
+        values = np.asarray(y_score, dtype=np.float64).reshape(-1)
+        if len(values) == 0:
+            return
+        if not np.all(np.isfinite(values)):
+            msg = 'Scores must be finite (found NaN or infinite values).'
+            raise ValueError(msg)
+        y_true = np.broadcast_to(
+            np.asarray(y_true, dtype=bool).reshape(-1), values.shape)
+        y_true = y_true.astype(np.int64)
+
+        for k in range(2):
+            v = values[y_true == k]
+            if len(v) == 0:
+                continue
+            self.min_[k] = min(self.min_[k], np.min(v))
+            self.max_[k] = max(self.max_[k], np.max(v))
+            self.sum_[k] += np.sum(v)
+            self.sum_squares_[k] += np.sum(v ** 2)
+
+        scores = self._to_score(values)
+        low, high = np.min(scores), np.max(scores)
+
+        if self.low_ is None:
+            width = (high - low) / self.n_bins
+            if width <= 0:
+                width = max(1., abs(low)) / self.n_bins
+            self.low_, self.width_ = low, width
+
+        if self.bounds is None:
+            self._grow(low, high)
+
+        bins = np.floor((scores - self.low_) / self.width_).astype(np.int64)
+        np.clip(bins, 0, self.n_bins - 1, out=bins)
+        self.counts_ += np.bincount(
+            bins + y_true * self.n_bins,
+            minlength=2 * self.n_bins).reshape(2, self.n_bins)
+
+    def det_curve(self):
+        """DET curve
+
+        Returns
+        -------
+        fpr : numpy array
+            False alarm rate
+        fnr : numpy array
+            False rejection rate
+        thresholds : numpy array
+            Corresponding thresholds
+        eer : float
+            Equal error rate
+
+        See also
+        --------
+        pyannote.metrics.binary_classification.det_curve
+        """
+
+        negative, positive = self.counts_
+        n_negative, n_positive = np.sum(negative), np.sum(positive)
+        if n_negative == 0 or n_positive == 0:
+            msg = 'DET curve needs both positive and negative trials.'
+            raise ValueError(msg)
+
+        # trials are accepted when their score is higher than the threshold.
+        # thresholds are the lower edges of the bins, in decreasing order
+        # (plus one threshold above all bins), like sklearn.metrics.roc_curve
+        accepted_negative = np.hstack([[0], np.cumsum(negative[::-1])])
+        accepted_positive = np.hstack([[0], np.cumsum(positive[::-1])])
+        fpr = accepted_negative / n_negative
+        fnr = 1. - accepted_positive / n_positive
+        thresholds = self.low_ + self.width_ * np.arange(self.n_bins, -1, -1)
+        thresholds = self._to_score(thresholds)
+
+        # curves cross between eer_index - 1 and eer_index, where the equal
+        # error rate lies in [max(fpr[i - 1], fnr[i]), min(fpr[i], fnr[i - 1])].
+        # use the middle of this interval, which is the usual average of the
+        # four rates when bins are fine enough, but remains meaningful when
+        # most trials share the same bin.
+        i = np.where(fpr > fnr)[0][0]
+        eer = .5 * (max(fpr[i - 1], fnr[i]) + min(fpr[i], fnr[i - 1]))
+
+        return fpr, fnr, thresholds, eer
+
+    @property
+    def eer(self):
+        """Equal error rate"""
+        return self.det_curve()[3]
+
+    def histogram(self, positive=True, max_bins=100):
+        """Histogram of accumulated scores (or distances)
+
+        Parameters
+        ----------
+        positive : bool, optional
+            Histogram of positive (default) or negative trials.
+        max_bins : int, optional
+            Merge adjacent bins so that there are at most that many.
+            Defaults to 100.
+
+        Returns
+        -------
+        histogram : dict
+            Keyword arguments of `tensorboardX.SummaryWriter.add_histogram_raw`
+            (min, max, num, sum, sum_squares, bucket_limits, bucket_counts).
+
+        Usage
+        -----
+        >>> writer.add_histogram_raw('distance', global_step=iteration,
+        ...                          **det.histogram(positive=True))
+        """
+
+        k = int(positive)
+        counts = self.counts_[k]
+        if not np.any(counts):
+            msg = 'Histogram needs at least one trial.'
+            raise ValueError(msg)
+
+        edges = self.low_ + self.width_ * np.arange(1, self.n_bins + 1)
+
+        # back to original domain, from lowest to highest value
+        if self.distances:
+            counts = counts[::-1]
+            edges = -(self.low_ + self.width_ * np.arange(self.n_bins - 1,
+                                                          -1, -1))
+
+        # only keep the occupied range, in at most max_bins buckets
+        occupied = np.where(counts > 0)[0]
+        counts = counts[occupied[0]:occupied[-1] + 1]
+        edges = edges[occupied[0]:occupied[-1] + 1]
+        step = int(np.ceil(len(counts) / max_bins))
+        padding = (-len(counts)) % step
+        counts = np.pad(counts, (0, padding)).reshape(-1, step).sum(axis=1)
+        edges = np.pad(edges, (0, padding), mode='edge')[step - 1::step]
+
+        return {'min': float(self.min_[k]),
+                'max': float(self.max_[k]),
+                'num': int(np.sum(counts)),
+                'sum': float(self.sum_[k]),
+                'sum_squares': float(self.sum_squares_[k]),
+                'bucket_limits': edges.tolist(),
+                'bucket_counts': counts.tolist()}
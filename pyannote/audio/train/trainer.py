@@ -35,8 +35,9 @@ from collections import deque
 from torch.optim import SGD
 from scipy.signal import convolve
 from abc import ABCMeta, abstractmethod
-from torch.nn.utils.rnn import pack_sequence
 from pyannote.audio.train.schedulers import ConstantScheduler
+from pyannote.audio.train.utils import forward_by_length
+from pyannote.audio.train.utils import StagingBuffer
 from pyannote.audio.train.checkpoint import Checkpoint
 from tensorboardX import SummaryWriter
 from dlib import probability_that_sequence_is_increasing
@@ -159,7 +160,8 @@ class Trainer:
         Parameters
         ----------
         batch : `dict`
-            ['X'] (`list`of `numpy.ndarray`)
+            ['X'] (`list`of `numpy.ndarray`, or `torch.Tensor` when features
+            are extracted on device)
         model : `torch.nn.Module`
             Model currently being trained.
         device : `torch.device`
@@ -171,28 +173,9 @@ class Trainer:
             model(batch['X'])
         """
 
-        lengths = [len(x) for x in batch['X']]
-        variable_lengths = len(set(lengths)) > 1
-
-        if variable_lengths:
-            _, sort = torch.sort(torch.tensor(lengths), descending=True)
-            _, unsort = torch.sort(sort)
-            sequences = [torch.tensor(batch['X'][i],
-                                      dtype=torch.float32,
-                                      device=device) for i in sort]
-            batch['X'] = pack_sequence(sequences)
-        else:
-            batch['X'] = torch.tensor(np.stack(batch['X']),
-                                      dtype=torch.float32,
-                                      device=device)
-
-        # forward pass
-        fX = model(batch['X'])
-
-        if variable_lengths:
-            fX = fX[unsort]
-
-        return fX
+        # forward pass (on dense batches of equal-length sequences)
+        return forward_by_length(model, batch['X'], device=device,
+                                 staging=self.staging)
 
     @abstractmethod
     def on_epoch_end(self, iteration, checkpoint, writer=None, **kwargs):
@@ -212,6 +195,42 @@ class Trainer:
         """
         pass
 
+    def extract_on_device(self, batches, feature_extraction, device):
+        """Extract features right before the forward pass
+
+        Parameters
+        ----------
+        batches : generator
+            Batches whose ['X'] are raw waveforms (see `fused` option of
+            `pyannote.audio.features.with_torch.TorchFeatureExtraction`).
+        feature_extraction : `TorchFeatureExtraction`
+            Feature extraction.
+        device : `torch.device`
+            Device used by model parameters.
+
+        Yields
+        ------
+        batch : `dict`
+            Same as input batch but with ['X'] replaced by features
+            (as a `torch.Tensor` on `device`).
+        """
+        for batch in batches:
+            X = self.to_tensor(batch['X'], device)
+            with torch.no_grad():
+                batch['X'] = feature_extraction.transform(X)
+            yield batch
+
+    @property
+    def staging(self):
+        """Staging buffers used to send batches to device"""
+        if not hasattr(self, 'staging_'):
+            self.staging_ = StagingBuffer()
+        return self.staging_
+
+    def to_tensor(self, arrays, device, dtype=np.float32):
+        """Convert (batch of) numpy arrays to torch.Tensor on `device`"""
+        return self.staging(arrays, device=device, dtype=dtype)
+
     def to_numpy(self, tensor):
         """Convert torch.Tensor to numpy array"""
         cpu = torch.device('cpu')
@@ -489,6 +508,11 @@ class Trainer:
         device = torch.device('cpu') if device is None else device
         model = model.to(device)
 
+        # batches contain raw waveforms: extract features on device
+        if getattr(feature_extraction, 'fused', False):
+            batches = self.extract_on_device(batches, feature_extraction,
+                                             device)
+
         extra_parameters = self.extra_init(model, device, labels=labels,
                                            checkpoint=checkpoint)
 
@@ -593,8 +617,16 @@ class Trainer:
 
             batch_generation_time = []
             batch_processing_time = []
+            prefetch_depth, prefetch_nbytes = [], []
             for i in range(batches_per_epoch):
 
+                # keep track of how many batches are ready before requesting
+                # a new one: an empty queue means training is input-bound.
+                loader = getattr(batch_generator, 'loader_', None)
+                if hasattr(loader, 'depth'):
+                    prefetch_depth.append(loader.depth)
+                    prefetch_nbytes.append(loader.nbytes)
+
                 # get next batch (and measure how long it takes)
                 start_time = time.time()
                 batch = next(batches)
@@ -636,6 +668,16 @@ class Trainer:
             writer.add_histogram('profiling/batch_processing',
                                  np.array(batch_processing_time),
                                  global_step=iteration)
+            if prefetch_depth:
+                prefetch_depth = np.array(prefetch_depth)
+                writer.add_histogram('profiling/prefetch/depth',
+                                     prefetch_depth, global_step=iteration)
+                writer.add_scalar('profiling/prefetch/empty',
+                                  np.mean(prefetch_depth == 0),
+                                  global_step=iteration)
+                writer.add_scalar('profiling/prefetch/megabytes',
+                                  np.mean(prefetch_nbytes) / 2 ** 20,
+                                  global_step=iteration)
 
             # tensorboard: scheduler
             if isinstance(scheduler_state, dict):
@@ -27,6 +27,7 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from torch.nn.utils.rnn import PackedSequence
@@ -166,3 +167,165 @@ def get_info(sequences):
         device = sequences.device
 
     return batch_size, n_features, device
+
+
+class StagingBuffer(object):
+    """Reusable host buffers for numpy to torch conversion
+
+    Batches are copied (in place, with a single copy) into contiguous arrays
+    that are allocated once, sized to the largest batch seen so far, and
+    wrapped with `torch.from_numpy`. Contiguous numpy arrays that already
+    have the requested dtype are wrapped directly (without any copy) unless
+    they need to be pinned.
+
+    Parameters
+    ----------
+    pin_memory : bool, optional
+        Use page-locked memory and non-blocking copies when batches are sent
+        to a CUDA device. Defaults to True.
+
+    Usage
+    -----
+    >>> staging = StagingBuffer()
+    >>> X = staging(batch['X'], device=torch.device('cuda'))
+
+    Notes
+    -----
+    The tensor returned by a call may share memory with the one returned by
+    the next call with the same shape and dtype. It should therefore not be
+    kept around once the next batch is staged. Pinned buffers are not
+    overwritten before their previous (non-blocking) copy to the device has
+    completed.
+    """
+
+    def __init__(self, pin_memory=True):
+        super().__init__()
+        self.pin_memory = pin_memory
+        self.buffers_ = {}
+        # CUDA events recorded after the last copy from each pinned buffer
+        self.events_ = {}
+
+    def __call__(self, arrays, device=None, dtype=np.float32):
+        """Stage batch and send it to `device`
+
+        Parameters
+        ----------
+        arrays : numpy array or list of numpy arrays
+            Batch, either as one (batch_size, *shape) array or as a list of
+            `batch_size` arrays sharing the same shape.
+        device : `torch.device`, optional
+            Defaults to CPU.
+        dtype : numpy dtype, optional
+            Defaults to np.float32.
+
+        Returns
+        -------
+        tensor : (batch_size, *shape) `torch.Tensor`
+        """
+
+        device = torch.device('cpu') if device is None else device
+        pin = self.pin_memory and device.type == 'cuda' and \
+              torch.cuda.is_available()
+
+        if isinstance(arrays, torch.Tensor):
+            return arrays.to(device)
+
+        dtype = np.dtype(dtype)
+        if isinstance(arrays, np.ndarray) and not pin and \
+           arrays.dtype == dtype and arrays.flags['C_CONTIGUOUS']:
+            return torch.from_numpy(arrays).to(device)
+
+        batch_size, shape = len(arrays), np.shape(arrays[0])
+        key = (shape, dtype.str, pin)
+        buffer = self.buffers_.get(key)
+        if buffer is None or len(buffer) < batch_size:
+            buffer = torch.from_numpy(
+                np.empty((batch_size, ) + shape, dtype=dtype))
+            if pin:
+                buffer = buffer.pin_memory()
+            self.buffers_[key] = buffer
+            self.events_.pop(key, None)
+
+        # wait for previous copy from this buffer before overwriting it
+        event = self.events_.get(key)
+        if event is not None:
+            event.synchronize()
+
+        tensor = buffer[:batch_size]
+        staged = tensor.numpy()
+        if isinstance(arrays, np.ndarray):
+            np.copyto(staged, arrays, casting='unsafe')
+        else:
+            for b, array in enumerate(arrays):
+                staged[b] = array
+
+        tensor = tensor.to(device, non_blocking=pin)
+        if pin:
+            event = torch.cuda.Event()
+            event.record(torch.cuda.current_stream(device))
+            self.events_[key] = event
+
+        return tensor
+
+
+def forward_by_length(model, sequences, device=None, staging=None):
+    """Apply `model` on variable-length sequences, grouped by length
+
+    Sequences sharing the same length are copied into one preallocated
+    (n_sequences, length, n_features) array and processed as a dense batch
+    (i.e. no `PackedSequence` and no per-sequence tensor copy). Outputs are
+    then scattered back into the original order.
+
+    Parameters
+    ----------
+    model : callable
+        Function (e.g. `torch.nn.Module`) that takes a (batch_size, length,
+        n_features) `torch.Tensor` as input.
+    sequences : list of (length, n_features) numpy arrays
+        Sequences. A (batch_size, length, n_features) numpy array or
+        `torch.Tensor` is also accepted.
+    device : `torch.device`, optional
+        Device where batches are sent. Defaults to model(...) on CPU.
+    staging : `StagingBuffer`, optional
+        Staging buffers used to build (and send) batches. Defaults to
+        allocating a new array for each batch.
+
+    Returns
+    -------
+    output : `torch.Tensor` or list of `torch.Tensor`
+        Concatenated (and reordered) model outputs. When outputs do not share
+        the same shape across lengths (e.g. sequence labeling), a list of
+        per-sequence outputs (in original order) is returned instead.
+    """
+
+    # fast path: batch already built as a tensor (e.g. features extracted
+    # on device, see `Trainer.extract_on_device`)
+    if isinstance(sequences, torch.Tensor):
+        return model(sequences if device is None else sequences.to(device))
+
+    if staging is None:
+        staging = StagingBuffer(pin_memory=False)
+
+    # fast path: sequences already stacked into one array
+    if isinstance(sequences, np.ndarray):
+        return model(staging(sequences, device=device))
+
+    lengths = np.array([len(x) for x in sequences])
+    buckets = [np.where(lengths == length)[0] for length in np.unique(lengths)]
+
+    outputs = []
+    for indices in buckets:
+        batch = staging([sequences[j] for j in indices], device=device)
+        outputs.append(model(batch))
+
+    if len(buckets) == 1:
+        return outputs[0]
+
+    unsort = np.argsort(np.hstack(buckets))
+
+    if len(set(tuple(output.shape[1:]) for output in outputs)) == 1:
+        unsort = torch.from_numpy(unsort).to(outputs[0].device)
+        return torch.cat(outputs)[unsort]
+
+    output = [o for output in outputs for o in output]
+    return [output[i] for i in unsort]
@@ -43,7 +43,7 @@ setup(
         'pyannote.database >= 1.5.5',
         'pyannote.pipeline >= 0.2.1',
         'scikit-learn >= 0.19.1',
-        'torch >= 0.4.1',
+        'torch >= 1.3',
         'pandas >= 0.18.0',
         'audioread >= 2.1.5',
         'librosa >= 0.6',